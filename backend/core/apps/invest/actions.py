@@ -1,12 +1,14 @@
 from django.conf import settings
 from django.contrib import admin, messages
 
+from apps.invest.models import SyncJob, SyncState
+from apps.invest.tasks import candles_task
 from apps.statements.services.analysis import main
 
 
 @admin.action(description='Analyse company by statements checks')
 def check_company(modeladmin, request, queryset):
-    return main(queryset)
+    return main(queryset, full=True)
 
 
 @admin.action(description='Validate company and set company is_public')
@@ -81,4 +83,23 @@ def check_company_translation(modeladmin, request, queryset):
                 is_valid = False
 
         company.is_verified = is_valid
-        company.save()
\ No newline at end of file
+        company.save()
+
+
+@admin.action(description='Cancel sync jobs, workers stop after their current tasks')
+def cancel_sync_job(modeladmin, request, queryset):
+    cancelled = queryset.filter(
+        status__in=[SyncJob.Status.PENDING, SyncJob.Status.RUNNING]
+    ).update(status=SyncJob.Status.CANCELLED)
+    messages.success(request, f'Cancelled jobs: {cancelled}')
+
+
+@admin.action(description='Resume sync jobs from their last checkpoint')
+def resume_sync_job(modeladmin, request, queryset):
+    resumable = queryset.filter(
+        kind=SyncState.Kind.CANDLES,
+        status__in=[SyncJob.Status.FAILED, SyncJob.Status.CANCELLED],
+    )
+    for job in resumable:
+        candles_task.delay(job_id=job.pk)
+    messages.success(request, f'Resumed jobs: {len(resumable)}')
@@ -12,7 +12,8 @@ from unfold.widgets import UnfoldAdminSelectWidget, UnfoldAdminTextInputWidget,
 from unfold.contrib.import_export.forms import ExportForm, ImportForm
 
 from . import models
-from .actions import check_company_translation, validate_company, check_company
+from .actions import check_company_translation, validate_company, check_company, cancel_sync_job, resume_sync_job
+from .services.jobs import with_progress
 from .resources import CompanyResource, CityResource
 
 from parler.admin import TranslatableAdmin
@@ -423,7 +424,7 @@ class ExchangePerformanceInline(StackedInline):
 
 @admin.register(models.Exchange)
 class ExchangeAdmin(ModelAdmin):
-    list_display = ('id', 'title', 'slug', 'country')
+    list_display = ('id', 'title', 'slug', 'country', 'schedule')
     list_display_links = ('title',)
     prepopulated_fields = {'slug': ('title',)}
 
@@ -432,6 +433,13 @@ class ExchangeAdmin(ModelAdmin):
     ]
 
 
+@admin.register(models.TradingDay)
+class TradingDayAdmin(ModelAdmin):
+    list_display = ('exchange', 'date', 'is_trading_day', 'start_time', 'end_time')
+    list_filter = ('exchange', 'is_trading_day')
+    ordering = ('-date',)
+
+
 class BalanceSheetInline(StackedInline):
     model = models.BalanceSheet
     extra = 0
@@ -494,12 +502,20 @@ class ReportAdmin(ModelAdmin):
 
 @admin.register(models.Candle)
 class CandleAdmin(ModelAdmin):
-    list_display = ('instrument', 'open', 'high', 'close', 'low', 'volume', 'time', 'is_complete')
+    list_display = ('instrument', 'interval', 'open', 'high', 'close', 'low', 'volume', 'time', 'is_complete')
     ordering = ('-time', 'instrument__id')
-    list_filter = ('instrument', 'time')
+    list_filter = ('interval', 'instrument', 'time')
     search_fields = ('instrument__name_en', 'instrument__name_ru', 'instrument__tinkoff_uid', 'time')
 
 
+@admin.register(models.CandleArchive)
+class CandleArchiveAdmin(ModelAdmin):
+    list_display = ('instrument', 'interval', 'start', 'end', 'rows', 'file', 'created')
+    list_filter = ('interval',)
+    search_fields = ('instrument__name_en', 'instrument__name_ru', 'instrument__tinkoff_uid')
+    readonly_fields = ('instrument', 'interval', 'start', 'end', 'rows', 'file', 'created')
+
+
 @admin.register(models.AnalystIdea)
 class AnalystIdeaAdmin(ModelAdmin):
     list_display = ('analyst', 'company', 'idea_created', 'price_target', 'date_target')
@@ -508,3 +524,38 @@ class AnalystIdeaAdmin(ModelAdmin):
 @admin.register(models.Dividend)
 class DividendAdmin(ModelAdmin):
     list_display = ('instrument', 'ex_dividend_date', 'yield_value')
+
+
+@admin.register(models.SyncState)
+class SyncStateAdmin(ModelAdmin):
+    list_display = ('instrument', 'kind', 'interval', 'last_time', 'is_complete', 'updated')
+    list_filter = ('kind', 'interval', 'is_complete')
+    search_fields = ('instrument__name_en', 'instrument__name_ru', 'instrument__tinkoff_uid')
+
+
+@admin.register(models.SyncJob)
+class SyncJobAdmin(ModelAdmin):
+    list_display = ('id', 'kind', 'interval', 'status', 'progress', 'failed', 'rows', 'created', 'started', 'finished', 'heartbeat')
+    list_filter = ('kind', 'interval', 'status')
+    readonly_fields = ('kind', 'interval', 'total', 'rows', 'error', 'created', 'started', 'finished', 'heartbeat')
+    actions = [cancel_sync_job, resume_sync_job]
+
+    def get_queryset(self, request: HttpRequest):
+        return with_progress(super().get_queryset(request))
+
+    @admin.display(description='Progress')
+    def progress(self, obj: models.SyncJob):
+        return f'{obj.done}/{obj.total}'
+
+    @admin.display(description='Failed')
+    def failed(self, obj: models.SyncJob):
+        return obj.failed
+
+
+@admin.register(models.SyncJobTask)
+class SyncJobTaskAdmin(ModelAdmin):
+    list_display = ('id', 'job', 'instrument', 'start_date', 'end_date', 'status', 'attempts', 'updated')
+    list_filter = ('status', 'job')
+    search_fields = ('instrument__tinkoff_uid', 'instrument__ticker')
+    list_select_related = ('job', 'instrument')
+
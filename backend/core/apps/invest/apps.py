@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def create_candle_partitions(sender, **kwargs):
+    from apps.invest.services.partitions import ensure_candle_partitions
+    ensure_candle_partitions()
 
 
 class InvestConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.invest'
+
+    def ready(self):
+        # Migrations keep the partitions of a partitioned candle table up to date
+        post_migrate.connect(create_candle_partitions, sender=self)
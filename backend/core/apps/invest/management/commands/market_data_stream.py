@@ -0,0 +1,61 @@
+import asyncio
+import contextlib
+import signal
+
+import decouple
+import grpc
+from django.core.management.base import BaseCommand
+
+from tinkoff.invest import AsyncClient
+from tinkoff.invest.async_services import AsyncServices
+
+from apps.invest.services.stream import MarketDataStream
+from apps.invest.services.tinvest import InstrumentMap
+
+TOKEN = decouple.config('TINKOFF_KEY', default='')
+
+
+class Command(BaseCommand):
+    help = 'Stream live market data into current daily candles and price updates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', help='Plain gRPC address of a stand-in server, e.g. localhost:50051')
+        parser.add_argument('--record', help='Append received minute candles to this JSON lines file')
+        parser.add_argument('--duration', type=float, help='Stop after this many seconds')
+        parser.add_argument('--flush-interval', type=float, default=MarketDataStream.FLUSH_INTERVAL)
+
+    def handle(self, *args, **options):
+        asyncio.run(self.stream(options))
+
+    async def stream(self, options):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        if options['duration']:
+            loop.call_later(options['duration'], stop.set)
+
+        instruments = await InstrumentMap.aload()
+
+        with contextlib.ExitStack() as stack:
+            record = stack.enter_context(open(options['record'], 'a', encoding='utf-8')) if options['record'] else None
+
+            async with self.services(options['target']) as services:
+                stream = MarketDataStream(services, instruments, options['flush_interval'], record=record)
+                await stream.run(stop)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{stream.ticks} ticks, {stream.flushed} candle writes, {stream.broadcaster.sent} broadcasts'
+        ))
+
+    @staticmethod
+    @contextlib.asynccontextmanager
+    async def services(target: str = None):
+        if target is None:
+            async with AsyncClient(TOKEN) as services:
+                yield services
+            return
+
+        # Stand-in servers speak plain gRPC, AsyncClient always opens a TLS channel
+        async with grpc.aio.insecure_channel(target) as channel:
+            yield AsyncServices(channel, TOKEN)
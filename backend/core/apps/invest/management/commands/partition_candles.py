@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.invest.services.partitions import ensure_candle_partitions, partition_candles
+
+
+class Command(BaseCommand):
+    help = 'Convert the candle table into time partitions (PostgreSQL) and create upcoming partitions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, help='Months of partitions to create ahead of today')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Candle partitioning needs PostgreSQL')
+
+        if partition_candles(options['ahead']):
+            self.stdout.write(self.style.SUCCESS('Candles moved into a partitioned table'))
+
+        created = ensure_candle_partitions(options['ahead'])
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} partitions created'))
@@ -28,6 +28,15 @@ class InstrumentType(models.TextChoices):
     OPTION = 'option', 'Опцион'
 
 
+class CandleIntervalType(models.TextChoices):
+    MINUTE = '1m', '1 минута'
+    FIVE_MINUTES = '5m', '5 минут'
+    HOUR = '1h', 'Час'
+    DAY = '1d', 'День'
+    WEEK = '1w', 'Неделя'
+    MONTH = '1M', 'Месяц'
+
+
 def logo_directory_path(instance, filename):
     return f'companies/logos/small/{instance.ticker.upper()}_{filename}'
 
@@ -86,6 +95,12 @@ class Instrument(models.Model):
     class_code = models.CharField(max_length=255)
     isin = models.CharField(max_length=255, unique=True)
     lot = models.PositiveBigIntegerField(default=1)
+    trading_status = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text='Last known trading status in Tinkoff API'
+    )
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(
@@ -108,6 +123,7 @@ class Instrument(models.Model):
         indexes = [
             models.Index(fields=['ticker']),
             models.Index(fields=['exchange']),
+            models.Index(fields=['tinkoff_uid']),
         ]
         unique_together = ['ticker', 'exchange']
 
@@ -211,6 +227,7 @@ class CompanyPerformance(models.Model):
     average_weekly_movement = models.FloatField(null=True, blank=True)
     last_reported_earnings = models.DateField(null=True, blank=True)
     next_earnings = models.DateField(null=True, blank=True)
+    updated = models.DateTimeField(null=True, blank=True, help_text=_('Time the returns were computed'))
 
     class Meta:
         ordering = ['id']
@@ -303,6 +320,12 @@ class Exchange(models.Model):
     mic = models.CharField(max_length=4, unique=True, help_text='Market Identifier Code')
     lei = models.CharField(max_length=20, unique=True, help_text='Legal Entity Identifier')
     country = models.ForeignKey('Country', on_delete=models.PROTECT, related_name='exchanges')
+    schedule = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text='Trading schedule in Tinkoff API (e.g. MOEX), empty to treat every day as a trading one'
+    )
 
     def __str__(self):
         return self.title
@@ -314,6 +337,23 @@ class Exchange(models.Model):
         ]
 
 
+class TradingDay(models.Model):
+    """Trading calendar of an exchange cached from Tinkoff trading schedules"""
+    exchange = models.ForeignKey('Exchange', on_delete=models.CASCADE, related_name='trading_days')
+    date = models.DateField()
+    is_trading_day = models.BooleanField()
+    start_time = models.DateTimeField(null=True, blank=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date']
+        unique_together = [['exchange', 'date']]
+
+    def __str__(self):
+        return f'{self.exchange}:{self.date}'
+
+
 class ExchangePerformance(models.Model):
     exchange = models.OneToOneField(Exchange, on_delete=models.CASCADE, related_name='performance')
     return_7d = models.FloatField(null=True, blank=True)
@@ -352,6 +392,9 @@ class SectorExchange(models.Model):
     volatility_90p = models.FloatField(null=True, blank=True)
     volatility_100p = models.FloatField(null=True, blank=True)
 
+    class Meta:
+        unique_together = [['sector', 'exchange']]
+
     def __str__(self):
         return f'{self.exchange.title} - {self.sector.__str__()}'
 
@@ -618,11 +661,48 @@ class Candle(models.Model):
     close = models.FloatField()
     volume = models.FloatField()
     time = models.DateTimeField()
+    interval = models.CharField(max_length=2, choices=CandleIntervalType, default=CandleIntervalType.DAY)
     is_complete = models.BooleanField()
 
     class Meta:
         ordering = ['time']
-        unique_together = [['instrument', 'time']]
+        unique_together = [['instrument', 'interval', 'time']]
+
+
+def candle_archive_path(instance, filename):
+    return f'candles/archive/{instance.interval}/{instance.instrument_id}/{filename}'
+
+
+class CandleArchive(models.Model):
+    """Candles moved out of the candle table into a compressed file, see services/archive.py"""
+    instrument = models.ForeignKey('Instrument', on_delete=models.CASCADE, related_name='candle_archives')
+    interval = models.CharField(max_length=2, choices=CandleIntervalType, default=CandleIntervalType.DAY)
+    start = models.DateTimeField(help_text=_('Time of the first archived candle'))
+    end = models.DateTimeField(help_text=_('Archived candles are before this time'))
+    rows = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to=candle_archive_path)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['start']
+        indexes = [models.Index(fields=['instrument', 'interval', 'end'])]
+
+    def __str__(self):
+        return f'{self.instrument}:{self.interval}:{self.start:%Y-%m-%d}-{self.end:%Y-%m-%d}'
+
+
+class CandleChange(models.Model):
+    """Candles written below the sync watermark, for data derived from candles (see services/bulk.py)"""
+    instrument = models.ForeignKey('Instrument', on_delete=models.CASCADE, related_name='candle_changes')
+    interval = models.CharField(max_length=2, choices=CandleIntervalType, default=CandleIntervalType.DAY)
+    since = models.DateTimeField(help_text=_('Time of the oldest written candle'))
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['interval', 'created'])]
+
+    def __str__(self):
+        return f'{self.instrument}:{self.interval}:{self.since:%Y-%m-%d}'
 
 
 class AnalystIdea(models.Model):
@@ -670,3 +750,74 @@ class Dividend(models.Model):
 
     class Meta:
         unique_together = ['instrument', 'record_date']
+
+
+class SyncState(models.Model):
+    """Watermark of synced data per instrument, advanced by the writers in the same transaction"""
+
+    class Kind(models.TextChoices):
+        CANDLES = 'candles', 'Свечи'
+        DIVIDENDS = 'dividends', 'Дивиденды'
+        STREAM = 'stream', 'Поток' # Last minute folded into the live daily candle
+
+    instrument = models.ForeignKey('Instrument', on_delete=models.CASCADE, related_name='sync_states')
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    interval = models.CharField(max_length=8, blank=True, default='', help_text=_('Candle interval, empty for other kinds'))
+    last_time = models.DateTimeField(help_text=_('Time the data is synced up to: latest candle, or the end of the checked dividend window'))
+    is_complete = models.BooleanField(default=False, help_text=_('Whether the latest synced record is final'))
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [['instrument', 'kind', 'interval']]
+
+    def __str__(self):
+        return f'{self.instrument}:{self.kind}:{self.interval}'
+
+
+class SyncJob(models.Model):
+    """Persisted plan of a sync run, tasks are checkpointed so the job resumes where it stopped"""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает'
+        RUNNING = 'running', 'Выполняется'
+        COMPLETED = 'completed', 'Завершена'
+        FAILED = 'failed', 'Ошибка'
+        CANCELLED = 'cancelled', 'Отменена'
+
+    kind = models.CharField(max_length=16, choices=SyncState.Kind.choices)
+    interval = models.CharField(max_length=8, blank=True, default='', help_text=_('Candle interval, empty for other kinds'))
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING, db_index=True)
+    total = models.PositiveIntegerField(default=0, help_text=_('Number of planned tasks'))
+    rows = models.PositiveBigIntegerField(default=0, help_text=_('Number of written rows'))
+    error = models.TextField(blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    heartbeat = models.DateTimeField(null=True, blank=True, help_text=_('Last sign of life of the worker running the job'))
+
+    class Meta:
+        ordering = ['-created']
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk} ({self.status})'
+
+
+class SyncJobTask(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает'
+        DONE = 'done', 'Выполнена'
+        FAILED = 'failed', 'Ошибка'
+
+    job = models.ForeignKey('SyncJob', on_delete=models.CASCADE, related_name='tasks')
+    instrument = models.ForeignKey('Instrument', on_delete=models.CASCADE, related_name='sync_job_tasks')
+    start_date = models.DateTimeField()
+    end_date = models.DateTimeField()
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['job', 'status']),
+        ]
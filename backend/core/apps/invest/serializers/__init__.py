@@ -11,4 +11,5 @@ __all__ = (
     CompanyFullSerializer,
     ShareSerializer,
     ShareFullSerializer,
+    SyncJobSerializer,
 )
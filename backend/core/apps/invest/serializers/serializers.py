@@ -175,3 +175,27 @@ class DividendSerializer(serializers.ModelSerializer):
             'close_price',
             'yield_value',
         )
+
+
+class SyncJobSerializer(serializers.ModelSerializer):
+    done = serializers.IntegerField(read_only=True)
+    failed = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = models.SyncJob
+        fields = (
+            'id',
+            'kind',
+            'interval',
+            'status',
+            'total',
+            'done',
+            'failed',
+            'rows',
+            'error',
+            'created',
+            'started',
+            'finished',
+            'heartbeat',
+        )
+
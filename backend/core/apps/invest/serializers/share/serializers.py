@@ -38,7 +38,7 @@ class BaseShareSerializer(serializers.ModelSerializer):
 
     @staticmethod
     def get_last_candle(instance: models.Instrument):
-        last_candle = instance.candles.order_by('-time').first()
+        last_candle = instance.candles.filter(interval=models.CandleIntervalType.DAY).order_by('-time').first()
         return CandleSerializer(last_candle if last_candle else {}).data
 
 
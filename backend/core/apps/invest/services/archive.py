@@ -0,0 +1,250 @@
+"""Cold storage of old candles.
+
+Closed historical ranges are moved per instrument from the candle table into
+compressed NumPy files (one array per column) in media storage. Readers go
+through candle_series / candle_arrays, which stitch the archived part and the
+table into one series.
+"""
+from collections import defaultdict
+from itertools import groupby
+from typing import Iterable, Optional
+import datetime
+import io
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max
+
+from apps.invest.models import Candle, CandleArchive, CandleIntervalType
+
+logger = logging.getLogger(__name__)
+
+# Order of values in an archived row, and the arrays of an archive file
+ARCHIVE_COLUMNS = ('time', 'open', 'high', 'low', 'close', 'volume', 'is_complete')
+ARCHIVE_DTYPES = {
+    'time': 'datetime64[s]',
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.float64,
+    'is_complete': np.bool_,
+}
+
+# {column: array}
+CandleArrays = dict[str, np.ndarray]
+
+
+def to_datetime64(time: datetime.datetime) -> np.datetime64:
+    return np.datetime64(time.astimezone(datetime.timezone.utc).replace(tzinfo=None), 's')
+
+
+def from_datetime64(time: np.datetime64) -> datetime.datetime:
+    return time.astype(datetime.datetime).replace(tzinfo=datetime.timezone.utc)
+
+
+def to_arrays(rows: Iterable[tuple]) -> CandleArrays:
+    """Rows in ARCHIVE_COLUMNS order to column arrays"""
+    columns = list(zip(*rows)) or [()] * len(ARCHIVE_COLUMNS)
+    arrays = {}
+    for name, values in zip(ARCHIVE_COLUMNS, columns):
+        if name == 'time':
+            values = [to_datetime64(time) for time in values]
+        arrays[name] = np.array(values, dtype=ARCHIVE_DTYPES[name])
+    return arrays
+
+
+def concat_arrays(parts: list[CandleArrays]) -> CandleArrays:
+    if not parts:
+        return to_arrays([])
+    return {name: np.concatenate([part[name] for part in parts]) for name in ARCHIVE_COLUMNS}
+
+
+def dedupe_arrays(arrays: CandleArrays) -> CandleArrays:
+    """One candle per time ordered by time, the last one of a time wins"""
+    times = arrays['time'][::-1]
+    _, first = np.unique(times, return_index=True)
+    keep = len(times) - 1 - first
+    return {name: values[keep] for name, values in arrays.items()}
+
+
+def read_archive(archive: CandleArchive) -> CandleArrays:
+    with archive.file.open('rb') as file:
+        data = np.load(io.BytesIO(file.read()))
+        return {name: data[name] for name in ARCHIVE_COLUMNS}
+
+
+def archive_instrument(instrument_id: int, interval: str, before: datetime.datetime) -> Optional[CandleArchive]:
+    """Move candles of the instrument older than ``before`` into a new archive file"""
+    candles = Candle.objects.filter(instrument_id=instrument_id, interval=interval, time__lt=before)
+
+    with transaction.atomic():
+        rows = list(candles.select_for_update().order_by('time').values_list(*ARCHIVE_COLUMNS))
+        if not rows:
+            return None
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **to_arrays(rows))
+
+        archive = CandleArchive(instrument_id=instrument_id, interval=interval, start=rows[0][0], end=before, rows=len(rows))
+        archive.file.save(f'{rows[0][0]:%Y%m%d}_{before:%Y%m%d}.npz', ContentFile(buffer.getvalue()), save=False)
+        try:
+            archive.save()
+            candles.delete()
+        except Exception:
+            archive.file.delete(save=False)
+            raise
+
+    return archive
+
+
+def archive_candles(before: Optional[datetime.datetime] = None, interval: str = CandleIntervalType.DAY) -> dict:
+    """Archive candles older than ``before`` (CANDLE_ARCHIVE_BEFORE by default) of every instrument"""
+    if before is None:
+        before = datetime.datetime.fromisoformat(settings.CANDLE_ARCHIVE_BEFORE).replace(tzinfo=datetime.timezone.utc)
+
+    instrument_ids = (
+        Candle.objects.filter(interval=interval, time__lt=before)
+        .order_by('instrument_id').values_list('instrument_id', flat=True).distinct()
+    )
+
+    archives = rows = 0
+    for instrument_id in list(instrument_ids):
+        archive = archive_instrument(instrument_id, interval, before)
+        if archive:
+            archives += 1
+            rows += archive.rows
+
+    logger.info(f'[Archive] {rows} {interval} candles before {before:%Y-%m-%d} moved to {archives} files')
+    return {'archives': archives, 'rows': rows}
+
+
+def read_archived(
+    instrument_id: int,
+    interval: str,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+) -> CandleArrays:
+    """Archived candles of the instrument within [start, end].
+
+    Candles written again after archiving can be archived again later, then
+    the archives overlap and the candle of the latest archive wins.
+    """
+    archives = CandleArchive.objects.filter(instrument_id=instrument_id, interval=interval)
+    if start is not None:
+        archives = archives.filter(end__gt=start)
+    if end is not None:
+        archives = archives.filter(start__lte=end)
+    return read_archives(list(archives.order_by('id')), start, end)
+
+
+def read_archives(
+    archives: list[CandleArchive],
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+) -> CandleArrays:
+    """Candles of an instrument's archives (ordered by id) within [start, end]"""
+    arrays = dedupe_arrays(concat_arrays([read_archive(archive) for archive in archives]))
+    mask = np.ones(len(arrays['time']), dtype=bool)
+    if start is not None:
+        mask &= arrays['time'] >= to_datetime64(start)
+    if end is not None:
+        mask &= arrays['time'] <= to_datetime64(end)
+    return {name: values[mask] for name, values in arrays.items()}
+
+
+def has_archive(instrument_id: int, interval: str, start: Optional[datetime.datetime] = None) -> bool:
+    end = CandleArchive.objects.filter(instrument_id=instrument_id, interval=interval).aggregate(end=Max('end'))['end']
+    return end is not None and (start is None or start < end)
+
+
+def _table_candles(instrument_id: int, interval: str, start: Optional[datetime.datetime], end: Optional[datetime.datetime]):
+    candles = Candle.objects.filter(instrument_id=instrument_id, interval=interval)
+    if start is not None:
+        candles = candles.filter(time__gte=start)
+    if end is not None:
+        candles = candles.filter(time__lte=end)
+    return candles.order_by('time')
+
+
+def candle_arrays(
+    instrument_id: int,
+    interval: str = CandleIntervalType.DAY,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+) -> CandleArrays:
+    """Continuous series of archived and stored candles as column arrays, for analytics"""
+    stored = to_arrays(_table_candles(instrument_id, interval, start, end).values_list(*ARCHIVE_COLUMNS))
+    if not has_archive(instrument_id, interval, start):
+        return stored
+    return merge_archived(read_archived(instrument_id, interval, start, end), stored)
+
+
+def candle_arrays_batch(
+    instrument_ids: list[int],
+    interval: str = CandleIntervalType.DAY,
+    start: Optional[datetime.datetime] = None,
+) -> dict[int, CandleArrays]:
+    """Same as candle_arrays for many instruments, with one table and one archive query"""
+    candles = Candle.objects.filter(instrument_id__in=instrument_ids, interval=interval)
+    archives = CandleArchive.objects.filter(instrument_id__in=instrument_ids, interval=interval)
+    if start is not None:
+        candles = candles.filter(time__gte=start)
+        archives = archives.filter(end__gt=start)
+
+    result = {instrument_id: to_arrays([]) for instrument_id in instrument_ids}
+    rows = candles.order_by('instrument_id', 'time').values_list('instrument_id', *ARCHIVE_COLUMNS)
+    for instrument_id, instrument_rows in groupby(rows.iterator(chunk_size=10_000), key=lambda row: row[0]):
+        result[instrument_id] = to_arrays(row[1:] for row in instrument_rows)
+
+    archived = defaultdict(list)
+    for archive in archives.order_by('id'):
+        archived[archive.instrument_id].append(archive)
+    for instrument_id, instrument_archives in archived.items():
+        result[instrument_id] = merge_archived(read_archives(instrument_archives, start), result[instrument_id])
+    return result
+
+
+def merge_archived(archived: CandleArrays, stored: CandleArrays) -> CandleArrays:
+    """Archived and stored candles of an instrument as one series ordered by time"""
+    # Candles written again after archiving win over the archived ones
+    keep = ~np.isin(archived['time'], stored['time'])
+    arrays = concat_arrays([{name: values[keep] for name, values in archived.items()}, stored])
+    # Candles written again can be older than the end of the archive
+    order = np.argsort(arrays['time'], kind='stable')
+    return {name: values[order] for name, values in arrays.items()}
+
+
+def candle_series(
+    instrument_id: int,
+    interval: str = CandleIntervalType.DAY,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+) -> list[Candle]:
+    """Continuous series of archived and stored candles as model instances, for the API"""
+    stored = list(_table_candles(instrument_id, interval, start, end))
+    if not has_archive(instrument_id, interval, start):
+        return stored
+
+    archived = read_archived(instrument_id, interval, start, end)
+    stored_times = {candle.time for candle in stored}
+    candles = []
+    for i in range(len(archived['time'])):
+        time = from_datetime64(archived['time'][i])
+        if time in stored_times:
+            continue
+        candles.append(Candle(
+            instrument_id=instrument_id,
+            interval=interval,
+            time=time,
+            open=float(archived['open'][i]),
+            high=float(archived['high'][i]),
+            low=float(archived['low'][i]),
+            close=float(archived['close'][i]),
+            volume=float(archived['volume'][i]),
+            is_complete=bool(archived['is_complete'][i]),
+        ))
+    return sorted(candles + stored, key=lambda candle: candle.time)
@@ -1,20 +1,20 @@
 from typing import Optional, TypeGuard
 from dataclasses import asdict
+from itertools import chain
 import asyncio
 from asgiref.sync import sync_to_async
-from tqdm.asyncio import tqdm
 import datetime
 import json
 import logging
+import time
 import decouple
 
-from django.db import connection
+from django.db import connection, transaction
 from django.db.models import Exists, OuterRef, Subquery
 from django.contrib.auth.models import User
 from django.utils import timezone
 
 from tinkoff.invest import (
-    AsyncClient,
     Page,
     Instrument as InstrumentDataClass,
     Dividend as DividendDataClass,
@@ -27,70 +27,106 @@ from tinkoff.invest.schemas import PageResponse
 from tinkoff.invest.exceptions import AioRequestError
 from tinkoff.invest.utils import quotation_to_decimal, money_to_decimal
 
-from apps.invest.models import Company, Instrument, Exchange, Currency, Candle, Dividend
-from apps.invest.services.tinvest import InstrumentTask
+from apps.invest.models import (
+    Company,
+    Instrument,
+    Exchange,
+    Currency,
+    Candle,
+    CandleIntervalType,
+    Dividend,
+    SyncJob,
+    SyncState,
+    TradingDay,
+)
+from apps.invest.services.broadcast import PriceBroadcaster
+from apps.invest.services.bulk import write_candles, advance_sync_states, prune_candle_changes
+from apps.invest.services.calendar import TradingCalendar
+from apps.invest.services.jobs import (
+    get_active_job,
+    get_resumable_job,
+    create_job,
+    load_job_tasks,
+    start_job,
+    touch_job,
+    complete_job_tasks,
+    fail_job_task,
+    fail_job_tasks,
+    finish_job,
+)
+from apps.invest.services.partitions import ensure_candle_partitions
+from apps.invest.services.pipeline import CandleBatch, StageStats, WriteStage
+from apps.invest.services.candle_cache import refresh_candle_cache
+from apps.invest.services.returns import main as returns_main
+from apps.invest.services.rollup import ROLLUP_INTERVALS, rollup_main
+from apps.invest.services.tinvest import InstrumentTask, InstrumentRef, InstrumentMap
+from apps.invest.services.transport import Transport, LiveTransport
+from apps.invest.services.rate_limit import limiter, RateLimiter
+from apps.invest.services.retry import retry_policy as default_retry_policy, RetryPolicy
 
 logger = logging.getLogger(__name__)
-TOKEN = decouple.config('TINKOFF_KEY')
+NORMAL_TRADING_STATUS = 'SECURITY_TRADING_STATUS_NORMAL_TRADING'
+TOKEN = decouple.config('TINKOFF_KEY', default='')
 
 
 class BaseAsyncTinkoffService:
     """Base async service for interaction with Tinkoff Invest API"""
 
-    API_MAX_CALLS = 190 # Api requests
+    API_SERVICE = 'instruments' # Quota bucket in rate limiter
+    API_MAX_CONCURRENCY = 50 # Requests in flight
     API_MAX_PERIOD = datetime.timedelta(days=5 * 365) # Days
-    API_REQUEST_DELAY = 61 # Seconds
 
-    def __init__(self):
-        self._client: Optional[AsyncClient] = None
+    def __init__(
+        self,
+        rate_limiter: Optional[RateLimiter] = None,
+        transport: Optional[Transport] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        self.limiter = rate_limiter or limiter
+        self.retry = retry_policy or default_retry_policy
+        self.transport = transport # Live API by default, see services.transport for record / replay
+        self._transport: Optional[Transport] = None
         self.services: Optional[AsyncServices] = None
 
     async def __aenter__(self):
-        self._client = AsyncClient(TOKEN)
-        self.services = await self._client.__aenter__()
+        self._transport = self.transport or LiveTransport(TOKEN)
+        self.services = await self._transport.__aenter__()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self._client:
-            await self._client.__aexit__(exc_type, exc_val, exc_tb)
+        if self._transport:
+            await self._transport.__aexit__(exc_type, exc_val, exc_tb)
         self.services = None
-        self._client = None
+        self._transport = None
 
     def _check_services(self) -> TypeGuard[AsyncServices]:
         if self.services is None:
             raise RuntimeError('Services not initialized. Use async context manager')
         return True
 
-    async def _process_with_retry(self, func, *args, max_retries=3, **kwargs):
-        """Common logic of API retries"""
-        for attempt in range(max_retries):
-            try:
-                return await func(*args, **kwargs)
-            except AioRequestError as e:
-                if e.code == 429 and attempt < max_retries - 1:
-                    await asyncio.sleep(self.API_REQUEST_DELAY * (attempt + 1))
-                else:
-                    raise
-        return None
-
-    async def _process_batch(self, tasks: list, process_func, batch_size: int = None):
-        """Processing tasks in batches"""
-        batch_size = batch_size or self.API_MAX_CALLS
-        progress_bar = tqdm(total=len(tasks))
-
-        while tasks:
-            batch = tasks[:batch_size]
-            tasks = tasks[batch_size:]
+    async def _process_with_retry(self, func, *args, api_service: Optional[str] = None, **kwargs):
+        """Common logic of API retries, every attempt is paced by the rate limiter"""
+        async def acquire():
+            await self.limiter.aacquire(api_service or self.API_SERVICE)
 
-            await asyncio.gather(*(process_func(task) for task in batch))
+        return await self.retry.acall(func, *args, before=acquire, **kwargs)
 
-            if tasks:
-                logger.info(f'[Waiting] Waiting {self.API_REQUEST_DELAY}sec before process next batch')
-                await asyncio.sleep(self.API_REQUEST_DELAY)
+    async def _run_tasks(self, tasks: list, process_func, concurrency: int = None):
+        """Processing tasks by a pool of workers, API calls are paced by the rate limiter"""
+        concurrency = min(concurrency or self.API_MAX_CONCURRENCY, len(tasks))
+        log_every = max(len(tasks) // 20, 1)
+        pending = iter(tasks)
+        processed = 0
 
-            progress_bar.update(len(batch))
+        async def worker():
+            nonlocal processed
+            for task in pending:
+                await process_func(task)
+                processed += 1
+                if processed % log_every == 0:
+                    logger.info(f'[Progress] {processed}/{len(tasks)}')
 
-        progress_bar.close()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
 
 
 class TestServiceAsync(BaseAsyncTinkoffService):
@@ -216,8 +252,103 @@ class InstrumentServiceAsync(BaseAsyncTinkoffService):
         )
 
 
+class CalendarServiceAsync(BaseAsyncTinkoffService):
+    SCHEDULE_MAX_PERIOD = datetime.timedelta(days=14) # Days per trading_schedules request
+    STATUSES_MAX_INSTRUMENTS = 100 # Instruments per get_trading_statuses request
+
+    async def refresh_trading_days(self, days_back: int = 30, days_ahead: int = 14) -> int:
+        """Cache trading schedules of exchanges which have a schedule name"""
+        if not self._check_services():
+            return 0
+
+        today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        end_date = today + datetime.timedelta(days=days_ahead)
+        days = []
+
+        async for exchange in Exchange.objects.exclude(schedule=''):
+            start_date = today - datetime.timedelta(days=days_back)
+            while start_date <= end_date:
+                response = await self._process_with_retry(
+                    self.services.instruments.trading_schedules,
+                    exchange=exchange.schedule,
+                    from_=start_date,
+                    to=min(start_date + self.SCHEDULE_MAX_PERIOD, end_date),
+                )
+                for schedule in response.exchanges:
+                    days.extend(
+                        TradingDay(
+                            exchange=exchange,
+                            date=day.date.date(),
+                            is_trading_day=day.is_trading_day,
+                            start_time=day.start_time if day.is_trading_day else None,
+                            end_time=day.end_time if day.is_trading_day else None,
+                        )
+                        for day in schedule.days
+                    )
+                start_date += self.SCHEDULE_MAX_PERIOD + datetime.timedelta(days=1)
+
+        await TradingDay.objects.abulk_create(
+            days,
+            update_conflicts=True,
+            update_fields=['is_trading_day', 'start_time', 'end_time', 'updated'],
+            unique_fields=['exchange', 'date'],
+        )
+        return len(days)
+
+    async def refresh_trading_statuses(self, instruments: InstrumentMap) -> int:
+        if not self._check_services():
+            return 0
+
+        refs = list(instruments)
+        changed = []
+        for i in range(0, len(refs), self.STATUSES_MAX_INSTRUMENTS):
+            response = await self._process_with_retry(
+                self.services.market_data.get_trading_statuses,
+                instrument_ids=[ref.tinkoff_uid for ref in refs[i:i + self.STATUSES_MAX_INSTRUMENTS]],
+                api_service='market_data',
+            )
+            for status in response.trading_statuses:
+                ref = instruments.get(status.instrument_uid)
+                if ref and ref.trading_status != status.trading_status.name:
+                    changed.append(Instrument(id=ref.id, trading_status=status.trading_status.name))
+
+        await Instrument.objects.abulk_update(changed, ['trading_status'])
+        return len(changed)
+
+
 class CandleServiceAsync(BaseAsyncTinkoffService):
-    API_MAX_CALLS = 290 # Per minute (300)
+    API_SERVICE = 'market_data'
+    API_WRITE_WORKERS = 2 # Concurrent bulk writes
+    API_WRITE_QUEUE_SIZE = 64 # Parsed batches waiting for a writer
+    JOB_CHECK_INTERVAL = 10 # Seconds between heartbeats / cancellation checks of a job
+    CALENDAR_WINDOW = datetime.timedelta(days=60) # Older periods are planned without the calendar
+    DORMANT_AFTER = datetime.timedelta(days=30) # Without candles for this long an instrument is dormant
+    # Intervals fetched from the API, weekly and monthly candles are rolled up from daily ones
+    API_INTERVALS = {
+        CandleIntervalType.MINUTE: CandleInterval.CANDLE_INTERVAL_1_MIN,
+        CandleIntervalType.FIVE_MINUTES: CandleInterval.CANDLE_INTERVAL_5_MIN,
+        CandleIntervalType.HOUR: CandleInterval.CANDLE_INTERVAL_HOUR,
+        CandleIntervalType.DAY: CandleInterval.CANDLE_INTERVAL_DAY,
+    }
+    # Longest period of one request per interval
+    API_MAX_PERIODS = {
+        CandleIntervalType.MINUTE: datetime.timedelta(days=1),
+        CandleIntervalType.FIVE_MINUTES: datetime.timedelta(days=1),
+        CandleIntervalType.HOUR: datetime.timedelta(days=7),
+        CandleIntervalType.DAY: BaseAsyncTinkoffService.API_MAX_PERIOD,
+    }
+    # Intraday history loaded for an instrument synced for the first time
+    INTRADAY_HISTORY = {
+        CandleIntervalType.MINUTE: datetime.timedelta(days=7),
+        CandleIntervalType.FIVE_MINUTES: datetime.timedelta(days=30),
+        CandleIntervalType.HOUR: datetime.timedelta(days=365),
+    }
+    INTERVAL_DURATIONS = {
+        CandleIntervalType.MINUTE: datetime.timedelta(minutes=1),
+        CandleIntervalType.FIVE_MINUTES: datetime.timedelta(minutes=5),
+        CandleIntervalType.HOUR: datetime.timedelta(hours=1),
+        CandleIntervalType.DAY: datetime.timedelta(days=1),
+    }
 
     async def get_candles(self, task: InstrumentTask):
         if not self._check_services():
@@ -226,112 +357,276 @@ class CandleServiceAsync(BaseAsyncTinkoffService):
         return await self._process_with_retry(
             self.services.market_data.get_candles,
             instrument_id=task.instrument_uid,
-            interval=CandleInterval.CANDLE_INTERVAL_DAY,
+            interval=self.API_INTERVALS[self.interval],
             from_=task.start_date,
             to=task.end_date,
         )
 
-    async def process_tasks(self, tasks: list[InstrumentTask]):
-        semaphore = asyncio.Semaphore(self.API_MAX_CALLS)
+    def __init__(
+        self,
+        rate_limiter: Optional[RateLimiter] = None,
+        transport: Optional[Transport] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        interval: str = CandleIntervalType.DAY,
+    ):
+        if interval not in self.API_INTERVALS:
+            raise ValueError(f'Candles of interval {interval!r} are not fetched from the API')
+
+        super().__init__(rate_limiter, transport, retry_policy)
+        self.interval = interval
+        self.stats: dict[str, StageStats] = {}
+        self.broadcaster = PriceBroadcaster()
+        self.job_id: Optional[int] = None
+        self._job_checked = 0.0
+        self._job_cancelled = False
+
+    async def process_tasks(self, tasks: list[InstrumentTask], concurrency: int = None, job_id: int = None):
+        """Fetchers put parsed candles on a bounded queue, writers drain it in bulk.
+
+        With a job every task is checkpointed: written tasks are marked done in the
+        transaction of their write, tasks whose fetch fails are marked failed and
+        the rest of the job goes on.
+        """
+        self.job_id = job_id
+        fetch_stats = StageStats('fetch')
+
+        async with self.broadcaster, WriteStage(
+            self.write_batches,
+            workers=self.API_WRITE_WORKERS,
+            queue_size=self.API_WRITE_QUEUE_SIZE,
+        ) as writer:
+            async def process_task(task: InstrumentTask):
+                if await self.is_job_cancelled():
+                    return
 
-        async def process_task(task: InstrumentTask):
-            async with semaphore:
                 logger.info(f'[Processing] {task.instrument_uid} [{task.start_date} - {task.end_date}]')
-                candles = await self.get_candles(task)
-
-                if candles and candles.candles:
-                    await self.save_candles(task, candles.candles)
-                    logger.info(f'[Saved] {task.instrument_uid} [{task.start_date} - {task.end_date}]')
-
-        await self._process_batch(tasks, process_task)
-
-    async def get_tasks(self, instruments: list[Instrument]) -> list[InstrumentTask]:
+                started = time.monotonic()
+                try:
+                    candles = await self.get_candles(task)
+                except AioRequestError as e:
+                    if task.job_task_id is None:
+                        raise
+                    logger.error(f'[Failed] {task.instrument_uid} [{task.start_date} - {task.end_date}]: {e}')
+                    await sync_to_async(fail_job_task)(task.job_task_id, repr(e))
+                    return
+
+                rows = self.parse_candles(task, candles.candles) if candles else []
+                fetch_stats.add(len(rows), time.monotonic() - started)
+
+                if rows:
+                    await writer.put(CandleBatch(task, rows))
+                elif task.job_task_id is not None:
+                    await sync_to_async(complete_job_tasks)(self.job_id, [task.job_task_id], 0)
+
+            await self._run_tasks(tasks, process_task, concurrency)
+            fetch_stats.finished = time.monotonic()
+
+        fetch_stats.blocked = writer.put_blocked
+        self.stats = {'fetch': fetch_stats, 'write': writer.stats}
+        logger.info(fetch_stats)
+        logger.info(writer.stats)
+
+    async def is_job_cancelled(self) -> bool:
+        if self.job_id is None or self._job_cancelled:
+            return self._job_cancelled
+
+        if time.monotonic() - self._job_checked >= self.JOB_CHECK_INTERVAL:
+            self._job_checked = time.monotonic()
+            status = await sync_to_async(touch_job)(self.job_id)
+            self._job_cancelled = status == SyncJob.Status.CANCELLED
+
+        return self._job_cancelled
+
+    async def get_tasks(self, instruments: InstrumentMap) -> list[InstrumentTask]:
+        """Tasks which can return data: periods with trading days, no daily polls of dormant instruments"""
         tasks = []
-        today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        last_candles = await self.get_last_candles(instruments)
+        now = timezone.now()
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_date = today if self.interval == CandleIntervalType.DAY else now.replace(second=0, microsecond=0)
+        sync_states = await self.get_sync_states(instruments)
+        calendar = await sync_to_async(TradingCalendar.load)((today - self.CALENDAR_WINDOW).date())
 
         for instrument in instruments:
-            start_date = self.get_start_date(last_candles.get(instrument.id))
-            tasks.extend(self.create_tasks_for_period(instrument.tinkoff_uid, start_date, today))
+            sync_state = sync_states.get(instrument.id)
+            if self.is_dormant(instrument, sync_state, today):
+                continue
+
+            start_date = self.get_start_date(sync_state, end_date)
+            if not calendar.has_trading_day(instrument.exchange_id, start_date, today):
+                continue
+
+            tasks.extend(self.create_tasks_for_period(instrument, start_date, end_date))
 
         return tasks
 
-    @staticmethod
+    def is_dormant(self, instrument: InstrumentRef, sync_state: Optional[SyncState], today: datetime.datetime) -> bool:
+        """Instrument without trading for long (e.g. delisted), checked once a week staggered by id"""
+        if not sync_state or not sync_state.is_complete:
+            return False
+        if instrument.trading_status == NORMAL_TRADING_STATUS:
+            return False
+        if today - sync_state.last_time < self.DORMANT_AFTER:
+            return False
+        return (today.toordinal() + instrument.id) % 7 != 0
+
     def get_start_date(
-        last_candle: Optional[Candle]
+        self,
+        sync_state: Optional[SyncState],
+        end_date: datetime.datetime,
     ) -> datetime.datetime:
-        if last_candle:
-            return last_candle.time + datetime.timedelta(days=1) if last_candle.is_complete else last_candle.time
+        if sync_state:
+            if sync_state.is_complete:
+                return sync_state.last_time + self.INTERVAL_DURATIONS[self.interval]
+            return sync_state.last_time
 
+        if self.interval in self.INTRADAY_HISTORY:
+            return end_date - self.INTRADAY_HISTORY[self.interval]
         return datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
 
     def create_tasks_for_period(
         self,
-        instrument_uid: str,
+        instrument: InstrumentRef,
         start_date: datetime.datetime,
         end_date: datetime.datetime
     ) -> list[InstrumentTask]:
         tasks = []
         current_start = start_date
+        max_period = self.API_MAX_PERIODS[self.interval]
+        # Daily periods are inclusive dates, intraday ones are half-open and follow each other
+        step = datetime.timedelta(days=1) if self.interval == CandleIntervalType.DAY else datetime.timedelta(0)
 
         while current_start <= end_date:
             current_end = min(
-                current_start + self.API_MAX_PERIOD,
+                current_start + max_period,
                 end_date
             )
 
             tasks.append(InstrumentTask(
                 start_date=current_start,
                 end_date=current_end,
-                instrument_uid=instrument_uid
+                instrument_uid=instrument.tinkoff_uid,
+                instrument_id=instrument.id,
             ))
 
-            current_start = current_end + datetime.timedelta(days=1)
+            if current_end >= end_date:
+                break
+            current_start = current_end + step
 
         return tasks
 
-    @staticmethod
-    async def get_last_candles(instruments: list[Instrument]) -> dict[int, Candle]:
-        instrument_ids = [i.id for i in instruments]
+    async def get_sync_states(self, instruments: InstrumentMap) -> dict[int, SyncState]:
+        query = SyncState.objects.filter(kind=SyncState.Kind.CANDLES, interval=self.interval)
+        sync_states = {s.instrument_id: s async for s in query if s.instrument_id in instruments.ids}
+
+        # Instruments synced before watermarks existed, seeded once from their candles
+        missing = [i.id for i in instruments if i.id not in sync_states]
+        if missing:
+            last_candles = await self.get_last_candles(missing)
+            watermarks = {i: (c.time, c.is_complete) for i, c in last_candles.items()}
+            await sync_to_async(advance_sync_states)(SyncState.Kind.CANDLES, self.interval, watermarks)
+
+            for instrument_id, (time, is_complete) in watermarks.items():
+                sync_states[instrument_id] = SyncState(
+                    instrument_id=instrument_id,
+                    kind=SyncState.Kind.CANDLES,
+                    interval=self.interval,
+                    last_time=time,
+                    is_complete=is_complete,
+                )
+
+        return sync_states
 
+    async def get_last_candles(self, instrument_ids: list[int]) -> dict[int, Candle]:
+        candles = Candle.objects.filter(interval=self.interval)
         if connection.vendor == 'postgresql':
-            query = (Candle.objects.filter(instrument_id__in=instrument_ids))
+            query = candles.filter(instrument_id__in=instrument_ids)
             query = query.order_by('instrument_id', '-time').distinct('instrument_id')
         else:
-            subquery = Candle.objects.filter(instrument_id=OuterRef('instrument_id'))
+            subquery = candles.filter(instrument_id=OuterRef('instrument_id'))
             subquery = subquery.order_by('-time').values('id')[:1]
-            query = Candle.objects.filter(id__in=Subquery(subquery))
+            query = candles.filter(instrument_id__in=instrument_ids, id__in=Subquery(subquery))
 
         return {c.instrument_id: c async for c in query}
 
-    async def save_candles(self, task: InstrumentTask, candles: list[HistoricCandle]):
-        instrument = await Instrument.objects.aget(tinkoff_uid=task.instrument_uid)
-        candle_objs = []
-        latest_prices = {} # {instrument_uid: price}
-
-        for candle in candles:
-            close = float(quotation_to_decimal(candle.close))
-            candle_objs.append(Candle(
-                instrument=instrument,
-                time=candle.time,
-                open=float(quotation_to_decimal(candle.open)),
-                high=float(quotation_to_decimal(candle.high)),
-                low=float(quotation_to_decimal(candle.low)),
-                close=close,
-                volume=candle.volume,
-                is_complete=candle.is_complete
-            ))
-            latest_prices[instrument.tinkoff_uid] = close
+    @staticmethod
+    def parse_candles(task: InstrumentTask, candles: list[HistoricCandle]) -> list[tuple]:
+        return [ # See bulk.CANDLE_COLUMNS
+            (
+                task.instrument_id,
+                candle.time,
+                float(quotation_to_decimal(candle.open)),
+                float(quotation_to_decimal(candle.high)),
+                float(quotation_to_decimal(candle.low)),
+                float(quotation_to_decimal(candle.close)),
+                candle.volume,
+                candle.is_complete,
+            )
+            for candle in candles
+        ]
 
-        await Candle.objects.abulk_create(
-            candle_objs,
-            update_conflicts=True,
-            update_fields=['open', 'high', 'low', 'close', 'volume', 'is_complete'],
-            unique_fields=['instrument', 'time']
-        )
+    async def write_batches(self, batches: list[CandleBatch]):
+        rows = list(chain.from_iterable(batch.rows for batch in batches))
+        task_ids = [b.task.job_task_id for b in batches if b.task.job_task_id is not None]
+        # Own thread and connection per write, so writers don't queue up behind each other
+        await sync_to_async(self._write_rows, thread_sensitive=False)(rows, self.interval, self.job_id, task_ids)
+
+        # Only today's daily candle is a current price, backfilled history and other intervals aren't
+        if self.interval != CandleIntervalType.DAY:
+            return
+
+        today = timezone.now().date()
+        prices = {}
+        for batch in batches:
+            latest = max(batch.rows, key=lambda row: row[1])
+            if latest[1].date() == today:
+                prices[batch.task.instrument_uid] = (latest[1], latest[5])
+        if prices:
+            self.broadcaster.publish(prices)
+
+    @staticmethod
+    def _write_rows(
+        rows: list[tuple],
+        interval: str,
+        job_id: Optional[int] = None,
+        task_ids: list[int] = (),
+    ) -> int:
+        try:
+            with transaction.atomic():
+                written = write_candles(rows, interval)
+                if job_id is not None:
+                    complete_job_tasks(job_id, task_ids, len(rows))
+            return written
+        finally:
+            connection.close()
 
 
 class DividendServiceAsync(BaseAsyncTinkoffService):
+    DIVIDEND_HISTORY_START = datetime.datetime(2000, 8, 21, tzinfo=datetime.timezone.utc)
+    DIVIDEND_LOOKAHEAD = datetime.timedelta(days=5 * 365) # Announcements of future payments
+    DIVIDEND_LOOKBACK = datetime.timedelta(days=365) # Corrections of recent payments
+    DIVIDEND_RECHECK_DAYS = 7 # Instruments without recent dividends are checked once per this period
+    DIVIDEND_FIELDS = (
+        'currency_id',
+        'dividend_net',
+        'payment_date',
+        'declared_date',
+        'ex_dividend_date',
+        'dividend_type',
+        'regularity',
+        'close_price',
+        'yield_value',
+    )
+
+    def __init__(
+        self,
+        rate_limiter: Optional[RateLimiter] = None,
+        transport: Optional[Transport] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        super().__init__(rate_limiter, transport, retry_policy)
+        self.currencies: dict[str, int] = {} # {ISO code: currency id}
+        self.stats = {'tasks': 0, 'written': 0, 'unchanged': 0, 'failed': 0}
+
     async def get_dividends(self, task: InstrumentTask):
         if not self._check_services():
             return None
@@ -343,46 +638,80 @@ class DividendServiceAsync(BaseAsyncTinkoffService):
             to=task.end_date,
         )
 
-    async def process_tasks(self, tasks: list[InstrumentTask]):
-        semaphore = asyncio.Semaphore(self.API_MAX_CALLS)
-
+    async def process_tasks(self, tasks: list[InstrumentTask], concurrency: int = None):
         async def process_task(task: InstrumentTask):
-            async with semaphore:
+            try:
                 dividends = await self.get_dividends(task)
-                if dividends and dividends.dividends:
-                    await self.save_dividends(task.instrument_uid, dividends.dividends)
+            except AioRequestError as e:
+                # The watermark stays, so the instrument is retried on the next run
+                logger.error(f'[Failed] {task.instrument_uid} [{task.start_date} - {task.end_date}]: {e}')
+                self.stats['failed'] += 1
+                return
+
+            if dividends and dividends.dividends:
+                await self.save_dividends(task, dividends.dividends)
+            await sync_to_async(advance_sync_states)(
+                SyncState.Kind.DIVIDENDS,
+                '',
+                {task.instrument_id: (min(task.end_date, timezone.now()), True)},
+            )
 
-        await self._process_batch(tasks, process_task)
+        self.stats['tasks'] = len(tasks)
+        await self._run_tasks(tasks, process_task, concurrency)
+
+    async def get_tasks(self, instruments: InstrumentMap, full: bool = False) -> list[InstrumentTask]:
+        """Full history for new instruments (or on demand), a sliding window for synced ones"""
+        now = timezone.now()
+        end_date = now + self.DIVIDEND_LOOKAHEAD
+        self.currencies = instruments.currencies
+
+        if full:
+            return [
+                InstrumentTask(self.DIVIDEND_HISTORY_START, end_date, i.tinkoff_uid, i.id)
+                for i in instruments
+            ]
+
+        synced = {
+            instrument_id: last_time
+            async for instrument_id, last_time in SyncState.objects.filter(
+                kind=SyncState.Kind.DIVIDENDS
+            ).values_list('instrument_id', 'last_time')
+        }
+        # Instruments with a recent or upcoming record date are checked on every run
+        active = {
+            instrument_id
+            async for instrument_id in Dividend.objects.filter(
+                record_date__gte=now - self.DIVIDEND_LOOKBACK
+            ).values_list('instrument_id', flat=True).distinct()
+        }
 
-    @staticmethod
-    async def get_tasks(instruments: list[Instrument]) -> list[InstrumentTask]:
-        start_date = datetime.datetime(2000, 8, 21, 0, 0, 0, 0, datetime.timezone.utc)
-        end_date = timezone.now() + datetime.timedelta(days=5*365)
-
-        return [
-            InstrumentTask(start_date, end_date, i.tinkoff_uid)
-            for i in instruments
-        ]
+        tasks = []
+        for instrument in instruments:
+            last_time = synced.get(instrument.id)
+            if last_time is None:
+                tasks.append(InstrumentTask(self.DIVIDEND_HISTORY_START, end_date, instrument.tinkoff_uid, instrument.id))
+            elif instrument.id in active or self.is_recheck_due(instrument.id, last_time, now):
+                tasks.append(InstrumentTask(now - self.DIVIDEND_LOOKBACK, end_date, instrument.tinkoff_uid, instrument.id))
 
-    @staticmethod
-    async def save_dividends(instrument_uid: str, dividends: list[DividendDataClass]):
-        instrument = await Instrument.objects.aget(tinkoff_uid=instrument_uid)
-        currency_codes = list(set([d.dividend_net.currency.upper() for d in dividends]))
+        return tasks
 
-        currencies = await sync_to_async(dict)(
-            Currency.objects.filter(iso_code__in=currency_codes).values_list('iso_code', 'id')
-        )
+    def is_recheck_due(self, instrument_id: int, last_time: datetime.datetime, now: datetime.datetime) -> bool:
+        # Staggered by id, so every day a different slice of quiet instruments is checked
+        if (now.toordinal() + instrument_id) % self.DIVIDEND_RECHECK_DAYS == 0:
+            return True
+        return now - last_time >= datetime.timedelta(days=self.DIVIDEND_RECHECK_DAYS)
 
+    async def save_dividends(self, task: InstrumentTask, dividends: list[DividendDataClass]):
         dividends_objs = []
         for d in dividends:
-            currency_id = currencies.get(d.dividend_net.currency.upper())
+            currency_id = self.currencies.get(d.dividend_net.currency.upper())
 
             if not currency_id:
-                logger.critical(f'for task {instrument_uid} there is not appropriate currency')
+                logger.critical(f'for task {task.instrument_uid} there is not appropriate currency')
                 continue
 
             dividends_objs.append(Dividend(
-                instrument=instrument,
+                instrument_id=task.instrument_id,
                 currency_id=currency_id,
                 dividend_net=float(money_to_decimal(d.dividend_net)),
                 payment_date=d.payment_date,
@@ -395,8 +724,13 @@ class DividendServiceAsync(BaseAsyncTinkoffService):
                 yield_value=float(quotation_to_decimal(d.yield_value)),
             ))
 
+        changed = await self.get_changed_dividends(task, dividends_objs)
+        self.stats['unchanged'] += len(dividends_objs) - len(changed)
+        if not changed:
+            return
+
         await Dividend.objects.abulk_create(
-            dividends_objs,
+            changed,
             update_conflicts=True,
             update_fields=[
                 'currency',
@@ -412,25 +746,128 @@ class DividendServiceAsync(BaseAsyncTinkoffService):
             ],
             unique_fields=['instrument', 'record_date']
         )
+        self.stats['written'] += len(changed)
+
+    async def get_changed_dividends(self, task: InstrumentTask, dividends: list[Dividend]) -> list[Dividend]:
+        """Dividends which are new or differ from the stored ones"""
+        existing = {
+            values[0]: values[1:]
+            async for values in Dividend.objects.filter(
+                instrument_id=task.instrument_id,
+                record_date__in=[d.record_date for d in dividends],
+            ).values_list('record_date', *self.DIVIDEND_FIELDS)
+        }
+
+        return [
+            d for d in dividends
+            if existing.get(d.record_date) != tuple(getattr(d, f) for f in self.DIVIDEND_FIELDS)
+        ]
+
 
-async def dividend_main():
+async def dividend_main(concurrency: int = None, full: bool = False) -> dict:
     async with DividendServiceAsync() as service:
-        # Get Queryset
-        shares = await sync_to_async(list)(Instrument.objects.filter(instrument_type='share'))
+        # Get Identity Map
+        shares = await InstrumentMap.aload(Instrument.objects.filter(instrument_type='share'))
         # Get Tasks
-        tasks = await service.get_tasks(shares)
+        tasks = await service.get_tasks(shares, full)
         # Process Tasks
-        await service.process_tasks(tasks)
+        await service.process_tasks(tasks, concurrency)
 
+    logger.info(f'[Dividends] {service.stats}')
+    return service.stats
 
-async def candle_main():
-    async with CandleServiceAsync() as service:
-        # Get Queryset
-        instruments = await sync_to_async(list)(Instrument.objects.all())
-        # Get Tasks
-        tasks = await service.get_tasks(instruments)
+
+async def plan_candle_job(job_id: int = None, interval: str = CandleIntervalType.DAY) -> Optional[SyncJob]:
+    """The given job, a crashed one or a new plan; None while another job of the interval is alive
+    or when the given job is unknown or completed already"""
+    kind = SyncState.Kind.CANDLES
+
+    if job_id is None and await sync_to_async(get_active_job)(kind, interval):
+        logger.warning(f'[Candles] another {interval} sync job is running, skipped')
+        return None
+
+    try:
+        job = await sync_to_async(get_resumable_job)(kind, job_id, interval)
+    except SyncJob.DoesNotExist:
+        logger.warning(f'[Candles] job #{job_id} does not exist or is completed, skipped')
+        return None
+    if job is not None:
+        logger.info(f'[Candles] resuming job #{job.pk}')
+        return job
+
+    # Get Identity Map
+    instruments = await InstrumentMap.aload()
+    # Get Tasks
+    tasks = await CandleServiceAsync(interval=interval).get_tasks(instruments)
+    if tasks:
+        # History of new instruments and backfills would land in the default partition
+        since = min(task.start_date for task in tasks).date()
+        await sync_to_async(ensure_candle_partitions)(since=since, interval=interval)
+    return await sync_to_async(create_job)(kind, tasks, interval)
+
+
+async def run_candle_job(job_id: int, concurrency: int = None, shard: int = 0, shards: int = 1) -> dict:
+    """Process unfinished tasks of a started job, or of its shard.
+
+    The job is finished by the caller once every shard is over, so a crash
+    only fails the tasks of this shard and is returned as ``error``.
+    """
+    job = await SyncJob.objects.aget(pk=job_id)
+    tasks = await sync_to_async(load_job_tasks)(job, shard, shards)
+    error = ''
+
+    async with CandleServiceAsync(interval=job.interval or CandleIntervalType.DAY) as service:
         # Process Tasks
-        await service.process_tasks(tasks)
+        try:
+            await service.process_tasks(tasks, concurrency, job.pk)
+        except Exception as e:
+            logger.exception(f'[Candles] shard {shard}/{shards} of job {job.pk} failed')
+            error = repr(e)
+            await sync_to_async(fail_job_tasks)([task.job_task_id for task in tasks], error)
+
+    stats = {name: stats.as_dict() for name, stats in service.stats.items()}
+    if error:
+        stats['error'] = error
+    return stats
+
+
+async def candle_main(concurrency: int = None, job_id: int = None, interval: str = CandleIntervalType.DAY) -> dict:
+    """Run a new candle sync job, or resume the given / crashed one, in this process"""
+    job = await plan_candle_job(job_id, interval)
+    if job is None:
+        return {'status': 'skipped'}
+
+    await sync_to_async(start_job)(job)
+    stats = await run_candle_job(job.pk, concurrency)
+    job = await sync_to_async(finish_job)(job.pk, stats.pop('error', ''))
+    stats.update(await sync_to_async(after_candle_sync)(job.interval or CandleIntervalType.DAY))
+
+    return {'job': job.pk, 'status': job.status, **stats}
+
+
+def after_candle_sync(interval: str) -> dict:
+    """Data derived from synced candles: weekly/monthly rollups of daily ones, the analytics cache and returns"""
+    result = {}
+    intervals = [interval]
+    if interval == CandleIntervalType.DAY:
+        result['rollup'] = rollup_main()
+        intervals.extend(ROLLUP_INTERVALS)
+
+    result['cache'] = {i: refresh_candle_cache(i) for i in intervals}
+    # Consumers which missed older changes rebuild their data
+    result['pruned_changes'] = prune_candle_changes(timezone.now())
+    if interval == CandleIntervalType.DAY:
+        # Only companies whose candles changed are recomputed
+        result['returns'] = returns_main()
+    return result
+
+
+async def calendar_main() -> dict:
+    async with CalendarServiceAsync() as service:
+        days = await service.refresh_trading_days()
+        statuses = await service.refresh_trading_statuses(await InstrumentMap.aload())
+
+    return {'trading_days': days, 'trading_statuses': statuses}
 
 
 async def instrument_main():
@@ -0,0 +1,85 @@
+from typing import Optional
+import asyncio
+import datetime
+import logging
+
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+
+class PriceBroadcaster:
+    """Collects price changes over a short window and sends them to Channels in batches.
+
+    Only the latest price per instrument survives the window, then one message
+    goes to the company list group and one to the group of company detail
+    consumers, which pick the updates of their instrument. Prices older than an
+    already published one are dropped, so chunks of history written out of
+    order never roll a price back.
+    """
+    LIST_GROUP = 'price_updates'
+    INSTRUMENT_GROUP = 'instrument_prices'
+
+    def __init__(self, window: float = 1.0, channel_layer=None):
+        self.window = window # Seconds
+        self.channel_layer = channel_layer
+        self.sent = 0 # group_send calls
+        self._pending: dict[str, float] = {} # {instrument_uid: price}
+        self._times: dict[str, datetime.datetime] = {} # {instrument_uid: time of the latest price}
+        self._timer: Optional[asyncio.Task] = None # Waiting for the window to end
+        self._flushing: set[asyncio.Task] = set() # Sending their batches
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        # Batches already taken from the pending ones are sent before exit
+        await asyncio.gather(*self._flushing)
+        await self.flush()
+
+    def publish(self, prices: dict[str, tuple[datetime.datetime, float]]) -> None:
+        """Queue {instrument_uid: (time, price)} for the next batch"""
+        for uid, (time, price) in prices.items():
+            if uid in self._times and self._times[uid] > time:
+                continue
+            self._times[uid] = time
+            self._pending[uid] = price
+
+        if self._pending and self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        self._timer = None
+        task = asyncio.current_task()
+        self._flushing.add(task)
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception('Price broadcast failed')
+        finally:
+            self._flushing.discard(task)
+
+    async def flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        channel_layer = self.channel_layer or get_channel_layer()
+        timestamp = str(datetime.datetime.now(datetime.timezone.utc))
+        updates = [
+            {'uid': uid, 'price': price, 'timestamp': timestamp}
+            for uid, price in pending.items()
+        ]
+
+        sends = [
+            # For Company List
+            channel_layer.group_send(self.LIST_GROUP, {'type': 'send_price_updates', 'data': updates}),
+            # For Company Detail
+            channel_layer.group_send(self.INSTRUMENT_GROUP, {'type': 'instrument_price_updates', 'data': updates}),
+        ]
+        await asyncio.gather(*sends)
+        self.sent += len(sends)
@@ -0,0 +1,229 @@
+import datetime
+import io
+
+from django.db import connection, transaction
+from django.db.models import Min
+
+from apps.invest.models import Candle, CandleChange, CandleIntervalType, SyncState
+
+# Order of values in a candle row tuple
+CANDLE_COLUMNS = ('instrument_id', 'time', 'open', 'high', 'low', 'close', 'volume', 'is_complete')
+CANDLE_UPDATE_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'is_complete']
+CANDLE_STAGE_TABLE = 'invest_candle_stage'
+# Consumers of CandleChange rows older than this rebuild their data from scratch
+CANDLE_CHANGE_RETENTION = datetime.timedelta(days=7)
+
+# {instrument id: (time of the latest record, is complete)}
+Watermarks = dict[int, tuple[datetime.datetime, bool]]
+
+
+def write_candles(rows: list[tuple], interval: str = CandleIntervalType.DAY, sync_state: bool = True) -> int:
+    """Upsert candle rows (see CANDLE_COLUMNS), COPY on PostgreSQL and bulk_create elsewhere.
+
+    ``sync_state=False`` leaves the sync watermarks alone, for writers whose
+    rows must not hide older candles from the batch sync, e.g. the live stream.
+    Otherwise rows older than the watermark of their instrument are recorded
+    as a CandleChange, so the cache and rollups rewrite them too.
+    """
+    if not rows:
+        return 0
+
+    if connection.vendor == 'postgresql':
+        return copy_candles(rows, interval, sync_state)
+    return bulk_create_candles(rows, interval, sync_state)
+
+
+def bulk_create_candles(rows: list[tuple], interval: str = CandleIntervalType.DAY, sync_state: bool = True) -> int:
+    with transaction.atomic():
+        Candle.objects.bulk_create(
+            [Candle(interval=interval, **dict(zip(CANDLE_COLUMNS, row))) for row in unique_candles(rows)],
+            update_conflicts=True,
+            update_fields=CANDLE_UPDATE_FIELDS,
+            unique_fields=['instrument', 'interval', 'time'],
+        )
+        if sync_state:
+            record_candle_changes(interval, candle_starts(rows))
+            advance_sync_states(SyncState.Kind.CANDLES, interval, candle_watermarks(rows))
+    return len(rows)
+
+
+def copy_candles(rows: list[tuple], interval: str = CandleIntervalType.DAY, sync_state: bool = True) -> int:
+    """Stream rows into a staging table with COPY and merge them in one statement.
+
+    Of rows with the same time a complete one wins, then the one written last
+    (staging sequence), like in unique_candles.
+    """
+    table = Candle._meta.db_table
+    qn = connection.ops.quote_name
+    columns = ', '.join(CANDLE_COLUMNS)
+    updates = ', '.join(f'{field} = EXCLUDED.{field}' for field in CANDLE_UPDATE_FIELDS)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Temporary tables are never WAL-logged and are private to the session,
+        # so concurrent writers don't see each other's staged rows
+        cursor.execute(
+            f'CREATE TEMP TABLE IF NOT EXISTS {CANDLE_STAGE_TABLE} ('
+            f'instrument_id bigint, time timestamp with time zone, '
+            f'open double precision, high double precision, low double precision, '
+            f'close double precision, volume double precision, is_complete boolean, seq bigserial'
+            f') ON COMMIT DELETE ROWS'
+        )
+        # Rows of an earlier write in the same transaction are still there
+        cursor.execute(f'TRUNCATE {CANDLE_STAGE_TABLE}')
+        copy_rows(cursor, CANDLE_STAGE_TABLE, CANDLE_COLUMNS, rows)
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}, {qn("interval")}) '
+            f'SELECT DISTINCT ON (instrument_id, time) {columns}, %s FROM {CANDLE_STAGE_TABLE} '
+            f'ORDER BY instrument_id, time, is_complete DESC, seq DESC '
+            f'ON CONFLICT (instrument_id, {qn("interval")}, time) DO UPDATE SET {updates}',
+            [interval],
+        )
+        rowcount = cursor.rowcount
+        if sync_state:
+            merge_candle_changes(cursor, interval)
+            merge_sync_states(
+                cursor,
+                SyncState.Kind.CANDLES,
+                interval,
+                f'SELECT DISTINCT ON (instrument_id) instrument_id, time, is_complete FROM {CANDLE_STAGE_TABLE} '
+                f'ORDER BY instrument_id, time DESC, is_complete DESC, seq DESC',
+            )
+        return rowcount
+
+
+def candle_starts(rows: list[tuple]) -> dict[int, datetime.datetime]:
+    """Time of the oldest row of every instrument"""
+    starts = {}
+    for row in rows:
+        instrument_id, time = row[0], row[1]
+        if instrument_id not in starts or time < starts[instrument_id]:
+            starts[instrument_id] = time
+    return starts
+
+
+def unique_candles(rows: list[tuple]) -> list[tuple]:
+    """One row per instrument and time: a complete one, otherwise the last one"""
+    unique = {}
+    for row in rows:
+        key = (row[0], row[1])
+        if key not in unique or row[-1] or not unique[key][-1]:
+            unique[key] = row
+    return list(unique.values())
+
+
+def candle_watermarks(rows: list[tuple]) -> Watermarks:
+    watermarks = {}
+    for row in unique_candles(rows):
+        instrument_id, time, is_complete = row[0], row[1], row[-1]
+        current = watermarks.get(instrument_id)
+        if current is None or time >= current[0]:
+            watermarks[instrument_id] = (time, is_complete)
+    return watermarks
+
+
+def advance_sync_states(kind: str, interval: str, watermarks: Watermarks) -> None:
+    """Upsert watermarks, they never move back when writes land out of order"""
+    if not watermarks:
+        return
+
+    with transaction.atomic():
+        current = dict(
+            SyncState.objects.select_for_update()
+            .filter(kind=kind, interval=interval, instrument_id__in=watermarks)
+            .values_list('instrument_id', 'last_time')
+        )
+        SyncState.objects.bulk_create(
+            [
+                SyncState(instrument_id=instrument_id, kind=kind, interval=interval, last_time=time, is_complete=is_complete)
+                for instrument_id, (time, is_complete) in watermarks.items()
+                if instrument_id not in current or current[instrument_id] <= time
+            ],
+            update_conflicts=True,
+            update_fields=['last_time', 'is_complete', 'updated'],
+            unique_fields=['instrument', 'kind', 'interval'],
+        )
+
+
+def merge_sync_states(cursor, kind: str, interval: str, latest_sql: str) -> None:
+    """Same as advance_sync_states in one statement, latest_sql selects (instrument_id, time, is_complete)"""
+    table = SyncState._meta.db_table
+    qn = connection.ops.quote_name
+
+    cursor.execute(
+        f'INSERT INTO {table} (instrument_id, kind, {qn("interval")}, last_time, is_complete, updated) '
+        f'SELECT latest.instrument_id, %s, %s, latest.time, latest.is_complete, now() FROM ({latest_sql}) AS latest '
+        f'ON CONFLICT (instrument_id, kind, {qn("interval")}) DO UPDATE SET '
+        f'last_time = EXCLUDED.last_time, is_complete = EXCLUDED.is_complete, updated = EXCLUDED.updated '
+        f'WHERE {table}.last_time <= EXCLUDED.last_time',
+        [kind, interval],
+    )
+
+
+def record_candle_changes(interval: str, starts: dict[int, datetime.datetime]) -> None:
+    """Record instruments whose rows start below their watermark, called before the watermarks advance"""
+    watermarks = dict(
+        SyncState.objects.filter(kind=SyncState.Kind.CANDLES, interval=interval, instrument_id__in=starts)
+        .values_list('instrument_id', 'last_time')
+    )
+    CandleChange.objects.bulk_create([
+        CandleChange(instrument_id=instrument_id, interval=interval, since=since)
+        for instrument_id, since in starts.items()
+        if instrument_id in watermarks and since < watermarks[instrument_id]
+    ])
+
+
+def merge_candle_changes(cursor, interval: str) -> None:
+    """Same as record_candle_changes in one statement, for the rows of the staging table"""
+    qn = connection.ops.quote_name
+    cursor.execute(
+        f'INSERT INTO {CandleChange._meta.db_table} (instrument_id, {qn("interval")}, since, created) '
+        f'SELECT stage.instrument_id, %s, min(stage.time), now() FROM {CANDLE_STAGE_TABLE} AS stage '
+        f'JOIN {SyncState._meta.db_table} AS state ON state.instrument_id = stage.instrument_id '
+        f'AND state.kind = %s AND state.{qn("interval")} = %s '
+        f'WHERE stage.time < state.last_time GROUP BY stage.instrument_id',
+        [interval, SyncState.Kind.CANDLES, interval],
+    )
+
+
+def candle_changes(interval: str, since: datetime.datetime) -> dict[int, datetime.datetime]:
+    """Time of the oldest candle written below the watermark since ``since``, per instrument"""
+    return dict(
+        CandleChange.objects.filter(interval=interval, created__gte=since)
+        .values('instrument_id')
+        .annotate(oldest=Min('since'))
+        .values_list('instrument_id', 'oldest')
+    )
+
+
+def prune_candle_changes(now: datetime.datetime) -> int:
+    deleted, _ = CandleChange.objects.filter(created__lt=now - CANDLE_CHANGE_RETENTION).delete()
+    return deleted
+
+
+def copy_rows(cursor, table: str, columns: tuple[str, ...], rows: list[tuple]) -> None:
+    sql = f'COPY {table} ({", ".join(columns)}) FROM STDIN'
+    raw_cursor = cursor.cursor
+
+    if hasattr(raw_cursor, 'copy'): # psycopg 3
+        with raw_cursor.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+        return
+
+    # psycopg2
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(map(_copy_value, row)))
+        buffer.write('\n')
+    buffer.seek(0)
+    raw_cursor.copy_expert(sql, buffer)
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return r'\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return str(value)
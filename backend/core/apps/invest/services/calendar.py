@@ -0,0 +1,34 @@
+from collections import defaultdict
+import datetime
+
+from apps.invest.models import TradingDay
+
+
+class TradingCalendar:
+    """Trading days of exchanges for planning, unknown days count as trading ones"""
+
+    def __init__(self, days: dict[int, dict[datetime.date, bool]]):
+        self._days = days # {exchange id: {date: is trading day}}
+
+    @classmethod
+    def load(cls, since: datetime.date) -> 'TradingCalendar':
+        days = defaultdict(dict)
+        for exchange_id, date, is_trading_day in TradingDay.objects.filter(date__gte=since).values_list(
+            'exchange_id',
+            'date',
+            'is_trading_day',
+        ):
+            days[exchange_id][date] = is_trading_day
+        return cls(days)
+
+    def has_trading_day(self, exchange_id: int, start: datetime.datetime, end: datetime.datetime) -> bool:
+        days = self._days.get(exchange_id)
+        if not days:
+            return True
+
+        date = start.date()
+        while date <= end.date():
+            if days.get(date, True):
+                return True
+            date += datetime.timedelta(days=1)
+        return False
@@ -0,0 +1,261 @@
+"""Columnar cache of candles for analytics.
+
+Every instrument and interval has a directory with one raw file per column
+(int64 unix seconds for time, float64 for OHLCV) and a meta.json holding the
+number of valid rows. Readers map the files read-only with np.memmap, so all
+processes share the pages of the OS cache and get NumPy views without
+building model instances.
+
+Refreshes are incremental: rows are rewritten in place from the latest cached
+candle (it may have been incomplete), files never shrink and meta.json is
+replaced atomically after the columns are written, so readers never see a
+partially written row. When older candles were written (see CandleChange) the
+instrument is rebuilt into a new generation of files instead, readers keep
+their mapping of the previous one.
+
+The cache lives on the local disk of every host, so readers refresh it before
+loading candles (see returns.load_matrices). A file lock keeps one writer per
+host and every host remembers when it refreshed last.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+import datetime
+import fcntl
+import json
+import logging
+import os
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from apps.invest.models import CandleIntervalType, SyncState
+from apps.invest.services.archive import CandleArrays, candle_arrays, candle_arrays_batch
+from apps.invest.services.bulk import CANDLE_CHANGE_RETENTION, candle_changes
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+CACHE_COLUMNS = {
+    'time': np.int64,
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.float64,
+}
+# Writes committed shortly after a refresh started may carry an earlier time
+REFRESH_OVERLAP = datetime.timedelta(minutes=5)
+
+
+@dataclass(frozen=True)
+class CachedCandles:
+    """Read-only column views of one instrument's candles, ordered by time"""
+    time: np.ndarray # Unix seconds
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self):
+        return len(self.time)
+
+
+class CandleCache:
+    def __init__(self, root: Optional[os.PathLike] = None):
+        self.root = Path(root or settings.CANDLE_CACHE_DIR)
+
+    def path(self, instrument_id: int, interval: str) -> Path:
+        return self.root / interval / str(instrument_id)
+
+    def read(self, instrument_id: int, interval: str = CandleIntervalType.DAY) -> Optional[CachedCandles]:
+        path = self.path(instrument_id, interval)
+        # A rebuild may remove the files between reading meta.json and mapping them
+        for _ in range(2):
+            meta = self._meta(path)
+            if meta is None:
+                return None
+            length = meta['length']
+            try:
+                return CachedCandles(**{
+                    name: (
+                        np.memmap(path / self._file_name(name, meta), dtype=dtype, mode='r', shape=(length,))
+                        if length else np.empty(0, dtype)
+                    )
+                    for name, dtype in CACHE_COLUMNS.items()
+                })
+            except FileNotFoundError:
+                continue
+        return None
+
+    def write(
+        self,
+        instrument_id: int,
+        interval: str,
+        columns: dict[str, np.ndarray],
+        start: int = 0,
+        rebuild: bool = False,
+    ) -> int:
+        """Write columns from row ``start`` on, rows after them are dropped; returns the new length.
+
+        ``rebuild`` writes all rows into files of a new generation and removes
+        the previous ones, mappings of readers stay valid.
+        """
+        path = self.path(instrument_id, interval)
+        path.mkdir(parents=True, exist_ok=True)
+        previous = self._meta(path) or {'length': 0}
+        meta = {'generation': previous.get('generation', 0) + 1 if rebuild else previous.get('generation', 0)}
+
+        for name, dtype in CACHE_COLUMNS.items():
+            values = np.ascontiguousarray(columns[name], dtype=dtype)
+            file_path = path / self._file_name(name, meta)
+            with open(file_path, 'r+b' if file_path.exists() and not rebuild else 'wb') as file:
+                file.seek(start * values.itemsize)
+                file.write(values.tobytes())
+
+        meta['length'] = start + len(columns['time'])
+        self._replace(path / 'meta.json', meta)
+        if rebuild:
+            for name in CACHE_COLUMNS:
+                (path / self._file_name(name, previous)).unlink(missing_ok=True)
+        return meta['length']
+
+    def refresh_instrument(
+        self,
+        instrument_id: int,
+        interval: str,
+        changed_from: Optional[datetime.datetime] = None,
+    ) -> int:
+        """Append candles written since the latest cached one, returns the number of written rows.
+
+        When older candles changed (``changed_from`` is before the latest
+        cached one) the whole series is rewritten.
+        """
+        cached = self.read(instrument_id, interval)
+        since = None
+        if cached is not None and len(cached):
+            since = datetime.datetime.fromtimestamp(int(cached.time[-1]), datetime.timezone.utc)
+        rebuild = cached is not None and changed_from is not None and (since is None or changed_from < since)
+        if rebuild:
+            since = None
+
+        arrays = candle_arrays(instrument_id, interval, since)
+        if not len(arrays['time']) and not rebuild:
+            return 0
+
+        columns = {name: arrays[name] for name in CACHE_COLUMNS if name != 'time'}
+        columns['time'] = arrays['time'].astype('datetime64[s]').astype(np.int64)
+        start = int(np.searchsorted(cached.time, columns['time'][0])) if since else 0
+        self.write(instrument_id, interval, columns, start, rebuild=rebuild)
+        return len(columns['time'])
+
+    def refresh(self, interval: str = CandleIntervalType.DAY, instrument_ids: Optional[Iterable[int]] = None) -> int:
+        """Refresh instruments whose candles of the interval were written since the previous refresh.
+
+        Instruments with candles written below their watermark are rebuilt, all
+        of them when the previous refresh is older than the recorded changes.
+        """
+        with self._lock(interval):
+            started = timezone.now()
+            incremental = instrument_ids is None
+            changes = {}
+            if incremental:
+                states = SyncState.objects.filter(kind=SyncState.Kind.CANDLES, interval=interval)
+                refreshed = self._refreshed(interval)
+                if refreshed is None or refreshed < started - CANDLE_CHANGE_RETENTION:
+                    changes = dict.fromkeys(states.values_list('instrument_id', flat=True), EPOCH)
+                    states = states.none()
+                else:
+                    changes = candle_changes(interval, refreshed)
+                    states = states.filter(updated__gte=refreshed)
+                instrument_ids = set(states.values_list('instrument_id', flat=True)) | set(changes)
+
+            rows = instruments = 0
+            for instrument_id in list(instrument_ids):
+                rows += self.refresh_instrument(instrument_id, interval, changes.get(instrument_id))
+                instruments += 1
+
+            if incremental:
+                self._replace(self.root / interval / 'state.json', {'refreshed': (started - REFRESH_OVERLAP).isoformat()})
+        logger.info(f'[Cache] {rows} {interval} candles of {instruments} instruments refreshed')
+        return rows
+
+    def _refreshed(self, interval: str) -> Optional[datetime.datetime]:
+        try:
+            state = json.loads((self.root / interval / 'state.json').read_text())
+        except FileNotFoundError:
+            return None
+        return datetime.datetime.fromisoformat(state['refreshed'])
+
+    @contextmanager
+    def _lock(self, interval: str):
+        """Exclusive lock of the interval's cache among the processes of the host"""
+        path = self.root / interval / '.lock'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _meta(path: Path) -> Optional[dict]:
+        try:
+            return json.loads((path / 'meta.json').read_text())
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _file_name(name: str, meta: dict) -> str:
+        generation = meta.get('generation', 0)
+        return f'{name}.{generation}' if generation else name
+
+    @staticmethod
+    def _replace(path: Path, data: dict) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix('.tmp')
+        temp_path.write_text(json.dumps(data))
+        os.replace(temp_path, path)
+
+
+def load_candles(instrument_id: int, interval: str = CandleIntervalType.DAY) -> CachedCandles:
+    """Cached candles of the instrument, from the database when it isn't cached yet"""
+    cached = CandleCache().read(instrument_id, interval)
+    if cached is not None:
+        return cached
+
+    return cached_candles(candle_arrays(instrument_id, interval))
+
+
+def load_candles_batch(
+    instrument_ids: list[int],
+    interval: str = CandleIntervalType.DAY,
+    start: Optional[datetime.datetime] = None,
+) -> dict[int, CachedCandles]:
+    """Cached candles of the instruments, the ones not cached yet are loaded together from the database.
+
+    Candles before ``start`` may be left out for the instruments read from the database.
+    """
+    cache = CandleCache()
+    result = {instrument_id: cache.read(instrument_id, interval) for instrument_id in instrument_ids}
+    missing = [instrument_id for instrument_id, candles in result.items() if candles is None]
+    if missing:
+        for instrument_id, arrays in candle_arrays_batch(missing, interval, start).items():
+            result[instrument_id] = cached_candles(arrays)
+    return result
+
+
+def cached_candles(arrays: CandleArrays) -> CachedCandles:
+    return CachedCandles(
+        time=arrays['time'].astype('datetime64[s]').astype(np.int64),
+        **{name: arrays[name] for name in CACHE_COLUMNS if name != 'time'},
+    )
+
+
+def refresh_candle_cache(interval: str = CandleIntervalType.DAY) -> int:
+    return CandleCache().refresh(interval)
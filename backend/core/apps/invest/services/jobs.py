@@ -0,0 +1,140 @@
+import datetime
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from apps.invest.models import SyncJob, SyncJobTask
+from apps.invest.services.tinvest import InstrumentTask
+
+# A running job without heartbeat for this long is considered crashed
+JOB_HEARTBEAT_TIMEOUT = datetime.timedelta(minutes=5)
+
+
+def get_active_job(kind: str, interval: str = '') -> Optional[SyncJob]:
+    """Job of the kind which is being run by a live worker"""
+    return SyncJob.objects.filter(
+        kind=kind,
+        interval=interval,
+        status=SyncJob.Status.RUNNING,
+        heartbeat__gte=timezone.now() - JOB_HEARTBEAT_TIMEOUT,
+    ).first()
+
+
+def get_resumable_job(kind: str, job_id: Optional[int] = None, interval: str = '') -> Optional[SyncJob]:
+    """Requested job, or the latest one whose worker died before finishing it"""
+    if job_id is not None:
+        return SyncJob.objects.exclude(status=SyncJob.Status.COMPLETED).get(pk=job_id, kind=kind)
+
+    return SyncJob.objects.filter(kind=kind, interval=interval).filter(
+        Q(status=SyncJob.Status.PENDING)
+        | Q(status=SyncJob.Status.RUNNING, heartbeat__lt=timezone.now() - JOB_HEARTBEAT_TIMEOUT)
+    ).first()
+
+
+def create_job(kind: str, tasks: list[InstrumentTask], interval: str = '') -> SyncJob:
+    with transaction.atomic():
+        job = SyncJob.objects.create(kind=kind, interval=interval, total=len(tasks))
+        SyncJobTask.objects.bulk_create(
+            [
+                SyncJobTask(
+                    job=job,
+                    instrument_id=task.instrument_id,
+                    start_date=task.start_date,
+                    end_date=task.end_date,
+                )
+                for task in tasks
+            ],
+            batch_size=5000,
+        )
+    return job
+
+
+def load_job_tasks(job: SyncJob, shard: int = 0, shards: int = 1) -> list[InstrumentTask]:
+    """Tasks of the job which are not done yet, failed ones are retried.
+
+    With several shards every one gets the tasks of instruments whose id hashes to it.
+    """
+    query = job.tasks.exclude(status=SyncJobTask.Status.DONE)
+    if shards > 1:
+        query = query.annotate(shard=Mod('instrument_id', shards)).filter(shard=shard)
+
+    query = query.order_by('id').values_list(
+        'start_date',
+        'end_date',
+        'instrument__tinkoff_uid',
+        'instrument_id',
+        'id',
+    )
+    return [InstrumentTask(*values) for values in query]
+
+
+def start_job(job: SyncJob) -> None:
+    now = timezone.now()
+    job.status = SyncJob.Status.RUNNING
+    job.started = job.started or now
+    job.heartbeat = now
+    job.finished = None
+    job.error = ''
+    job.save(update_fields=['status', 'started', 'heartbeat', 'finished', 'error'])
+
+
+def touch_job(job_id: int) -> str:
+    """Refresh the heartbeat and return the current status, e.g. to notice a cancellation"""
+    SyncJob.objects.filter(pk=job_id, status=SyncJob.Status.RUNNING).update(heartbeat=timezone.now())
+    return SyncJob.objects.values_list('status', flat=True).get(pk=job_id)
+
+
+def complete_job_tasks(job_id: int, task_ids: list[int], rows: int) -> None:
+    """Checkpoint written tasks, called in the transaction of the write"""
+    if not task_ids:
+        return
+
+    SyncJobTask.objects.filter(pk__in=task_ids).update(
+        status=SyncJobTask.Status.DONE,
+        attempts=F('attempts') + 1,
+        error='',
+        updated=timezone.now(),
+    )
+    SyncJob.objects.filter(pk=job_id).update(rows=F('rows') + rows, heartbeat=timezone.now())
+
+
+def fail_job_task(task_id: int, error: str) -> None:
+    SyncJobTask.objects.filter(pk=task_id).update(
+        status=SyncJobTask.Status.FAILED,
+        attempts=F('attempts') + 1,
+        error=error,
+        updated=timezone.now(),
+    )
+
+
+def fail_job_tasks(task_ids: list[int], error: str) -> None:
+    """Mark tasks of a crashed worker or shard failed, the done ones keep their checkpoint"""
+    SyncJobTask.objects.filter(pk__in=task_ids).exclude(status=SyncJobTask.Status.DONE).update(
+        status=SyncJobTask.Status.FAILED,
+        attempts=F('attempts') + 1,
+        error=error,
+        updated=timezone.now(),
+    )
+
+
+def finish_job(job_id: int, error: str = '') -> SyncJob:
+    with transaction.atomic():
+        job = SyncJob.objects.select_for_update().get(pk=job_id)
+        if job.status != SyncJob.Status.CANCELLED:
+            unfinished = job.tasks.exclude(status=SyncJobTask.Status.DONE).exists()
+            job.status = SyncJob.Status.FAILED if error or unfinished else SyncJob.Status.COMPLETED
+        job.error = error
+        job.finished = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished'])
+    return job
+
+
+def with_progress(jobs):
+    """Annotate a SyncJob queryset with task counts per status"""
+    return jobs.annotate(
+        done=Count('tasks', filter=Q(tasks__status=SyncJobTask.Status.DONE)),
+        failed=Count('tasks', filter=Q(tasks__status=SyncJobTask.Status.FAILED)),
+    )
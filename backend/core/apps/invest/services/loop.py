@@ -0,0 +1,44 @@
+from typing import Coroutine, Optional
+import asyncio
+
+from asgiref.sync import sync_to_async
+from celery.signals import worker_process_init, worker_process_shutdown
+from django.db import close_old_connections
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Event loop owned by the current worker process, reused between tasks"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def run_async(coro: Coroutine):
+    """Run an async ingestion coroutine from a sync Celery task"""
+    async def runner():
+        try:
+            return await coro
+        finally:
+            # ORM calls of sync_to_async live in a separate thread, Celery won't clean it
+            await sync_to_async(close_old_connections)()
+
+    return get_event_loop().run_until_complete(runner())
+
+
+@worker_process_init.connect
+def open_event_loop(**kwargs):
+    # Prefork children must not inherit the parent's loop
+    global _loop
+    _loop = None
+    get_event_loop()
+
+
+@worker_process_shutdown.connect
+def close_event_loop(**kwargs):
+    if _loop is not None and not _loop.is_closed():
+        _loop.run_until_complete(_loop.shutdown_asyncgens())
+        _loop.close()
@@ -0,0 +1,200 @@
+"""Range partitioning of the candle table on PostgreSQL.
+
+invest_candle is partitioned by list of intervals into a daily table (daily,
+weekly and monthly candles, yearly partitions) and an intraday one (monthly
+partitions), both by range of time. Every partition has its own part of the
+unique (instrument, interval, time) index, so upserts and per-instrument
+reads only touch the partitions of their interval and period.
+"""
+from dataclasses import dataclass
+from typing import Iterator, Optional
+import datetime
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.invest.models import Candle, CandleIntervalType
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PartitionScheme:
+    name: str
+    intervals: tuple[str, ...]
+    months: int # Months per partition
+
+    def table(self, parent: str) -> str:
+        return f'{parent}_{self.name}'
+
+    def partition(self, parent: str, start: datetime.date) -> str:
+        suffix = f'{start:%Y}' if self.months == 12 else f'{start:%Y_%m}'
+        return f'{self.table(parent)}_{suffix}'
+
+    def period_start(self, date: datetime.date) -> datetime.date:
+        month = (date.month - 1) // self.months * self.months + 1
+        return datetime.date(date.year, month, 1)
+
+    def periods(self, since: datetime.date, until: datetime.date) -> Iterator[tuple[datetime.date, datetime.date]]:
+        start = self.period_start(since)
+        while start <= until:
+            month = start.month - 1 + self.months
+            end = datetime.date(start.year + month // 12, month % 12 + 1, 1)
+            yield start, end
+            start = end
+
+
+PARTITION_SCHEMES = (
+    PartitionScheme(
+        'daily',
+        (CandleIntervalType.DAY, CandleIntervalType.WEEK, CandleIntervalType.MONTH),
+        months=12,
+    ),
+    PartitionScheme(
+        'intraday',
+        (CandleIntervalType.MINUTE, CandleIntervalType.FIVE_MINUTES, CandleIntervalType.HOUR),
+        months=1,
+    ),
+)
+
+
+def is_partitioned(cursor, table: str) -> bool:
+    cursor.execute(
+        'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))',
+        [table],
+    )
+    return cursor.fetchone()[0]
+
+
+def create_partitions(cursor, parent: str, scheme: PartitionScheme, since: datetime.date, until: datetime.date) -> list[str]:
+    """Range partitions of the scheme's table covering [since, until], existing ones are skipped.
+
+    Candles of the period which landed in the default partition meanwhile are
+    moved into the new one, PostgreSQL refuses to create it over them.
+    """
+    table = scheme.table(parent)
+    default = f'{table}_default'
+    created = []
+    for start, end in scheme.periods(since, until):
+        name = scheme.partition(parent, start)
+        cursor.execute('SELECT to_regclass(%s)', [name])
+        if cursor.fetchone()[0] is not None:
+            continue
+
+        bounds = [start.isoformat(), end.isoformat()]
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {default} WHERE time >= %s AND time < %s)', bounds)
+        if cursor.fetchone()[0]:
+            cursor.execute(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {default} WHERE time >= %s AND time < %s RETURNING *) '
+                f'INSERT INTO {name} SELECT * FROM moved',
+                bounds,
+            )
+            logger.info(f'[Partitions] moved {cursor.rowcount} candles out of {default}')
+            cursor.execute(
+                f'ALTER TABLE {table} ATTACH PARTITION {name} '
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        else:
+            cursor.execute(
+                f'CREATE TABLE {name} PARTITION OF {table} '
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        created.append(name)
+    return created
+
+
+def ensure_candle_partitions(
+    ahead: Optional[int] = None,
+    since: Optional[datetime.date] = None,
+    interval: Optional[str] = None,
+) -> list[str]:
+    """Partitions from the current period up to ``ahead`` months from now, a no-op on a plain table.
+
+    With ``since`` the partitions of the ``interval``'s table start there
+    instead, e.g. at the oldest candle a sync job is about to write.
+    """
+    if connection.vendor != 'postgresql':
+        return []
+
+    ahead = settings.CANDLE_PARTITIONS_AHEAD if ahead is None else ahead
+    parent = Candle._meta.db_table
+    today = timezone.now().date()
+    until = (today.replace(day=1) + datetime.timedelta(days=31 * ahead))
+
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor, parent):
+            return []
+        for scheme in PARTITION_SCHEMES:
+            start = min(since, today) if since and interval in scheme.intervals else today
+            created.extend(create_partitions(cursor, parent, scheme, start, until))
+
+    if created:
+        logger.info(f'[Partitions] created {", ".join(created)}')
+    return created
+
+
+def partition_candles(ahead: Optional[int] = None) -> bool:
+    """Move invest_candle into a partitioned table, False when it's partitioned already.
+
+    Runs in one transaction and rewrites every candle, writers are locked out
+    until it commits, so run it in a maintenance window.
+    """
+    ahead = settings.CANDLE_PARTITIONS_AHEAD if ahead is None else ahead
+    parent = Candle._meta.db_table
+    old = f'{parent}_unpartitioned'
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(field.column) for field in Candle._meta.concrete_fields)
+    instrument_table = Candle._meta.get_field('instrument').related_model._meta.db_table
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if is_partitioned(cursor, parent):
+            return False
+
+        cursor.execute(f'LOCK TABLE {parent} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [parent])
+        old_sequence = cursor.fetchone()[0]
+        cursor.execute(f'ALTER TABLE {parent} RENAME TO {old}')
+
+        # Unique constraints of a partitioned table have to include the partition keys
+        cursor.execute(
+            f'CREATE TABLE {parent} (LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY, '
+            f'CONSTRAINT {parent}_partitioned_pkey PRIMARY KEY (id, {qn("interval")}, time), '
+            f'CONSTRAINT {parent}_instrument_interval_time_uniq UNIQUE (instrument_id, {qn("interval")}, time), '
+            f'CONSTRAINT {parent}_instrument_id_fk FOREIGN KEY (instrument_id) '
+            f'REFERENCES {instrument_table} (id) DEFERRABLE INITIALLY DEFERRED'
+            f') PARTITION BY LIST ({qn("interval")})'
+        )
+
+        today = timezone.now().date()
+        until = today.replace(day=1) + datetime.timedelta(days=31 * ahead)
+        for scheme in PARTITION_SCHEMES:
+            table = scheme.table(parent)
+            values = ', '.join(f"'{interval}'" for interval in scheme.intervals)
+            cursor.execute(
+                f'CREATE TABLE {table} PARTITION OF {parent} FOR VALUES IN ({values}) PARTITION BY RANGE (time)'
+            )
+            # Catches candles beyond the created partitions until the periodic task adds them
+            cursor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+            cursor.execute(f'SELECT min(time) FROM {old} WHERE {qn("interval")} IN ({values})')
+            first = cursor.fetchone()[0]
+            create_partitions(cursor, parent, scheme, first.date() if first else today, until)
+
+        cursor.execute(f'INSERT INTO {parent} ({columns}) SELECT {columns} FROM {old}')
+        logger.info(f'[Partitions] moved {cursor.rowcount} candles')
+
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [parent])
+        sequence = cursor.fetchone()[0]
+        if sequence is None:
+            # Serial column, the copied default still uses the sequence of the old table
+            cursor.execute(f'ALTER SEQUENCE {old_sequence} OWNED BY {parent}.id')
+        else:
+            cursor.execute(f'SELECT setval(%s, COALESCE(MAX(id), 0) + 1, false) FROM {parent}', [sequence])
+
+        cursor.execute(f'DROP TABLE {old}')
+
+    return True
@@ -0,0 +1,85 @@
+"""Materialization of the performance tables.
+
+CompanyPerformance rows remember when their returns were computed. A company
+is refreshed when its daily candles were written after that or when the rows
+are from a previous day (the periods moved). Exchange and sector/exchange
+rows are recomputed only for the groups of refreshed companies, from the
+stored rows of the other companies. Every table is written with one bulk
+upsert.
+"""
+import datetime
+
+import numpy as np
+from django.db import transaction
+
+from apps.invest.models import (
+    CandleIntervalType,
+    CompanyPerformance,
+    ExchangePerformance,
+    SectorExchange,
+    SyncState,
+)
+
+
+def dirty_companies(company_ids: np.ndarray, instrument_ids: np.ndarray, now: datetime.datetime) -> np.ndarray:
+    """Mask of companies whose returns are outdated, aligned with the arrays of ids"""
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    computed = dict(
+        CompanyPerformance.objects.filter(company_id__in=company_ids.tolist()).values_list('company_id', 'updated')
+    )
+    synced = dict(
+        SyncState.objects.filter(
+            kind=SyncState.Kind.CANDLES,
+            interval=CandleIntervalType.DAY,
+            instrument_id__in=instrument_ids.tolist(),
+        ).values_list('instrument_id', 'updated')
+    )
+
+    dirty = np.zeros(len(company_ids), dtype=bool)
+    for row, (company_id, instrument_id) in enumerate(zip(company_ids.tolist(), instrument_ids.tolist())):
+        updated = computed.get(company_id)
+        synced_at = synced.get(instrument_id)
+        dirty[row] = updated is None or updated < today or (synced_at is not None and synced_at >= updated)
+    return dirty
+
+
+def stored_company_performance(company_ids: np.ndarray, fields: list[str]) -> dict[str, np.ndarray]:
+    """Stored values of the companies aligned with ``company_ids``, NaN where missing"""
+    result = {field: np.full(len(company_ids), np.nan) for field in fields}
+    rows = {company_id: row for row, company_id in enumerate(company_ids.tolist())}
+
+    for company_id, *values in CompanyPerformance.objects.filter(
+        company_id__in=list(rows),
+    ).values_list('company_id', *fields):
+        for field, value in zip(fields, values):
+            if value is not None:
+                result[field][rows[company_id]] = value
+    return result
+
+
+def save_performance(
+    companies: list[CompanyPerformance],
+    exchanges: list[ExchangePerformance],
+    sector_exchanges: list[SectorExchange],
+    company_fields: list[str],
+    group_fields: list[str],
+) -> None:
+    with transaction.atomic():
+        CompanyPerformance.objects.bulk_create(
+            companies,
+            update_conflicts=True,
+            update_fields=company_fields + ['updated'],
+            unique_fields=['company'],
+        )
+        ExchangePerformance.objects.bulk_create(
+            exchanges,
+            update_conflicts=True,
+            update_fields=group_fields,
+            unique_fields=['exchange'],
+        )
+        SectorExchange.objects.bulk_create(
+            sector_exchanges,
+            update_conflicts=True,
+            update_fields=group_fields,
+            unique_fields=['sector', 'exchange'],
+        )
@@ -0,0 +1,153 @@
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+import asyncio
+import time
+
+from apps.invest.services.tinvest import InstrumentTask
+
+
+@dataclass
+class CandleBatch:
+    task: InstrumentTask
+    rows: list[tuple] # See bulk.CANDLE_COLUMNS
+
+
+@dataclass
+class StageStats:
+    """Throughput counters of one pipeline stage"""
+    name: str
+    batches: int = 0
+    rows: int = 0
+    busy: float = 0.0 # Seconds spent doing the stage's own work
+    blocked: float = 0.0 # Seconds spent waiting on the queue (backpressure)
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+
+    def add(self, rows: int, busy: float, batches: int = 1) -> None:
+        self.batches += batches
+        self.rows += rows
+        self.busy += busy
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'busy': round(self.busy, 3),
+            'blocked': round(self.blocked, 3),
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+    def __str__(self):
+        return (
+            f'[{self.name}] {self.batches} batches, {self.rows} rows in {self.elapsed:.1f}s '
+            f'({self.rows_per_second:.0f} rows/s, busy {self.busy:.1f}s, blocked {self.blocked:.1f}s)'
+        )
+
+
+class WriteStage:
+    """Bounded queue in front of writer workers which coalesce batches into bulk writes.
+
+    Producers ``await put(batch)`` and get suspended while the queue is full,
+    so slow writes throttle fetching instead of piling up parsed rows in memory.
+    """
+    POLL_INTERVAL = 0.05 # Seconds
+
+    def __init__(
+        self,
+        write: Callable[[list[CandleBatch]], Awaitable[None]],
+        workers: int = 2,
+        queue_size: int = 64,
+        max_rows: int = 50_000,
+        max_wait: float = 0.5,
+    ):
+        self.write = write
+        self.workers = workers
+        self.max_rows = max_rows
+        self.max_wait = max_wait # Seconds to wait for more batches before writing
+        self.queue: asyncio.Queue[Optional[CandleBatch]] = asyncio.Queue(maxsize=queue_size)
+        self.stats = StageStats('write')
+        self.put_blocked = 0.0 # Seconds producers spent waiting for free space
+        self.max_queue_size = 0
+        self.error: Optional[Exception] = None
+        self._workers: list[asyncio.Task] = []
+
+    async def __aenter__(self):
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            return
+
+        for _ in self._workers:
+            await self.queue.put(None)
+        await asyncio.gather(*self._workers)
+        self.stats.finished = time.monotonic()
+
+        if self.error:
+            raise self.error
+
+    async def put(self, batch: CandleBatch) -> None:
+        if self.error:
+            raise self.error
+
+        started = time.monotonic()
+        await self.queue.put(batch)
+        self.put_blocked += time.monotonic() - started
+        self.max_queue_size = max(self.max_queue_size, self.queue.qsize())
+
+    async def _collect(self) -> tuple[list[CandleBatch], bool]:
+        """Next group of batches to write and whether the stage was closed"""
+        batch = await self.queue.get()
+        if batch is None:
+            return [], True
+
+        batches, rows = [batch], len(batch.rows)
+        deadline = time.monotonic() + self.max_wait
+
+        while rows < self.max_rows:
+            try:
+                batch = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                await asyncio.sleep(min(timeout, self.POLL_INTERVAL))
+                continue
+
+            if batch is None:
+                return batches, True
+            batches.append(batch)
+            rows += len(batch.rows)
+
+        return batches, False
+
+    async def _worker(self) -> None:
+        closed = False
+        while not closed:
+            started = time.monotonic()
+            batches, closed = await self._collect()
+            self.stats.blocked += time.monotonic() - started
+            if not batches or self.error:
+                continue
+
+            started = time.monotonic()
+            try:
+                await self.write(batches)
+            except Exception as e:
+                # Keep draining the queue so producers don't hang, the error is raised on put/exit
+                self.error = e
+                continue
+            self.stats.add(sum(len(b.rows) for b in batches), time.monotonic() - started, len(batches))
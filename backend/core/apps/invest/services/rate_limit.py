@@ -0,0 +1,167 @@
+from typing import Callable, Optional
+import asyncio
+import threading
+import time
+
+# Tinkoff Invest API unary quotas, requests per minute per service
+API_QUOTAS = {
+    'market_data': 300,
+    'instruments': 200,
+}
+API_QUOTA_BURST = 10 # Requests
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of blocking under a lock.
+
+    Every ``acquire`` reserves the next free token and returns how long the
+    caller has to wait for it, so sync and async callers can share one bucket.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = rate # Tokens per second
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, limit: int, burst: int = API_QUOTA_BURST, **kwargs) -> 'TokenBucket':
+        """Bucket that never exceeds ``limit`` calls in any 60 second window"""
+        burst = min(burst, limit)
+        return cls(rate=(limit - burst) / 60, capacity=burst, **kwargs)
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Take ``tokens`` (possibly on credit) and return the delay in seconds"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1) -> None:
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+
+    async def areserve(self, tokens: float = 1) -> float:
+        return self.reserve(tokens)
+
+    async def aacquire(self, tokens: float = 1) -> None:
+        delay = await self.areserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class RedisTokenBucket(TokenBucket):
+    """Token bucket kept in Redis, so every worker and host draws from one quota.
+
+    The refill and the reservation run in one Lua script on Redis' own clock,
+    which keeps the bucket consistent without locks or synchronized hosts.
+    """
+    SCRIPT = '''
+        redis.replicate_commands()
+        local rate = tonumber(ARGV[1])
+        local capacity = tonumber(ARGV[2])
+        local requested = tonumber(ARGV[3])
+        local time = redis.call('TIME')
+        local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local tokens = tonumber(state[1]) or capacity
+        local updated = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate) - requested
+
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+        redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 60)
+
+        if tokens >= 0 then
+            return '0'
+        end
+        return tostring(-tokens / rate)
+    '''
+
+    def __init__(self, rate: float, capacity: float, client, key: str):
+        self.rate = rate # Tokens per second
+        self.capacity = capacity
+        self.key = key
+        self._script = client.register_script(self.SCRIPT)
+
+    def reserve(self, tokens: float = 1) -> float:
+        return float(self._script(keys=[self.key], args=[self.rate, self.capacity, tokens]))
+
+    async def areserve(self, tokens: float = 1) -> float:
+        # Sync client in a thread, an asyncio client would be bound to a single event loop
+        return await asyncio.to_thread(self.reserve, tokens)
+
+
+def local_backend(service: str, limit: int, burst: int) -> TokenBucket:
+    return TokenBucket.per_minute(limit, burst)
+
+
+def redis_backend(url: Optional[str] = None) -> Callable[[str, int, int], TokenBucket]:
+    import redis
+    from django.conf import settings
+
+    client = redis.Redis.from_url(url or settings.TINKOFF_RATE_LIMIT_REDIS_URL)
+
+    def backend(service: str, limit: int, burst: int) -> TokenBucket:
+        return RedisTokenBucket.per_minute(limit, burst, client=client, key=f'tinkoff:rate_limit:{service}')
+
+    return backend
+
+
+def settings_backend() -> Callable[[str, int, int], TokenBucket]:
+    from django.conf import settings
+
+    backend = getattr(settings, 'TINKOFF_RATE_LIMIT_BACKEND', 'local')
+    if backend == 'redis':
+        return redis_backend()
+    if backend == 'local':
+        return local_backend
+    raise ValueError(f'Unknown rate limit backend {backend}')
+
+
+class RateLimiter:
+    """Registry of per-service token buckets shared by all Tinkoff services.
+
+    ``backend`` builds a bucket for a service, ``local_backend`` keeps it in
+    process memory and ``redis_backend`` shares it between workers. By default
+    it's chosen by the TINKOFF_RATE_LIMIT_BACKEND setting on first use.
+    """
+
+    def __init__(
+        self,
+        quotas: Optional[dict[str, int]] = None,
+        burst: int = API_QUOTA_BURST,
+        backend: Optional[Callable[[str, int, int], TokenBucket]] = None,
+    ):
+        self.quotas = dict(quotas or API_QUOTAS)
+        self.burst = burst
+        self.backend = backend
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, service: str) -> TokenBucket:
+        with self._lock:
+            if service not in self._buckets:
+                if service not in self.quotas:
+                    raise KeyError(f'There is no API quota for service {service}')
+                if self.backend is None:
+                    self.backend = settings_backend()
+                self._buckets[service] = self.backend(service, self.quotas[service], self.burst)
+            return self._buckets[service]
+
+    def acquire(self, service: str) -> None:
+        self.bucket(service).acquire()
+
+    async def aacquire(self, service: str) -> None:
+        await self.bucket(service).aacquire()
+
+
+limiter = RateLimiter()
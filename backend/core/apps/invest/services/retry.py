@@ -0,0 +1,175 @@
+from typing import Awaitable, Callable, Optional, TypeVar
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from grpc import StatusCode
+from tinkoff.invest.exceptions import AioRequestError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+RATE_LIMIT_CODES = {StatusCode.RESOURCE_EXHAUSTED}
+TRANSIENT_CODES = {StatusCode.UNAVAILABLE, StatusCode.DEADLINE_EXCEEDED}
+
+
+class CircuitBreaker:
+    """Pauses every caller after a rate limit or a run of transient failures.
+
+    While open, callers wait for the pause to end instead of failing. Then a
+    single probe call goes through, the others hold on until it gets an answer.
+
+    The state lives in the worker process: candle sync shards in other workers
+    keep calling until they get a rate limit error themselves. The shared quota
+    is kept by the rate limiter (see rate_limit.RedisTokenBucket), the breaker
+    only stops a worker from hammering an endpoint that is already failing.
+    """
+    PROBE_WAIT = 1.0 # Seconds between checks while a probe is in flight
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0, clock=time.monotonic):
+        self.threshold = threshold # Consecutive transient failures to open the circuit
+        self.cooldown = cooldown # Seconds
+        self.failures = 0
+        self.opened = 0 # Times the circuit was opened
+        self._clock = clock
+        self._paused_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> tuple[float, bool]:
+        """Seconds the caller has to wait before calling the API, and whether it's the probe"""
+        with self._lock:
+            remaining = self._paused_until - self._clock()
+            if remaining > 0:
+                return remaining, False
+            if self._probing:
+                return self.PROBE_WAIT, False
+            if self.failures >= self.threshold:
+                self._probing = True
+                return 0.0, True
+            return 0.0, False
+
+    def wait_time(self) -> float:
+        """Seconds the caller has to wait before calling the API"""
+        return self.acquire()[0]
+
+    def release_probe(self) -> None:
+        """Let another caller probe, e.g. when the probe was cancelled before the API answered"""
+        with self._lock:
+            self._probing = False
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+            self._probing = False # The endpoint answered, a new probe goes after the pause
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.failures >= self.threshold:
+                self.opened += 1
+                self._paused_until = max(self._paused_until, self._clock() + self.cooldown)
+
+
+class RetryPolicy:
+    """Retries of async Tinkoff API calls.
+
+    Rate limit errors wait exactly until the quota resets (ratelimit-reset
+    metadata) and pause all callers through the circuit breaker, transient
+    gRPC errors back off exponentially with full jitter.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        base_delay: float = 0.5, # Seconds
+        max_delay: float = 30.0, # Seconds
+        rate_limit_delay: float = 61.0, # Seconds, when the API doesn't tell the reset time
+        rate_limit_jitter: float = 0.5, # Seconds, spreads callers resuming after a reset
+        breaker: Optional[CircuitBreaker] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit_delay = rate_limit_delay
+        self.rate_limit_jitter = rate_limit_jitter
+        self.breaker = breaker or CircuitBreaker()
+        self.random = rng or random.Random()
+
+    @staticmethod
+    def ratelimit_reset(error: Exception) -> Optional[float]:
+        reset = getattr(getattr(error, 'metadata', None), 'ratelimit_reset', None)
+        return float(reset) if reset is not None else None
+
+    def delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before the next attempt, None when the error isn't retryable"""
+        code = getattr(error, 'code', None)
+
+        if code in RATE_LIMIT_CODES:
+            reset = self.ratelimit_reset(error)
+            delay = self.rate_limit_delay if reset is None else reset
+            return delay + self.random.uniform(0, self.rate_limit_jitter)
+
+        if code in TRANSIENT_CODES:
+            return self.random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+        return None
+
+    def on_error(self, error: Exception, attempt: int) -> float:
+        """Register a failed attempt and return the delay, re-raise when giving up"""
+        delay = self.delay(error, attempt)
+
+        if getattr(error, 'code', None) in RATE_LIMIT_CODES:
+            self.breaker.pause(delay)
+        elif delay is not None:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success() # A meaningful answer, the endpoint itself is fine
+
+        if delay is None or attempt >= self.max_retries:
+            raise error
+
+        logger.warning(f'[Retry] attempt {attempt + 1} failed with {getattr(error, "code", error)}, waiting {delay:.1f}s')
+        return delay
+
+    async def acall(
+        self,
+        func: Callable[..., Awaitable[T]],
+        *args,
+        before: Optional[Callable[[], Awaitable[None]]] = None,
+        **kwargs,
+    ) -> T:
+        for attempt in range(self.max_retries + 1):
+            wait, probe = self.breaker.acquire()
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait, probe = self.breaker.acquire()
+
+            try:
+                if before:
+                    await before()
+                result = await func(*args, **kwargs)
+            except AioRequestError as e:
+                delay = self.on_error(e, attempt)
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                # Any other error or a cancellation must not leave the others waiting for the probe
+                if probe:
+                    self.breaker.release_probe()
+            await asyncio.sleep(delay)
+
+
+# One circuit for every service of the process, like rate_limit.limiter
+retry_policy = RetryPolicy()
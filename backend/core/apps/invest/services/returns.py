@@ -1,10 +1,34 @@
+"""Returns of companies, exchanges and sectors.
+
+Daily closes of every visible share are loaded once (from the candle cache)
+into an aligned instruments x days matrix. Period returns, average weekly
+movements and volatility percentiles are then computed with NumPy, only for
+companies with changed candles unless a full run is asked for (see
+services/performance.py).
+"""
+from dataclasses import dataclass
 import datetime
+import logging
+import time
+import warnings
+
 import numpy as np
+from django.utils import timezone
+
+from apps.invest.models import (
+    CandleIntervalType,
+    CompanyPerformance,
+    ExchangePerformance,
+    Instrument,
+    InstrumentType,
+    SectorExchange,
+)
+from apps.invest.services.candle_cache import load_candles_batch, refresh_candle_cache
+from apps.invest.services.performance import dirty_companies, save_performance, stored_company_performance
 
-from apps.invest.models import Exchange, Company, Sector, SectorExchange
+logger = logging.getLogger(__name__)
 
 PERIODS = {
-    'now': 0,
     '7d': 7,
     '30d': 30,
     '90d': 90,
@@ -12,119 +36,175 @@ PERIODS = {
     '3y': 365*3,
     '5y': 365*5,
 }
-
-
-def main():
-    # Получить список
-    markets = get_market_list()
-    sectors = get_sector_list()
-    companies = get_company_list(market=None, sector=None)
-
-    # Посчитать данные
-    company_price_data = [get_company_price_data(company) for company in companies]
-    sector_market_price_data = [
-        get_aggregate_price_data(company_price_data, market=market, sector=sector)
-        for market in markets for sector in sectors
-    ]
-    market_price_data = [get_aggregate_price_data(company_price_data, market=market) for market in markets]
-
-    update_or_create(market_price_data, sector_market_price_data, company_price_data)
-
-
-def get_company_price_data(company):
-    price_data = get_company_returns(company)
-    average_weekly_mouvement = get_average_weekly_mouvement(company)
-    price_data['company_id'] = company.id
-    price_data['company'] = company
-    price_data['average_weekly_mouvement'] = average_weekly_mouvement
-    return price_data
-
-
-def get_company_returns(company) -> dict:
-    prices = get_prices(company)
-    returns = {
-        f'return_{k}': (prices['now'].close - prices[k].close) / prices[k].close
-        if prices[k] != 0 and prices[k].close != 0 else 0 for k in prices.keys()
-    }
+PRICE_LOOKBACK = 14 # Days the latest close stands for dates without trading
+MOVEMENT_DAYS = 7 # Days of the average weekly movement
+VOLATILITY_PERCENTILES = (0, 10, 25, 50, 75, 90, 100)
+DAY_SECONDS = 24 * 60 * 60
+RETURN_FIELDS = [f'return_{name}' for name in PERIODS]
+GROUP_FIELDS = RETURN_FIELDS + ['average_weekly_mouvement'] + [f'volatility_{p}p' for p in VOLATILITY_PERCENTILES]
+
+
+@dataclass
+class Universe:
+    """Visible companies with their first share, the arrays are aligned by row"""
+    instrument_ids: np.ndarray
+    company_ids: np.ndarray
+    exchange_ids: np.ndarray
+    sector_ids: np.ndarray
+
+    def __len__(self):
+        return len(self.instrument_ids)
+
+
+def load_universe() -> Universe:
+    shares = {}
+    for instrument_id, company_id, exchange_id, sector_id in (
+        Instrument.objects
+        .filter(instrument_type=InstrumentType.SHARE, company__is_visible=True)
+        .order_by('-id')
+        .values_list('id', 'company_id', 'exchange_id', 'company__sector_id')
+    ):
+        shares[company_id] = (instrument_id, company_id, exchange_id, sector_id)
+
+    columns = list(zip(*shares.values())) or [()] * 4
+    return Universe(*(np.array(column, dtype=np.int64) for column in columns))
+
+
+def load_matrices(instrument_ids: np.ndarray, today: int) -> tuple[np.ndarray, np.ndarray]:
+    """Close prices (instruments x days up to ``today``) and daily movements of the last week.
+
+    Days are unix days, without a candle the cell is NaN. The candle cache of
+    this host is refreshed first, uncached instruments are read together.
+    """
+    refresh_candle_cache(CandleIntervalType.DAY)
+    days = max(PERIODS.values()) + PRICE_LOOKBACK + 1
+    first_day = today - days + 1
+    close = np.full((len(instrument_ids), days), np.nan)
+    movement = np.full((len(instrument_ids), MOVEMENT_DAYS), np.nan)
+    candles_by_id = load_candles_batch(
+        instrument_ids.tolist(),
+        CandleIntervalType.DAY,
+        datetime.datetime.fromtimestamp(first_day * DAY_SECONDS, datetime.timezone.utc),
+    )
+
+    for row, instrument_id in enumerate(instrument_ids.tolist()):
+        candles = candles_by_id[instrument_id]
+        start = np.searchsorted(candles.time, first_day * DAY_SECONDS)
+        candle_days = candles.time[start:] // DAY_SECONDS - first_day
+        in_range = candle_days < days
+        close[row, candle_days[in_range]] = candles.close[start:][in_range]
+
+        week = candle_days > days - 1 - MOVEMENT_DAYS
+        week &= in_range
+        high, low = candles.high[start:][week], candles.low[start:][week]
+        movement[row, candle_days[week] - (days - MOVEMENT_DAYS)] = np.where(high > 0, (high - low) / high, np.nan)
+
+    return close, movement
+
+
+def forward_fill(matrix: np.ndarray, limit: int) -> np.ndarray:
+    """Fill NaN cells with the latest value of the row no older than ``limit`` columns"""
+    columns = np.arange(matrix.shape[1])
+    latest = np.where(np.isnan(matrix), -1, columns)
+    np.maximum.accumulate(latest, axis=1, out=latest)
+
+    filled = matrix[np.arange(matrix.shape[0])[:, None], np.maximum(latest, 0)]
+    filled[(latest < 0) | (columns - latest > limit)] = np.nan
+    return filled
+
+
+def period_returns(close: np.ndarray) -> dict[str, np.ndarray]:
+    prices = forward_fill(close, PRICE_LOOKBACK)
+    now = prices[:, -1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = {}
+        for name, days in PERIODS.items():
+            past = prices[:, -1 - days]
+            returns[f'return_{name}'] = np.where(past != 0, (now - past) / past, np.nan)
     return returns
 
 
-def get_prices(company):
-    return {k: get_price(company, PERIODS[k]) for k in PERIODS}
-
-
-def get_price(company, days):
-    time = datetime.datetime.now(tz=datetime.UTC) - datetime.timedelta(days=days)
-    if company.candles.filter(time__lte=time).exists():
-        return company.candles.filter(time__lte=time).latest('time')
-    return 0
-
-
-def get_aggregate_price_data(companies, market, sector=None):
-    companies = list(filter(lambda x: x['company'].market.id == market.id, companies))
-    if sector:
-        companies = list(filter(lambda x: x['company'].sector.id == sector.id, companies))
-
-    price_data = {
-        f'return_{key}': sum(map(lambda x: x[f'return_{key}'], companies)) / len(companies)
-        if len(companies) != 0 else 0 for key in PERIODS.keys()
+def group_performance(returns: dict[str, np.ndarray], movement: np.ndarray, rows: np.ndarray) -> dict:
+    """Mean returns and movement of the companies in ``rows``, percentiles of their movements"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning) # All-NaN groups
+        performance = {name: np.nanmean(values[rows]) for name, values in returns.items()}
+        performance['average_weekly_mouvement'] = np.nanmean(movement[rows])
+        percentiles = np.nanpercentile(movement[rows], VOLATILITY_PERCENTILES)
+
+    for percent, value in zip(VOLATILITY_PERCENTILES, percentiles):
+        performance[f'volatility_{percent}p'] = value
+    return {name: _nullable(value) for name, value in performance.items()}
+
+
+def _nullable(value) -> float | None:
+    return None if np.isnan(value) else float(value)
+
+
+def main(full: bool = False) -> dict:
+    """Refresh performance of companies with changed candles and of their groups, or of everything"""
+    started = time.monotonic()
+    now = timezone.now()
+    today = int(now.timestamp()) // DAY_SECONDS
+    universe = load_universe()
+    dirty = np.ones(len(universe), dtype=bool) if full else dirty_companies(
+        universe.company_ids,
+        universe.instrument_ids,
+        now,
+    )
+    if not dirty.any():
+        return {'companies': 0, 'exchanges': 0, 'sector_exchanges': 0}
+
+    close, movement = load_matrices(universe.instrument_ids[dirty], today)
+    loaded = time.monotonic()
+
+    # Values of every company: computed for the dirty ones, stored for the rest
+    stored = stored_company_performance(universe.company_ids, RETURN_FIELDS + ['average_weekly_movement'])
+    returns = {name: stored[name] for name in RETURN_FIELDS}
+    weekly_movement = stored['average_weekly_movement']
+    for name, values in period_returns(close).items():
+        returns[name][dirty] = values
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning) # Companies without recent candles
+        weekly_movement[dirty] = np.nanmean(movement, axis=1)
+
+    companies = [
+        CompanyPerformance(
+            company_id=int(universe.company_ids[row]),
+            average_weekly_movement=_nullable(weekly_movement[row]),
+            updated=now,
+            **{name: _nullable(values[row]) for name, values in returns.items()},
+        )
+        for row in np.flatnonzero(dirty)
+    ]
+    exchanges = [
+        ExchangePerformance(
+            exchange_id=int(exchange_id),
+            **group_performance(returns, weekly_movement, universe.exchange_ids == exchange_id),
+        )
+        for exchange_id in np.unique(universe.exchange_ids[dirty])
+    ]
+    pairs = np.stack([universe.sector_ids[dirty], universe.exchange_ids[dirty]], axis=1)
+    sector_exchanges = [
+        SectorExchange(
+            sector_id=int(sector_id),
+            exchange_id=int(exchange_id),
+            **group_performance(
+                returns,
+                weekly_movement,
+                (universe.sector_ids == sector_id) & (universe.exchange_ids == exchange_id),
+            ),
+        )
+        for sector_id, exchange_id in np.unique(pairs, axis=0)
+    ]
+    save_performance(companies, exchanges, sector_exchanges, RETURN_FIELDS + ['average_weekly_movement'], GROUP_FIELDS)
+
+    stats = {
+        'companies': len(companies),
+        'exchanges': len(exchanges),
+        'sector_exchanges': len(sector_exchanges),
+        'load_seconds': round(loaded - started, 3),
+        'total_seconds': round(time.monotonic() - started, 3),
     }
-    average_weekly_mouvement = 0
-    percent_units = [0, 10, 25, 50, 75, 90, 100]
-    percent_data = {f'volatility_{key}p': 0 for key in percent_units}
-    if companies:
-        average_weekly_mouvement = sum(map(lambda x: x['average_weekly_mouvement'], companies)) / len(companies)
-        a = np.array(list(map(lambda x: x['average_weekly_mouvement'], companies)))
-        percent_data = {f'volatility_{key}p': np.percentile(a, key) for key in percent_units}
-
-    price_data['average_weekly_mouvement'] = average_weekly_mouvement
-    price_data = price_data | percent_data
-    price_data['market_id'] = market.id
-    if sector:
-        price_data['sector_id'] = sector.id
-
-    return price_data
-
-
-def get_market_list():
-    return Exchange.objects.all()
-
-
-def get_sector_list():
-    return Sector.objects.all()
-
-
-def get_company_list(market, sector):
-    companies = Company.objects.filter(is_visible=True)
-
-    if market:
-        companies = companies.filter(market=market)
-    if sector:
-        companies = companies.filter(sector=sector)
-    return companies
-
-
-def update_or_create(market_price_data, sector_market_price_data, company_price_data):
-    [Exchange.objects.update_or_create(
-        pk=price_data['market_id'],
-        defaults=price_data
-    ) for price_data in market_price_data]
-
-    [SectorExchange.objects.update_or_create(
-        market__pk=price_data['market_id'],
-        sector__pk=price_data['sector_id'],
-        defaults=price_data
-    ) for price_data in sector_market_price_data]
-
-    [Company.objects.update_or_create(
-        pk=price_data['company_id'],
-        defaults=price_data
-    ) for price_data in company_price_data]
-
-
-def get_average_weekly_mouvement(company) -> int:
-    time = datetime.datetime.now(tz=datetime.UTC) - datetime.timedelta(days=7)
-    candles = company.candles.filter(time__gte=time)
-    if candles.exists():
-        return sum(map(lambda x: (x.high - x.low) / x.high, candles)) / len(candles)
-    return 0
+    logger.info(f'[Returns] {stats}')
+    return stats
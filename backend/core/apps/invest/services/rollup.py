@@ -0,0 +1,143 @@
+from collections import defaultdict
+from itertools import chain, groupby
+from typing import Iterable, Iterator, Optional
+import datetime
+
+from django.utils import timezone
+
+from apps.invest.models import Candle, CandleArchive, CandleChange, CandleIntervalType, SyncState
+from apps.invest.services.archive import ARCHIVE_COLUMNS, candle_arrays, from_datetime64
+from apps.invest.services.bulk import CANDLE_COLUMNS, write_candles
+
+# Intervals aggregated from daily candles instead of being fetched from the API
+ROLLUP_INTERVALS = (CandleIntervalType.WEEK, CandleIntervalType.MONTH)
+INSTRUMENTS_PER_QUERY = 200
+
+
+def bucket_start(time: datetime.datetime, interval: str) -> datetime.datetime:
+    """Start of the week (monday) or month of the candle, midnight UTC"""
+    day = datetime.datetime.combine(time.astimezone(datetime.timezone.utc).date(), datetime.time(tzinfo=datetime.timezone.utc))
+    if interval == CandleIntervalType.WEEK:
+        return day - datetime.timedelta(days=day.weekday())
+    if interval == CandleIntervalType.MONTH:
+        return day.replace(day=1)
+    raise ValueError(f'Candles of interval {interval!r} are not rolled up')
+
+
+def next_bucket_start(start: datetime.datetime, interval: str) -> datetime.datetime:
+    if interval == CandleIntervalType.WEEK:
+        return start + datetime.timedelta(days=7)
+    return (start + datetime.timedelta(days=32)).replace(day=1)
+
+
+def aggregate_candles(rows: Iterable[tuple], interval: str, now: datetime.datetime) -> list[tuple]:
+    """Daily candle rows ordered by instrument and time to rows of the interval (see CANDLE_COLUMNS)"""
+    result = []
+    for (instrument_id, start), bucket in groupby(rows, key=lambda row: (row[0], bucket_start(row[1], interval))):
+        bucket = list(bucket)
+        result.append((
+            instrument_id,
+            start,
+            bucket[0][2],
+            max(row[3] for row in bucket),
+            min(row[4] for row in bucket),
+            bucket[-1][5],
+            sum(row[6] for row in bucket),
+            bucket[-1][7] and next_bucket_start(start, interval) <= now,
+        ))
+    return result
+
+
+def get_dirty_instruments(interval: str) -> dict[int, Optional[datetime.datetime]]:
+    """Instruments whose daily candles were written after their last rollup, with the bucket to recompute from.
+
+    That is the latest rolled up bucket, or an older one when daily candles
+    before it were written since (see CandleChange, rollups run before the
+    changes are pruned). None means the instrument was never rolled up and
+    its whole history is aggregated.
+    """
+    daily = SyncState.objects.filter(kind=SyncState.Kind.CANDLES, interval=CandleIntervalType.DAY)
+    rolled_up = {
+        instrument_id: (last_time, updated)
+        for instrument_id, last_time, updated in SyncState.objects.filter(
+            kind=SyncState.Kind.CANDLES,
+            interval=interval,
+        ).values_list('instrument_id', 'last_time', 'updated')
+    }
+
+    changed = {}
+    if rolled_up:
+        for instrument_id, since, created in CandleChange.objects.filter(
+            interval=CandleIntervalType.DAY,
+            created__gte=min(updated for _, updated in rolled_up.values()),
+        ).values_list('instrument_id', 'since', 'created'):
+            state = rolled_up.get(instrument_id)
+            if state is not None and created >= state[1]:
+                start = bucket_start(since, interval)
+                changed[instrument_id] = min(start, changed.get(instrument_id, start))
+
+    dirty = {}
+    for instrument_id, updated in daily.values_list('instrument_id', 'updated'):
+        state = rolled_up.get(instrument_id)
+        if state is None:
+            dirty[instrument_id] = None
+        elif instrument_id in changed:
+            dirty[instrument_id] = min(state[0], changed[instrument_id])
+        elif updated >= state[1]:
+            dirty[instrument_id] = state[0]
+    return dirty
+
+
+def archived_instruments(instrument_ids: list[int], start: Optional[datetime.datetime]) -> set[int]:
+    """Instruments whose daily candles since ``start`` are partly archived"""
+    archives = CandleArchive.objects.filter(interval=CandleIntervalType.DAY, instrument_id__in=instrument_ids)
+    if start is not None:
+        archives = archives.filter(end__gt=start)
+    return set(archives.values_list('instrument_id', flat=True))
+
+
+def daily_rows(instrument_id: int, start: Optional[datetime.datetime]) -> Iterator[tuple]:
+    """Archived and stored daily candles of the instrument as rows (see CANDLE_COLUMNS)"""
+    arrays = candle_arrays(instrument_id, CandleIntervalType.DAY, start)
+    for i in range(len(arrays['time'])):
+        yield (
+            instrument_id,
+            from_datetime64(arrays['time'][i]),
+            *(arrays[name][i].item() for name in ARCHIVE_COLUMNS[1:]),
+        )
+
+
+def rollup_candles(interval: str, now: Optional[datetime.datetime] = None) -> int:
+    """Recompute candles of the interval from daily ones, starting at the earliest changed bucket.
+
+    Instruments with archived history are read through the archive, the
+    others straight from the table.
+    """
+    now = now or timezone.now()
+    instruments_by_start = defaultdict(list)
+    for instrument_id, start in get_dirty_instruments(interval).items():
+        instruments_by_start[start].append(instrument_id)
+
+    written = 0
+    for start, instrument_ids in instruments_by_start.items():
+        for i in range(0, len(instrument_ids), INSTRUMENTS_PER_QUERY):
+            chunk = instrument_ids[i:i + INSTRUMENTS_PER_QUERY]
+            archived = archived_instruments(chunk, start)
+            query = Candle.objects.filter(
+                interval=CandleIntervalType.DAY,
+                instrument_id__in=[instrument_id for instrument_id in chunk if instrument_id not in archived],
+            )
+            if start is not None:
+                query = query.filter(time__gte=start)
+
+            rows = chain(
+                query.order_by('instrument_id', 'time').values_list(*CANDLE_COLUMNS).iterator(chunk_size=10_000),
+                *(daily_rows(instrument_id, start) for instrument_id in sorted(archived)),
+            )
+            written += write_candles(aggregate_candles(rows, interval, now), interval)
+
+    return written
+
+
+def rollup_main() -> dict:
+    return {interval: rollup_candles(interval) for interval in ROLLUP_INTERVALS}
@@ -0,0 +1,262 @@
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional, TextIO
+import asyncio
+import datetime
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+
+from tinkoff.invest import (
+    CandleInstrument,
+    MarketDataRequest,
+    SubscribeCandlesRequest,
+    SubscriptionAction,
+    SubscriptionInterval,
+)
+from tinkoff.invest.async_services import AsyncServices
+from tinkoff.invest.utils import quotation_to_decimal
+
+from apps.invest.models import Candle, CandleIntervalType, SyncState
+from apps.invest.services.broadcast import PriceBroadcaster
+from apps.invest.services.bulk import Watermarks, advance_sync_states, write_candles
+from apps.invest.services.tinvest import InstrumentMap, InstrumentRef
+
+logger = logging.getLogger(__name__)
+
+MIDNIGHT = datetime.time(tzinfo=datetime.timezone.utc)
+
+
+@dataclass
+class LiveCandle:
+    """Current daily candle of an instrument assembled from streamed minute candles.
+
+    Volume of minutes streamed before the worker started comes from the stored
+    candle, so the value is approximate until the batch sync writes the final one.
+    Stream writes leave the sync watermark alone, so the batch sync still plans
+    from the last complete candle and refetches every incomplete one.
+
+    The last minute folded into the stored candle is kept in a STREAM sync
+    state, minutes up to it are replayed by the stream after a restart and
+    skipped, as their volume is in ``base_volume`` already (the last one with
+    the volume it had at the flush).
+    """
+    instrument_id: int
+    time: datetime.datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    base_volume: float = 0.0 # Volume of the stored candle
+    minutes: dict[datetime.datetime, float] = field(default_factory=dict) # {minute: volume}
+    folded_until: Optional[datetime.datetime] = None # Last minute in the stored candle
+    dirty: bool = False
+
+    @property
+    def volume(self) -> float:
+        return self.base_volume + sum(self.minutes.values())
+
+    @property
+    def last_minute(self) -> Optional[datetime.datetime]:
+        return max(self.minutes, default=self.folded_until)
+
+    def apply(self, minute: datetime.datetime, high: float, low: float, close: float, volume: float) -> None:
+        if self.folded_until is not None and minute <= self.folded_until:
+            return
+        self.high = max(self.high, high)
+        self.low = min(self.low, low)
+        self.close = close
+        self.minutes[minute] = volume # Minute candles are resent while the minute lasts
+        self.dirty = True
+
+    def row(self) -> tuple: # See bulk.CANDLE_COLUMNS
+        return (self.instrument_id, self.time, self.open, self.high, self.low, self.close, self.volume, False)
+
+
+class MarketDataStream:
+    """Long-running ingestion of the market data stream into current daily candles.
+
+    Minute candles of all instruments are folded into in-memory daily candles,
+    which are flushed to the DB every ``flush_interval`` seconds and pushed to
+    Channels through a short-window broadcaster.
+    """
+    MAX_SUBSCRIPTIONS = 300 # Instruments per stream
+    FLUSH_INTERVAL = 5.0 # Seconds
+    BROADCAST_WINDOW = 0.25 # Seconds
+    SEED_DAYS = 7 # Days of stored candles to look for the current one
+    RECONNECT_DELAY = 5 # Seconds
+
+    def __init__(
+        self,
+        services: AsyncServices,
+        instruments: InstrumentMap,
+        flush_interval: float = FLUSH_INTERVAL,
+        broadcaster: Optional[PriceBroadcaster] = None,
+        record: Optional[TextIO] = None,
+    ):
+        self.services = services
+        self.instruments = instruments
+        self.flush_interval = flush_interval
+        self.broadcaster = broadcaster or PriceBroadcaster(window=self.BROADCAST_WINDOW)
+        self.record = record # JSON lines of received minute candles, replayable by the fake server
+        self.candles: dict[int, LiveCandle] = {} # {instrument id: current daily candle}
+        self.offsets: dict[int, datetime.timedelta] = {} # {instrument id: time of day of its daily candles}
+        self.ticks = 0
+        self.flushed = 0
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> None:
+        stop = stop or asyncio.Event()
+        await sync_to_async(self.load_candles)()
+
+        uids = [i.tinkoff_uid for i in self.instruments]
+        chunks = [uids[i:i + self.MAX_SUBSCRIPTIONS] for i in range(0, len(uids), self.MAX_SUBSCRIPTIONS)]
+        logger.info(f'[Stream] {len(uids)} instruments in {len(chunks)} streams')
+
+        async with self.broadcaster:
+            flusher = asyncio.create_task(self._flush_periodically(stop))
+            streams = [asyncio.create_task(self._consume(chunk, stop)) for chunk in chunks]
+            try:
+                await stop.wait()
+            finally:
+                for task in (*streams, flusher):
+                    task.cancel()
+                await asyncio.gather(*streams, flusher, return_exceptions=True)
+                await self.flush()
+
+    async def _consume(self, uids: list[str], stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            try:
+                async for response in self.services.market_data_stream.market_data_stream(self._requests(uids, stop)):
+                    if response.candle:
+                        self.on_candle(response.candle)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f'[Stream] stream failed, reconnecting in {self.RECONNECT_DELAY}s')
+                await asyncio.sleep(self.RECONNECT_DELAY)
+
+    @staticmethod
+    async def _requests(uids: list[str], stop: asyncio.Event) -> AsyncIterator[MarketDataRequest]:
+        yield MarketDataRequest(
+            subscribe_candles_request=SubscribeCandlesRequest(
+                subscription_action=SubscriptionAction.SUBSCRIPTION_ACTION_SUBSCRIBE,
+                instruments=[
+                    CandleInstrument(instrument_id=uid, interval=SubscriptionInterval.SUBSCRIPTION_INTERVAL_ONE_MINUTE)
+                    for uid in uids
+                ],
+                waiting_close=False,
+            )
+        )
+        # Request side has to stay open for the server to keep streaming
+        await stop.wait()
+
+    def on_candle(self, candle) -> None:
+        instrument = self.instruments.get(candle.instrument_uid)
+        if instrument is None:
+            return
+
+        self.ticks += 1
+        open_, high, low, close = (
+            float(quotation_to_decimal(value))
+            for value in (candle.open, candle.high, candle.low, candle.close)
+        )
+        if self.record:
+            self.record.write(json.dumps({
+                'instrument_uid': candle.instrument_uid,
+                'time': candle.time.isoformat(),
+                'open': open_,
+                'high': high,
+                'low': low,
+                'close': close,
+                'volume': candle.volume,
+            }) + '\n')
+
+        live = self.get_live_candle(instrument, candle.time, open_)
+        if live is None:
+            return
+        live.apply(candle.time, high, low, close, candle.volume)
+        self.broadcaster.publish({instrument.tinkoff_uid: (candle.time, close)})
+
+    def get_live_candle(self, instrument: InstrumentRef, minute: datetime.datetime, open_: float) -> Optional[LiveCandle]:
+        """Daily candle of the minute, None for a late minute of an earlier day.
+
+        The candle of that day is complete or left to the batch sync, which
+        refetches every incomplete candle.
+        """
+        day = datetime.datetime.combine(minute.date(), MIDNIGHT) + self.offsets.get(instrument.id, datetime.timedelta())
+        live = self.candles.get(instrument.id)
+
+        if live is not None and day < live.time:
+            logger.debug(f'[Stream] late minute {minute} of {instrument.tinkoff_uid} dropped')
+            return None
+        if live is None or live.time < day:
+            live = LiveCandle(instrument.id, day, open_, open_, open_, open_)
+            self.candles[instrument.id] = live
+        return live
+
+    def load_candles(self) -> None:
+        """Seed daily candles of today and the time of day candles are stamped with"""
+        today = datetime.datetime.combine(datetime.datetime.now(datetime.timezone.utc).date(), MIDNIGHT)
+        folded = dict(
+            SyncState.objects.filter(
+                kind=SyncState.Kind.STREAM,
+                interval=CandleIntervalType.DAY,
+                instrument_id__in=[i.id for i in self.instruments],
+                last_time__gte=today, # Minutes of today's candles
+            ).values_list('instrument_id', 'last_time')
+        )
+        query = Candle.objects.filter(
+            instrument_id__in=[i.id for i in self.instruments],
+            interval=CandleIntervalType.DAY,
+            time__gte=today - datetime.timedelta(days=self.SEED_DAYS),
+        ).order_by('instrument_id', 'time')
+
+        for candle in query.iterator():
+            self.offsets[candle.instrument_id] = candle.time - datetime.datetime.combine(candle.time.date(), MIDNIGHT)
+            if candle.time >= today and not candle.is_complete:
+                self.candles[candle.instrument_id] = LiveCandle(
+                    candle.instrument_id,
+                    candle.time,
+                    candle.open,
+                    candle.high,
+                    candle.low,
+                    candle.close,
+                    base_volume=candle.volume,
+                    folded_until=folded.get(candle.instrument_id),
+                )
+
+    async def _flush_periodically(self, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception('[Stream] flush failed')
+
+    async def flush(self) -> None:
+        dirty = [c for c in self.candles.values() if c.dirty]
+        if not dirty:
+            return
+
+        rows = [c.row() for c in dirty]
+        minutes = {c.instrument_id: (c.last_minute, False) for c in dirty}
+        for live in dirty:
+            live.dirty = False
+        try:
+            await sync_to_async(self._write_rows, thread_sensitive=False)(rows, minutes)
+        except Exception:
+            for live in dirty:
+                live.dirty = True
+            raise
+        self.flushed += len(dirty)
+
+    @staticmethod
+    def _write_rows(rows: list[tuple], minutes: Watermarks) -> int:
+        try:
+            with transaction.atomic():
+                written = write_candles(rows, sync_state=False)
+                advance_sync_states(SyncState.Kind.STREAM, CandleIntervalType.DAY, minutes)
+            return written
+        finally:
+            connection.close()
@@ -0,0 +1,272 @@
+"""Transports of the Tinkoff services: the live API, and recording to / replaying from cassettes.
+
+A cassette is gzipped JSON. Responses are encoded by type: dataclasses and
+enums by their import path, which must be in tinkoff.invest or this module,
+datetimes in ISO format and API errors by status code, details and rate limit
+metadata. Calls are keyed by the JSON of their arguments, so keys don't
+depend on reprs of the client library.
+"""
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass, fields, is_dataclass
+from enum import Enum
+from typing import Any, Awaitable, Callable, Optional
+import asyncio
+import datetime
+import gzip
+import importlib
+import json
+import random
+
+import grpc
+from tinkoff.invest import AsyncClient
+from tinkoff.invest.exceptions import AioRequestError
+
+# Call of a unary API method: (service, method, args, kwargs) -> response
+Call = Callable[..., Awaitable[Any]]
+
+
+class ServicesProxy:
+    """Stands in for AsyncServices, ``services.market_data.get_candles(...)`` goes to a transport"""
+
+    def __init__(self, call: Call):
+        self._call = call
+
+    def __getattr__(self, service: str) -> '_ServiceProxy':
+        return _ServiceProxy(self._call, service)
+
+
+class _ServiceProxy:
+    def __init__(self, call: Call, service: str):
+        self._call = call
+        self._service = service
+
+    def __getattr__(self, method: str) -> Callable[..., Awaitable[Any]]:
+        async def call(*args, **kwargs):
+            return await self._call(self._service, method, args, kwargs)
+        return call
+
+
+class Transport(ABC):
+    """Source of API responses for the Tinkoff services, used as an async context manager"""
+
+    async def __aenter__(self):
+        return ServicesProxy(self.call)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    @abstractmethod
+    async def call(self, service: str, method: str, args: tuple, kwargs: dict) -> Any:
+        """Response of ``services.<service>.<method>(*args, **kwargs)``, API errors are raised"""
+
+
+class LiveTransport(Transport):
+    """Real API through the client, the default transport"""
+
+    def __init__(self, token: str):
+        self.token = token
+        self._client: Optional[AsyncClient] = None
+        self._services = None
+
+    async def __aenter__(self):
+        if not self.token:
+            raise RuntimeError('TINKOFF_KEY is not set, live API calls are impossible')
+        self._client = AsyncClient(self.token)
+        self._services = await self._client.__aenter__()
+        return self._services
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._client:
+            await self._client.__aexit__(exc_type, exc_val, exc_tb)
+        self._client = None
+        self._services = None
+
+    async def call(self, service: str, method: str, args: tuple, kwargs: dict) -> Any:
+        return await getattr(getattr(self._services, service), method)(*args, **kwargs)
+
+
+# Modules whose dataclasses and enums may be decoded from a cassette
+CASSETTE_MODULES = ('tinkoff.invest', __name__)
+
+
+def encode(value: Any) -> Any:
+    """Value of a call or a response to JSON compatible data"""
+    if isinstance(value, AioRequestError):
+        return {'__error__': value.code.name, 'details': value.details, 'metadata': encode(recorded_metadata(value))}
+    if isinstance(value, Enum):
+        return {'__enum__': _type_path(type(value)), 'value': value.value}
+    if is_dataclass(value) and not isinstance(value, type):
+        return {
+            '__dataclass__': _type_path(type(value)),
+            'fields': {field.name: encode(getattr(value, field.name)) for field in fields(value)},
+        }
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): encode(item) for key, item in value.items()}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f'{type(value).__name__} can not be stored in a cassette')
+
+
+def decode(data: Any) -> Any:
+    if isinstance(data, list):
+        return [decode(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    if '__error__' in data:
+        return AioRequestError(grpc.StatusCode[data['__error__']], data['details'], decode(data['metadata']))
+    if '__enum__' in data:
+        return _resolve_type(data['__enum__'])(data['value'])
+    if '__dataclass__' in data:
+        return _resolve_type(data['__dataclass__'])(**{name: decode(item) for name, item in data['fields'].items()})
+    if '__datetime__' in data:
+        return datetime.datetime.fromisoformat(data['__datetime__'])
+    return {key: decode(item) for key, item in data.items()}
+
+
+def _type_path(cls: type) -> str:
+    return f'{cls.__module__}:{cls.__qualname__}'
+
+
+def _resolve_type(path: str) -> type:
+    module, _, name = path.partition(':')
+    if not any(module == allowed or module.startswith(f'{allowed}.') for allowed in CASSETTE_MODULES):
+        raise ValueError(f'Type {path} is not allowed in a cassette')
+
+    value = importlib.import_module(module)
+    for attribute in name.split('.'):
+        value = getattr(value, attribute)
+    return value
+
+
+def call_key(service: str, method: str, args: tuple, kwargs: dict) -> tuple:
+    return service, method, json.dumps(encode(args)), json.dumps(encode(kwargs), sort_keys=True)
+
+
+class Cassette:
+    """Recorded API responses and errors in gzipped JSON, with free-form meta (e.g. the task plan)"""
+
+    def __init__(self, calls: Optional[dict[tuple, list]] = None, meta: Optional[dict] = None):
+        self.calls: dict[tuple, list] = defaultdict(list, calls or {}) # {call key: [responses]}
+        self.meta = meta or {}
+
+    def __len__(self):
+        return sum(len(responses) for responses in self.calls.values())
+
+    @classmethod
+    def load(cls, path: str) -> 'Cassette':
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            data = json.load(file)
+        calls = {tuple(call['key']): decode(call['responses']) for call in data['calls']}
+        return cls(calls, decode(data['meta']))
+
+    def save(self, path: str) -> None:
+        data = {
+            'calls': [{'key': list(key), 'responses': encode(responses)} for key, responses in self.calls.items()],
+            'meta': encode(self.meta),
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as file:
+            json.dump(data, file)
+
+
+class RecordingTransport(Transport):
+    """Passes calls to the live API and saves every response and API error to a cassette on exit"""
+
+    def __init__(self, path: str, inner: Transport, cassette: Optional[Cassette] = None):
+        self.path = path
+        self.inner = inner
+        self.cassette = cassette or Cassette()
+
+    async def __aenter__(self):
+        await self.inner.__aenter__()
+        return await super().__aenter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.inner.__aexit__(exc_type, exc_val, exc_tb)
+        self.cassette.save(self.path)
+
+    async def call(self, service: str, method: str, args: tuple, kwargs: dict) -> Any:
+        key = call_key(service, method, args, kwargs)
+        try:
+            response = await self.inner.call(service, method, args, kwargs)
+        except AioRequestError as e:
+            self.cassette.calls[key].append(AioRequestError(e.code, e.details, recorded_metadata(e)))
+            raise
+        self.cassette.calls[key].append(response)
+        return response
+
+
+@dataclass
+class InjectedMetadata:
+    """Metadata of an injected or recorded error, mirrors the headers the API sends with RESOURCE_EXHAUSTED"""
+    ratelimit_reset: int
+    ratelimit_remaining: int = 0
+    ratelimit_limit: Optional[str] = None
+    tracking_id: Optional[str] = None
+    message: Optional[str] = None
+
+
+def recorded_metadata(error: AioRequestError) -> InjectedMetadata:
+    """Rate limit headers of an API error, the ones the retry policy reads"""
+    metadata = error.metadata
+    return InjectedMetadata(
+        ratelimit_reset=getattr(metadata, 'ratelimit_reset', None) or 0,
+        ratelimit_remaining=getattr(metadata, 'ratelimit_remaining', None) or 0,
+        ratelimit_limit=getattr(metadata, 'ratelimit_limit', None),
+        tracking_id=getattr(metadata, 'tracking_id', None),
+        message=getattr(metadata, 'message', None),
+    )
+
+
+class ReplayTransport(Transport):
+    """Answers from a cassette after simulated latency, optionally failing with rate limit errors.
+
+    Repeated calls get the recorded responses in order, the last one is reused
+    when they run out; recorded API errors are raised. Calls absent from the
+    cassette raise LookupError.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        latency: tuple[float, float] = (0.0, 0.0),
+        error_rate: float = 0.0,
+        ratelimit_reset: int = 1,
+        seed: Optional[int] = None,
+    ):
+        self.cassette = cassette
+        self.latency = latency # Seconds, uniform between min and max
+        self.error_rate = error_rate # Share of calls failing with RESOURCE_EXHAUSTED
+        self.ratelimit_reset = ratelimit_reset # Seconds reported by injected errors
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._positions: dict[tuple, int] = defaultdict(int)
+
+    async def call(self, service: str, method: str, args: tuple, kwargs: dict) -> Any:
+        self.calls += 1
+        await asyncio.sleep(self._random.uniform(*self.latency))
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            raise AioRequestError(
+                grpc.StatusCode.RESOURCE_EXHAUSTED,
+                'Injected rate limit',
+                InjectedMetadata(ratelimit_reset=self.ratelimit_reset),
+            )
+
+        key = call_key(service, method, args, kwargs)
+        responses = self.cassette.calls.get(key)
+        if not responses:
+            raise LookupError(f'There is no recorded response for {service}.{method}')
+
+        position = self._positions[key]
+        self._positions[key] = position + 1
+        response = responses[min(position, len(responses) - 1)]
+        if isinstance(response, AioRequestError):
+            raise response
+        return response
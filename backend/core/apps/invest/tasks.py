@@ -1,22 +1,110 @@
-from celery import shared_task
+import datetime
+import logging
 
-from apps.invest.services.tinvest import candle_sync
-from apps.invest.services.tinvest import dividend_sync
+from celery import chord, shared_task
+from django.conf import settings
+
+from apps.invest.services.async_tinvest import candle_main, plan_candle_job, run_candle_job, after_candle_sync
+from apps.invest.services.async_tinvest import dividend_main
+from apps.invest.services.async_tinvest import calendar_main
+from apps.invest.models import CandleIntervalType
+from apps.invest.services.archive import archive_candles
+from apps.invest.services.jobs import start_job, finish_job
+from apps.invest.services.loop import run_async
+from apps.invest.services.partitions import ensure_candle_partitions
 from apps.invest.services.returns import main as returns_main
+from apps.invest.services.rollup import rollup_main
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task(name='candles', track_started=True)
-def candles_task():
-    candle_sync()
-    return 'candles successful'
+def candles_task(
+    concurrency: int = None,
+    job_id: int = None,
+    shards: int = None,
+    interval: str = CandleIntervalType.DAY,
+):
+    """Candle sync in this worker, or fanned out into shard subtasks by instrument id"""
+    shards = shards or settings.CANDLE_SYNC_SHARDS
+    if shards <= 1:
+        return run_async(candle_main(concurrency, job_id, interval))
+
+    if settings.TINKOFF_RATE_LIMIT_BACKEND == 'local':
+        logger.warning('Candle sync shards use the local rate limiter and may run over the API quota')
+
+    job = run_async(plan_candle_job(job_id, interval))
+    if job is None:
+        return {'status': 'skipped'}
+
+    start_job(job)
+    # A shard that crashes outside of its own error handling (e.g. a lost worker) breaks
+    # the chord, the errback still finishes the job and refreshes the derived data
+    chord(
+        candles_shard_task.s(job.pk, shard, shards, concurrency)
+        for shard in range(shards)
+    )(candles_finish_task.s(job.pk).on_error(candles_failed_task.s(job.pk)))
+    return {'job': job.pk, 'shards': shards}
+
+
+@shared_task(name='candles_shard', track_started=True)
+def candles_shard_task(job_id: int, shard: int, shards: int, concurrency: int = None):
+    return run_async(run_candle_job(job_id, concurrency, shard, shards))
+
+
+@shared_task(name='candles_finish')
+def candles_finish_task(shard_stats: list[dict], job_id: int):
+    error = '; '.join(stats['error'] for stats in shard_stats if stats.get('error'))
+    job = finish_job(job_id, error)
+    return {
+        'job': job.pk,
+        'status': job.status,
+        'shards': shard_stats,
+        **after_candle_sync(job.interval or CandleIntervalType.DAY),
+    }
+
+
+@shared_task(name='candles_failed')
+def candles_failed_task(request, exc, traceback, job_id: int):
+    """Errback of the shard chord, candles written by the other shards are still processed"""
+    job = finish_job(job_id, repr(exc))
+    return {
+        'job': job.pk,
+        'status': job.status,
+        **after_candle_sync(job.interval or CandleIntervalType.DAY),
+    }
+
+
+@shared_task(name='candle_rollup')
+def candle_rollup_task():
+    """Weekly and monthly candles from daily ones, normally chained after a daily sync"""
+    return rollup_main()
+
+
+@shared_task(name='candle_partitions')
+def candle_partitions_task(ahead: int = None):
+    return {'created': ensure_candle_partitions(ahead)}
+
+
+@shared_task(name='candle_archive')
+def candle_archive_task(before: str = None, interval: str = CandleIntervalType.DAY):
+    if before:
+        before = datetime.datetime.fromisoformat(before)
+        # Naive values are UTC, an offset given by the caller is kept
+        before = before.astimezone(datetime.UTC) if before.tzinfo else before.replace(tzinfo=datetime.UTC)
+    return archive_candles(before, interval)
+
+
+@shared_task(name='trading_calendar')
+def trading_calendar_task():
+    return run_async(calendar_main())
 
 
 @shared_task(name='dividends')
-def dividend_task():
-    dividend_sync()
-    return 'dividends successful'
+def dividend_task(concurrency: int = None, full: bool = False):
+    return run_async(dividend_main(concurrency, full))
 
 
 @shared_task(name='returns')
-def returns_task():
-    return returns_main()
+def returns_task(full: bool = False):
+    return returns_main(full)
@@ -1,9 +1,52 @@
+import asyncio
 import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
 
+import grpc
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
+from tinkoff.invest import CandleInterval, Quotation
+from tinkoff.invest.exceptions import AioRequestError
 
-from apps.invest.models import Company, Country, Market, Sector, Industry, Currency
+from apps.invest.models import (
+    Candle,
+    CandleChange,
+    CandleIntervalType,
+    Company,
+    Country,
+    Exchange,
+    Instrument,
+    Market,
+    Sector,
+    Industry,
+    Currency,
+    SyncJob,
+    SyncJobTask,
+    SyncState,
+)
+from apps.invest.services.archive import archive_instrument, candle_arrays, candle_arrays_batch
+from apps.invest.services.async_tinvest import CandleServiceAsync, DividendServiceAsync, plan_candle_job
+from apps.invest.services.broadcast import PriceBroadcaster
+from apps.invest.services.bulk import write_candles
+from apps.invest.services.candle_cache import CandleCache
+from apps.invest.services.jobs import create_job, finish_job, load_job_tasks, start_job
+from apps.invest.services.loop import run_async
+from apps.invest.services.pipeline import CandleBatch, WriteStage
+from apps.invest.services.rate_limit import API_QUOTAS, RateLimiter, RedisTokenBucket, TokenBucket, local_backend
+from apps.invest.services.retry import CircuitBreaker, RetryPolicy
+from apps.invest.services.returns import PERIODS, forward_fill, period_returns
+from apps.invest.services.rollup import aggregate_candles, get_dirty_instruments, rollup_candles
+from apps.invest.services.stream import LiveCandle, MarketDataStream
+from apps.invest.services.tinvest import InstrumentMap, InstrumentRef, InstrumentTask
+from apps.invest.services.transport import Cassette, InjectedMetadata, ReplayTransport, call_key
 from django.contrib.auth.models import User
 
 
@@ -164,4 +207,691 @@ class ValidateUsernameAPITest(APITestCase):
     def test_username_is_taken(self):
         url = '/api/v1/invest/validate-username/?username=test'
         response = self.client.get(url)
-        self.assertEqual(response.data.get('isTaken'), True)
\ No newline at end of file
+        self.assertEqual(response.data.get('isTaken'), True)
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeRedis:
+    """Stands in for redis.Redis, the Lua script answers with a fixed delay"""
+
+    def __init__(self, delay: str):
+        self.delay = delay
+        self.calls = []
+
+    def register_script(self, script):
+        def call(keys, args):
+            self.calls.append((keys, args))
+            return self.delay.encode()
+        return call
+
+
+class TokenBucketTest(SimpleTestCase):
+    def test_reserve_within_capacity(self):
+        bucket = TokenBucket(rate=1, capacity=2, clock=FakeClock())
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+
+    def test_reservations_queue_up(self):
+        bucket = TokenBucket(rate=1, capacity=2, clock=FakeClock())
+        delays = [bucket.reserve() for _ in range(4)]
+        self.assertEqual(delays, [0, 0, 1, 2])
+
+    def test_refill(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=2, clock=clock)
+        for _ in range(3):
+            bucket.reserve()
+
+        clock.now += 3
+        self.assertEqual(bucket.reserve(), 0)
+        # Never refilled over capacity
+        clock.now += 100
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0, 0, 1])
+
+    def test_per_minute_limit(self):
+        bucket = TokenBucket.per_minute(300, burst=10, clock=FakeClock())
+        delays = [bucket.reserve() for _ in range(300)]
+        self.assertEqual(delays[:10], [0] * 10)
+        self.assertAlmostEqual(delays[-1], 60.0)
+
+
+class RedisTokenBucketTest(SimpleTestCase):
+    def test_reserve(self):
+        client = FakeRedis('0.5')
+        bucket = RedisTokenBucket.per_minute(120, burst=10, client=client, key='tinkoff:rate_limit:test')
+
+        self.assertEqual(bucket.reserve(2), 0.5)
+        self.assertEqual(client.calls, [(['tinkoff:rate_limit:test'], [110 / 60, 10, 2])])
+
+    def test_areserve(self):
+        client = FakeRedis('0')
+        bucket = RedisTokenBucket(rate=1, capacity=1, client=client, key='test')
+
+        self.assertEqual(asyncio.run(bucket.areserve()), 0)
+        self.assertEqual(len(client.calls), 1)
+
+
+def api_error(code: grpc.StatusCode, reset: int = 0) -> AioRequestError:
+    return AioRequestError(code, 'Test error', InjectedMetadata(ratelimit_reset=reset))
+
+
+class CircuitBreakerTest(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(threshold=2, cooldown=10, clock=self.clock)
+
+    def test_opens_after_threshold(self):
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.acquire(), (0.0, False))
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.opened, 1)
+        self.assertEqual(self.breaker.wait_time(), 10)
+
+    def test_single_probe_after_cooldown(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+
+        self.assertEqual(self.breaker.acquire(), (0.0, True))
+        self.assertEqual(self.breaker.acquire(), (CircuitBreaker.PROBE_WAIT, False))
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.acquire(), (0.0, False))
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_failed_probe_reopens(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+        self.breaker.acquire()
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.opened, 2)
+        self.assertEqual(self.breaker.acquire(), (10, False))
+
+    def test_release_probe(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+        self.breaker.acquire()
+
+        self.breaker.release_probe()
+        self.assertEqual(self.breaker.acquire(), (0.0, True))
+
+    def test_pause_is_never_shortened(self):
+        self.breaker.pause(30)
+        self.breaker.pause(5)
+        self.assertEqual(self.breaker.wait_time(), 30)
+
+
+class RetryPolicyTest(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(threshold=1, cooldown=10, clock=self.clock)
+        self.policy = RetryPolicy(max_retries=2, base_delay=0, rate_limit_jitter=0, breaker=self.breaker)
+
+    def failing(self, *errors: Exception, result: str = 'ok'):
+        errors = list(errors)
+
+        async def call():
+            if errors:
+                raise errors.pop(0)
+            return result
+        return call
+
+    def test_rate_limit_delay(self):
+        error = api_error(grpc.StatusCode.RESOURCE_EXHAUSTED, reset=3)
+        self.assertEqual(self.policy.delay(error, 0), 3)
+        self.assertIsNone(self.policy.delay(api_error(grpc.StatusCode.INVALID_ARGUMENT), 0))
+
+    def test_rate_limit_pauses_everyone(self):
+        self.policy.on_error(api_error(grpc.StatusCode.RESOURCE_EXHAUSTED, reset=3), 0)
+        self.assertEqual(self.breaker.wait_time(), 3)
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_retries_transient_errors(self):
+        policy = RetryPolicy(max_retries=2, base_delay=0, breaker=CircuitBreaker(clock=self.clock))
+        call = self.failing(api_error(grpc.StatusCode.UNAVAILABLE))
+
+        self.assertEqual(asyncio.run(policy.acall(call)), 'ok')
+        self.assertEqual(policy.breaker.failures, 0)
+
+    def test_gives_up(self):
+        policy = RetryPolicy(max_retries=1, base_delay=0, breaker=CircuitBreaker(clock=self.clock))
+        call = self.failing(*(api_error(grpc.StatusCode.UNAVAILABLE) for _ in range(3)))
+
+        with self.assertRaises(AioRequestError):
+            asyncio.run(policy.acall(call))
+
+    def test_not_retryable_error_is_raised(self):
+        call = self.failing(api_error(grpc.StatusCode.NOT_FOUND))
+        with self.assertRaises(AioRequestError):
+            asyncio.run(self.policy.acall(call))
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_probe_released_after_other_error(self):
+        self.breaker.record_failure()
+        self.clock.now += 10
+
+        with self.assertRaises(ValueError):
+            asyncio.run(self.policy.acall(self.failing(ValueError())))
+        self.assertEqual(self.breaker.acquire(), (0.0, True))
+
+    def test_probe_released_after_cancellation(self):
+        self.breaker.record_failure()
+        self.clock.now += 10
+
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(self.policy.acall(self.failing(asyncio.CancelledError())))
+        self.assertEqual(self.breaker.acquire(), (0.0, True))
+
+
+def candle_batch(rows: int = 1) -> CandleBatch:
+    task = InstrumentTask(None, None, 'test', 1)
+    return CandleBatch(task, [(1, None, 1.0, 1.0, 1.0, 1.0, 1.0, True)] * rows)
+
+
+class WriteStageTest(SimpleTestCase):
+    def test_backpressure(self):
+        async def scenario():
+            release = asyncio.Event()
+            written = []
+
+            async def write(batches):
+                await release.wait()
+                written.extend(batches)
+
+            async with WriteStage(write, workers=1, queue_size=1, max_wait=0) as stage:
+                await stage.put(candle_batch())
+                await stage.put(candle_batch())
+                producer = asyncio.create_task(stage.put(candle_batch()))
+                await asyncio.sleep(0.05)
+
+                self.assertFalse(producer.done())
+                self.assertTrue(stage.queue.full())
+                release.set()
+                await producer
+
+            self.assertEqual(len(written), 3)
+            self.assertEqual(stage.stats.batches, 3)
+            self.assertGreater(stage.put_blocked, 0)
+
+        asyncio.run(scenario())
+
+    def test_coalesces_batches(self):
+        async def scenario():
+            writes = []
+
+            async def write(batches):
+                writes.append(len(batches))
+
+            async with WriteStage(write, workers=1, max_rows=10, max_wait=0.1) as stage:
+                for _ in range(4):
+                    await stage.put(candle_batch(rows=5))
+
+            self.assertEqual(writes, [2, 2])
+
+        asyncio.run(scenario())
+
+    def test_error_raised_on_exit(self):
+        async def write(batches):
+            raise ValueError('Write failed')
+
+        async def scenario():
+            async with WriteStage(write, workers=1, max_wait=0) as stage:
+                await stage.put(candle_batch())
+
+        with self.assertRaises(ValueError):
+            asyncio.run(scenario())
+
+    def test_error_raised_on_put(self):
+        async def write(batches):
+            raise ValueError('Write failed')
+
+        async def scenario():
+            async with WriteStage(write, workers=1, max_wait=0) as stage:
+                await stage.put(candle_batch())
+                await asyncio.sleep(0.05)
+                await stage.put(candle_batch())
+
+        with self.assertRaises(ValueError):
+            asyncio.run(scenario())
+
+
+def daily_rows(instrument_id: int, start: datetime.datetime, days: int) -> list[tuple]:
+    return [
+        (instrument_id, start + datetime.timedelta(days=i), 10.0 + i, 20.0 + i, 5.0 - i, 11.0 + i, 100.0, True)
+        for i in range(days)
+    ]
+
+
+class WriteCandlesTest(TestCase):
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        create_models()
+        self.instrument = create_instruments()[0]
+
+    def test_duplicate_rows(self):
+        complete, = daily_rows(self.instrument.pk, self.start, 1)
+        incomplete = complete[:5] + (12.0, 50.0, False)
+        later = complete[:5] + (13.0, 60.0, False)
+        write_candles([complete, incomplete])
+        self.assertEqual(Candle.objects.get(instrument=self.instrument).close, complete[5])
+
+        Candle.objects.all().delete()
+        SyncState.objects.all().delete()
+        write_candles([incomplete, later])
+        self.assertEqual(Candle.objects.get(instrument=self.instrument).close, 13.0)
+        self.assertFalse(SyncState.objects.get(instrument=self.instrument, kind=SyncState.Kind.CANDLES).is_complete)
+
+
+class AggregateCandlesTest(SimpleTestCase):
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc) # Monday
+
+    def test_weekly(self):
+        rows = daily_rows(1, self.start, 9)
+        now = datetime.datetime(2024, 1, 10, tzinfo=datetime.timezone.utc)
+
+        weeks = aggregate_candles(rows, CandleIntervalType.WEEK, now)
+        self.assertEqual(weeks, [
+            (1, self.start, 10.0, 26.0, -1.0, 17.0, 700.0, True),
+            (1, self.start + datetime.timedelta(days=7), 17.0, 28.0, -3.0, 19.0, 200.0, False),
+        ])
+
+    def test_monthly_by_instrument(self):
+        rows = daily_rows(1, self.start, 35) + daily_rows(2, self.start, 1)
+        now = datetime.datetime(2024, 3, 1, tzinfo=datetime.timezone.utc)
+
+        months = aggregate_candles(rows, CandleIntervalType.MONTH, now)
+        self.assertEqual([(row[0], row[1].month, row[6], row[7]) for row in months], [
+            (1, 1, 3100.0, True),
+            (1, 2, 400.0, True),
+            (2, 1, 100.0, True),
+        ])
+
+    def test_incomplete_day(self):
+        rows = daily_rows(1, self.start, 3)
+        rows[-1] = rows[-1][:-1] + (False,)
+        now = datetime.datetime(2024, 2, 1, tzinfo=datetime.timezone.utc)
+
+        self.assertFalse(aggregate_candles(rows, CandleIntervalType.WEEK, now)[0][7])
+
+
+class RollupTest(TestCase):
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc) # Monday
+    now = datetime.datetime(2024, 2, 1, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        create_models()
+        self.instrument = create_instruments()[0]
+
+    def weeks(self) -> list[tuple]:
+        return list(
+            Candle.objects.filter(instrument=self.instrument, interval=CandleIntervalType.WEEK)
+            .order_by('time').values_list('time', 'high')
+        )
+
+    def test_recomputes_corrected_history(self):
+        write_candles(daily_rows(self.instrument.pk, self.start, 14))
+        rollup_candles(CandleIntervalType.WEEK, self.now)
+        self.assertEqual([high for _, high in self.weeks()], [26.0, 33.0])
+
+        # The first week is corrected after the second one was rolled up
+        row = daily_rows(self.instrument.pk, self.start, 2)[1]
+        write_candles([row[:3] + (100.0,) + row[4:]])
+        self.assertEqual(get_dirty_instruments(CandleIntervalType.WEEK), {self.instrument.pk: self.start})
+
+        rollup_candles(CandleIntervalType.WEEK, self.now)
+        self.assertEqual([high for _, high in self.weeks()], [100.0, 33.0])
+
+
+class CandleArraysBatchTest(TestCase):
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        create_models()
+        self.instruments = [instrument.pk for instrument in create_instruments()]
+        media = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, settings.MEDIA_ROOT)
+
+    def test_matches_single_instrument(self):
+        write_candles(daily_rows(self.instruments[0], self.start, 10))
+        write_candles(daily_rows(self.instruments[1], self.start, 3))
+        archive_instrument(self.instruments[0], CandleIntervalType.DAY, self.start + datetime.timedelta(days=5))
+
+        with self.assertNumQueries(2):
+            batch = candle_arrays_batch(self.instruments + [0])
+
+        self.assertEqual(len(batch[0]['time']), 0)
+        for instrument_id in self.instruments:
+            arrays = candle_arrays(instrument_id)
+            for name in ('time', 'close', 'is_complete'):
+                np.testing.assert_array_equal(batch[instrument_id][name], arrays[name])
+        self.assertEqual(len(batch[self.instruments[0]]['time']), 10)
+
+
+class ReturnsTest(SimpleTestCase):
+    def test_forward_fill(self):
+        matrix = np.array([[np.nan, 1, np.nan, np.nan, 4, np.nan]])
+        np.testing.assert_array_equal(forward_fill(matrix, 1), [[np.nan, 1, 1, np.nan, 4, 4]])
+
+    def test_period_returns(self):
+        close = np.full((2, max(PERIODS.values()) + 1), np.nan)
+        close[0, -1] = 110
+        close[0, -8] = 100
+        close[0, -40] = 50 # Stands for the price 30 days ago, within the lookback
+
+        returns = period_returns(close)
+        self.assertAlmostEqual(returns['return_7d'][0], 0.1)
+        self.assertAlmostEqual(returns['return_30d'][0], 1.2)
+        self.assertTrue(np.isnan(returns['return_90d'][0]))
+        self.assertTrue(np.isnan(returns['return_7d'][1]))
+
+
+def create_instruments() -> list[Instrument]:
+    """A share of every company created by create_models"""
+    country = Country.objects.get(iso_code='test')
+    exchange = Exchange.objects.create(title='test', slug='test', mic='TEST', lei='test', country=country)
+    return [
+        Instrument.objects.create(
+            name_ru='test',
+            name_en='test',
+            ticker=f'test{i}',
+            company=company,
+            exchange=exchange,
+            currency=Currency.objects.get(iso_code='test'),
+            tinkoff_uid=f'uid{i}',
+            instrument_type='share',
+            class_code='TQBR',
+            isin=f'isin{i}',
+            created_by=User.objects.get(username='test'),
+        )
+        for i, company in enumerate(Company.objects.order_by('id'))
+    ]
+
+
+def candle_response(start: datetime.datetime, days: int, complete: bool = True):
+    candles = [
+        SimpleNamespace(
+            time=start + datetime.timedelta(days=i),
+            open=Quotation(units=10 + i, nano=0),
+            high=Quotation(units=12 + i, nano=0),
+            low=Quotation(units=9 + i, nano=0),
+            close=Quotation(units=11 + i, nano=500_000_000),
+            volume=1000 + i,
+            is_complete=complete or i < days - 1,
+        )
+        for i in range(days)
+    ]
+    return SimpleNamespace(candles=candles)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class CandleSyncReplayTest(TransactionTestCase):
+    """Candle sync of recorded API responses, writers commit in their own threads"""
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    end = datetime.datetime(2024, 1, 10, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        create_models()
+        self.instruments = create_instruments()
+
+        cassette = Cassette()
+        for i, instrument in enumerate(self.instruments):
+            cassette.calls[self.call(instrument)].append(candle_response(self.start, 5 + i, complete=i == 0))
+        self.cassette = cassette
+
+    def call(self, instrument: Instrument) -> tuple:
+        return call_key('market_data', 'get_candles', (), {
+            'instrument_id': instrument.tinkoff_uid,
+            'interval': CandleServiceAsync.API_INTERVALS[CandleIntervalType.DAY],
+            'from_': self.start,
+            'to': self.end,
+        })
+
+    def service(self, **kwargs) -> CandleServiceAsync:
+        return CandleServiceAsync(
+            rate_limiter=RateLimiter(quotas=dict.fromkeys(API_QUOTAS, 1_000_000), backend=local_backend),
+            transport=ReplayTransport(self.cassette, **kwargs),
+            retry_policy=RetryPolicy(base_delay=0, rate_limit_jitter=0, breaker=CircuitBreaker()),
+        )
+
+    def tasks(self) -> list[InstrumentTask]:
+        return [InstrumentTask(self.start, self.end, i.tinkoff_uid, i.id) for i in self.instruments]
+
+    def test_sync(self):
+        service = self.service(error_rate=0.3, ratelimit_reset=0, seed=1)
+        run_async(self.run_service(service, self.tasks()))
+
+        self.assertGreater(service.transport.errors, 0)
+        self.assertEqual(service.stats['write'].rows, 11)
+        for i, instrument in enumerate(self.instruments):
+            candles = Candle.objects.filter(instrument=instrument, interval=CandleIntervalType.DAY).order_by('time')
+            self.assertEqual(candles.count(), 5 + i)
+            self.assertEqual(candles.first().close, 11.5)
+
+            state = SyncState.objects.get(instrument=instrument, kind=SyncState.Kind.CANDLES, interval=CandleIntervalType.DAY)
+            self.assertEqual(state.last_time, self.start + datetime.timedelta(days=4 + i))
+            self.assertEqual(state.is_complete, i == 0)
+
+    def test_sync_job(self):
+        job = create_job(SyncState.Kind.CANDLES, self.tasks(), CandleIntervalType.DAY)
+        start_job(job)
+        service = self.service()
+        run_async(self.run_service(service, load_job_tasks(job), job.pk))
+
+        job = finish_job(job.pk)
+        self.assertEqual(job.status, SyncJob.Status.COMPLETED)
+        self.assertEqual(job.rows, 11)
+        self.assertFalse(job.tasks.exclude(status=SyncJobTask.Status.DONE).exists())
+
+    def test_failed_task_fails_job(self):
+        self.cassette.calls[self.call(self.instruments[1])] = [api_error(grpc.StatusCode.NOT_FOUND)]
+        job = create_job(SyncState.Kind.CANDLES, self.tasks(), CandleIntervalType.DAY)
+        start_job(job)
+        service = self.service()
+        run_async(self.run_service(service, load_job_tasks(job), job.pk))
+
+        job = finish_job(job.pk)
+        self.assertEqual(job.status, SyncJob.Status.FAILED)
+        self.assertEqual(job.tasks.filter(status=SyncJobTask.Status.FAILED).count(), 1)
+        self.assertEqual(job.rows, 5)
+
+    def test_completed_job_is_skipped(self):
+        job = create_job(SyncState.Kind.CANDLES, self.tasks(), CandleIntervalType.DAY)
+        SyncJob.objects.filter(pk=job.pk).update(status=SyncJob.Status.COMPLETED)
+
+        self.assertIsNone(run_async(plan_candle_job(job.pk)))
+        self.assertIsNone(run_async(plan_candle_job(job.pk + 1)))
+
+    @staticmethod
+    async def run_service(service: CandleServiceAsync, tasks: list[InstrumentTask], job_id: int = None):
+        async with service:
+            await service.process_tasks(tasks, concurrency=2, job_id=job_id)
+
+
+class FakeChannelLayer:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.messages: list[tuple[str, dict]] = []
+
+    async def group_send(self, group: str, message: dict):
+        await asyncio.sleep(self.delay)
+        self.messages.append((group, message))
+
+
+class PriceBroadcasterTest(SimpleTestCase):
+    time = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def test_one_message_per_group(self):
+        layer = FakeChannelLayer()
+        broadcaster = PriceBroadcaster(window=10, channel_layer=layer)
+
+        async def run():
+            async with broadcaster:
+                broadcaster.publish({'uid0': (self.time, 1.0), 'uid1': (self.time, 2.0)})
+                broadcaster.publish({'uid0': (self.time + datetime.timedelta(minutes=1), 3.0)})
+                broadcaster.publish({'uid1': (self.time - datetime.timedelta(minutes=1), 4.0)})
+        run_async(run())
+
+        self.assertEqual(broadcaster.sent, 2)
+        self.assertEqual([group for group, _ in layer.messages], [PriceBroadcaster.LIST_GROUP, PriceBroadcaster.INSTRUMENT_GROUP])
+        for _, message in layer.messages:
+            self.assertEqual({u['uid']: u['price'] for u in message['data']}, {'uid0': 3.0, 'uid1': 2.0})
+
+    def test_exit_waits_for_flush(self):
+        layer = FakeChannelLayer(delay=0.05)
+        broadcaster = PriceBroadcaster(window=0, channel_layer=layer)
+
+        async def run():
+            async with broadcaster:
+                broadcaster.publish({'uid0': (self.time, 1.0)})
+                await asyncio.sleep(0.01) # The first batch is being sent
+                broadcaster.publish({'uid1': (self.time, 2.0)})
+        run_async(run())
+
+        prices = {u['uid'] for group, message in layer.messages for u in message['data'] if group == PriceBroadcaster.LIST_GROUP}
+        self.assertEqual(prices, {'uid0', 'uid1'})
+        self.assertEqual(broadcaster.sent, 4)
+
+
+class LiveCandleTest(SimpleTestCase):
+    today = datetime.datetime(2024, 1, 2, 7, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        self.instrument = InstrumentRef(1, 'uid0', 'TQBR', 1, 'rub', 1, '')
+        self.stream = MarketDataStream(None, InstrumentMap([self.instrument], {}))
+        self.stream.offsets[1] = datetime.timedelta(hours=7)
+        self.stream.candles[1] = LiveCandle(1, self.today, 10.0, 10.0, 10.0, 10.0)
+
+    def test_late_minute_of_previous_day_is_dropped(self):
+        minute = self.today - datetime.timedelta(hours=8) # 23:00 of the day before
+        self.assertIsNone(self.stream.get_live_candle(self.instrument, minute, 20.0))
+        self.assertEqual(self.stream.candles[1].time, self.today)
+
+    def test_minutes_of_today_and_next_day(self):
+        live = self.stream.get_live_candle(self.instrument, self.today + datetime.timedelta(hours=3), 20.0)
+        self.assertIs(live, self.stream.candles[1])
+
+        next_live = self.stream.get_live_candle(self.instrument, self.today + datetime.timedelta(days=1), 20.0)
+        self.assertEqual(next_live.time, self.today + datetime.timedelta(days=1))
+        self.assertEqual(next_live.open, 20.0)
+
+
+class DividendSyncReplayTest(TransactionTestCase):
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    end = datetime.datetime(2024, 1, 10, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        create_models()
+        self.instruments = create_instruments()
+
+    def test_failed_instrument_does_not_stop_others(self):
+        cassette = Cassette()
+        for i, instrument in enumerate(self.instruments):
+            key = call_key('instruments', 'get_dividends', (), {
+                'instrument_id': instrument.tinkoff_uid,
+                'from_': self.start,
+                'to': self.end,
+            })
+            cassette.calls[key].append(api_error(grpc.StatusCode.NOT_FOUND) if i == 0 else SimpleNamespace(dividends=[]))
+
+        service = DividendServiceAsync(
+            rate_limiter=RateLimiter(quotas=dict.fromkeys(API_QUOTAS, 1_000_000), backend=local_backend),
+            transport=ReplayTransport(cassette),
+            retry_policy=RetryPolicy(base_delay=0, rate_limit_jitter=0, breaker=CircuitBreaker()),
+        )
+        tasks = [InstrumentTask(self.start, self.end, i.tinkoff_uid, i.id) for i in self.instruments]
+        run_async(self.run_service(service, tasks))
+
+        self.assertEqual(service.stats['failed'], 1)
+        synced = set(SyncState.objects.filter(kind=SyncState.Kind.DIVIDENDS).values_list('instrument_id', flat=True))
+        self.assertEqual(synced, {i.id for i in self.instruments[1:]})
+
+    @staticmethod
+    async def run_service(service: DividendServiceAsync, tasks: list[InstrumentTask]):
+        async with service:
+            await service.process_tasks(tasks, concurrency=2)
+
+
+class CassetteTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cassette.json.gz')
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_round_trip(self):
+        time = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        key = call_key('market_data', 'get_candles', (), {'interval': CandleInterval.CANDLE_INTERVAL_DAY, 'from_': time})
+        cassette = Cassette(meta={'service': 'candles', 'tasks': [(time, time, 'uid0')]})
+        cassette.calls[key] += [api_error(grpc.StatusCode.RESOURCE_EXHAUSTED, reset=3), Quotation(units=11, nano=500_000_000)]
+        cassette.save(self.path)
+
+        loaded = Cassette.load(self.path)
+        self.assertEqual(loaded.meta, {'service': 'candles', 'tasks': [[time, time, 'uid0']]})
+        error, response = loaded.calls[key]
+        self.assertEqual(error.code, grpc.StatusCode.RESOURCE_EXHAUSTED)
+        self.assertEqual(error.metadata.ratelimit_reset, 3)
+        self.assertEqual(response, Quotation(units=11, nano=500_000_000))
+
+    def test_replay_raises_recorded_error(self):
+        key = call_key('market_data', 'get_candles', (), {})
+        cassette = Cassette({key: [api_error(grpc.StatusCode.NOT_FOUND)]})
+        transport = ReplayTransport(cassette)
+        with self.assertRaises(AioRequestError):
+            run_async(transport.call('market_data', 'get_candles', (), {}))
+
+    def test_foreign_types_are_not_loaded(self):
+        with gzip.open(self.path, 'wt', encoding='utf-8') as file:
+            json.dump({'calls': [], 'meta': {'__dataclass__': 'os:system', 'fields': {}}}, file)
+        with self.assertRaises(ValueError):
+            Cassette.load(self.path)
+
+
+class CandleCacheTest(TestCase):
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        create_models()
+        self.instrument = create_instruments()[0]
+        self.cache = CandleCache(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.cache.root)
+
+    def test_incremental_refresh(self):
+        write_candles(daily_rows(self.instrument.pk, self.start, 3))
+        self.assertEqual(self.cache.refresh(), 3)
+
+        rows = daily_rows(self.instrument.pk, self.start, 5)
+        rows[-1] = rows[-1][:-1] + (False,)
+        write_candles(rows[2:])
+        self.assertEqual(self.cache.refresh(), 3) # From the latest cached candle on
+        self.assertEqual(len(self.cache.read(self.instrument.pk)), 5)
+
+    def test_older_candles_rebuild(self):
+        write_candles(daily_rows(self.instrument.pk, self.start + datetime.timedelta(days=5), 5))
+        self.cache.refresh()
+        before = self.cache.read(self.instrument.pk)
+
+        # Written below the watermark, e.g. a failed older chunk of a resumed job
+        write_candles(daily_rows(self.instrument.pk, self.start, 5))
+        self.assertEqual(CandleChange.objects.get().since, self.start)
+        self.assertEqual(self.cache.refresh(), 10)
+
+        cached = self.cache.read(self.instrument.pk)
+        self.assertEqual(len(cached), 10)
+        self.assertTrue((np.diff(cached.time) > 0).all())
+        self.assertEqual(int(cached.time[0]), int(self.start.timestamp()))
+        # Mappings of the previous files stay readable
+        self.assertEqual(len(before), 5)
+        self.assertEqual(float(before.close[0]), 11.0)
@@ -22,4 +22,8 @@ urlpatterns = [
     path('shares/search/', views.ShareListSearchListAPIView.as_view()),
     path('shares/<str:exchange>-<str:ticker>/', views.ShareDetailAPIView.as_view()),
     path('shares/<str:exchange>-<str:ticker>/candles/', views.ShareDetailCandleListAPIView.as_view()),
+
+    # Sync Jobs
+    path('sync-jobs/', views.SyncJobListAPIView.as_view()),
+    path('sync-jobs/<int:pk>/', views.SyncJobDetailAPIView.as_view()),
 ]
@@ -1,14 +1,20 @@
 # Django
+import datetime
+
 from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 # DRF
-from rest_framework import exceptions
+from rest_framework import exceptions, permissions
 from rest_framework.generics import ListAPIView, RetrieveAPIView, get_object_or_404
 # Invest App
 from apps.invest import serializers
 
 from apps.invest.paginators import StandardResultsSetPagination
-from apps.invest.models import Company, Country, Sector, Currency, Instrument
+from apps.invest.models import Company, Country, Sector, Currency, Instrument, CandleIntervalType, SyncJob
+from apps.invest.services.archive import candle_series
+from apps.invest.services.jobs import with_progress
 
 ######################################################################
 # Companies
@@ -212,10 +218,24 @@ class ShareDetailAPIView(RetrieveAPIView):
 
 class ShareDetailCandleListAPIView(ListAPIView):
     serializer_class = serializers.CandleSerializer
+    # Period of intraday charts without ?from=, also keeps the scan to the latest partitions
+    INTRADAY_WINDOWS = {
+        CandleIntervalType.MINUTE: datetime.timedelta(days=2),
+        CandleIntervalType.FIVE_MINUTES: datetime.timedelta(days=10),
+        CandleIntervalType.HOUR: datetime.timedelta(days=90),
+    }
 
     def get_queryset(self):
         exchange = self.kwargs.get('exchange', '')
         ticker = self.kwargs.get('ticker', '')
+        interval = self.request.query_params.get('interval', CandleIntervalType.DAY)
+        if interval not in CandleIntervalType.values:
+            raise exceptions.ValidationError({'interval': f'Expected one of {", ".join(CandleIntervalType.values)}'})
+
+        time_from = self.get_time_param('from')
+        time_to = self.get_time_param('to')
+        if time_from is None and interval in self.INTRADAY_WINDOWS:
+            time_from = (time_to or timezone.now()) - self.INTRADAY_WINDOWS[interval]
 
         try:
             instrument = Instrument.objects.get(
@@ -227,4 +247,40 @@ class ShareDetailCandleListAPIView(ListAPIView):
         except Instrument.DoesNotExist:
             raise exceptions.NotFound(f'Share ({exchange}-{ticker}) does not exist',)
 
-        return instrument.candles.all()
+        # Old candles may live in archive files, the series reads through them
+        return candle_series(instrument.id, interval, time_from, time_to)
+
+    def get_time_param(self, name: str):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+
+        try:
+            time = parse_datetime(value) or datetime.datetime.fromisoformat(value)
+        except ValueError:
+            raise exceptions.ValidationError({name: 'Expected an ISO 8601 date or time'})
+        return time if timezone.is_aware(time) else timezone.make_aware(time, datetime.timezone.utc)
+
+######################################################################
+# Sync Jobs
+######################################################################
+class SyncJobListAPIView(ListAPIView):
+    pagination_class = StandardResultsSetPagination
+    serializer_class = serializers.SyncJobSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_queryset(self):
+        queryset = with_progress(SyncJob.objects.all())
+
+        status = self.request.query_params.get('status')
+        if status:
+            queryset = queryset.filter(status=status)
+
+        return queryset
+
+
+class SyncJobDetailAPIView(RetrieveAPIView):
+    serializer_class = serializers.SyncJobSerializer
+    permission_classes = [permissions.IsAdminUser]
+    queryset = with_progress(SyncJob.objects.all())
+
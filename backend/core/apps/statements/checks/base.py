@@ -1,9 +1,9 @@
-import calendar
 import datetime
 
+import numpy as np
+
 from apps.invest.models import Company
-from apps.statements import models
-from apps.statements.types import Statement
+from apps.statements.types import Columns, Severity, Statement, Status
 
 
 class BaseCheck:
@@ -16,6 +16,7 @@ class BaseCheck:
         self.descriptions: dict | None = None
         self.market_country_adjectif: str | None = None
         self.sector_company_name: str | None = None
+        self.report_date: datetime.datetime | None = None
         # Value
         self.company_current_price: float | None = None
         self.average_price_target_1y: float | None = None
@@ -94,34 +95,55 @@ class BaseCheck:
         for k, v in fields.items():
             setattr(self, k, v)
 
-    def to_dict(self):
-        return {
-            'type': self.__class__.__name__,
-            'statement': self.statement,
-            'result': self._process()
-        }
-
-    def _process(self):
-        self.populate()
-        self.check()
-        self._create_or_update()
-        return f'{self.slug.upper()} on {self.statement["name"]} was {"created" if self.is_created else "updated"}'
-
-    def _create_or_update(self):
-        _, self.is_created = models.Statement.objects.update_or_create(
-            name=self.statement['name'],
-            company=self.statement['company'],
-            defaults=self.statement,
-        )
+    # Name of the statement
+    name: str = ''
+    # Inputs of the predicate, the check has no data for a company when one of them is NaN
+    inputs: tuple[str, ...] = ()
+    # Inputs of the predicate whose NaN fails the check instead
+    nullable_inputs: tuple[str, ...] = ()
+    # Inputs the descriptions are rendered from
+    description_inputs: tuple[str, ...] = ()
+    # Severity of a failed check, None keeps the one set by populate
+    fail_severity: Severity | None = None
 
-    def _validate(self):
-        pass
+    @classmethod
+    def fingerprint_inputs(cls) -> tuple[str, ...]:
+        """Every input of the check, its statement only changes when one of them does"""
+        return tuple(dict.fromkeys(cls.inputs + cls.nullable_inputs + cls.description_inputs))
+
+    @staticmethod
+    def predicate(c: Columns) -> np.ndarray:
+        """Whether the check passes, evaluated for every company of the columns at once"""
+        raise NotImplementedError
+
+    def render(self, passed: bool, missing: bool) -> Statement:
+        """Result record of the evaluated check, persisted in bulk by the engine"""
+        try:
+            self.populate()
+        except ZeroDivisionError:
+            # A description ratio over an input without data
+            missing = True
 
-    def check(self):
+        if missing:
+            self.statement['status'] = Status.NODATA
+            self.statement['description'] = ''
+            return self.statement
+
+        self.statement['status'] = Status.PASS if passed else Status.FAIL
+        self.statement['description'] = self.describe(passed)
+        if self.fail_severity is not None:
+            self.statement['severity'] = Severity.NONE if passed else self.fail_severity
+        return self.statement
+
+    def describe(self, passed: bool) -> str:
+        return self.descriptions['success' if passed else 'error']
+
+    def _validate(self):
         pass
 
     def populate(self):
-        pass
+        """Set the statement and its descriptions, every check renders one"""
+        raise NotImplementedError
 
     def get_finance_format(self, value):
         return f'{self.currency}{value:.2f}'
@@ -144,10 +166,5 @@ class BaseCheck:
         return f'{self.currency}{value:.2f}Q'
 
     def get_report_diff(self) -> datetime.timedelta | None:
-        reports = self.company_object.reports
-        if reports.exists():
-            report = reports.latest('year', 'quarter')
-            month = 12 if report.quarter == 0 else report.quarter * 3
-            _, last_day = calendar.monthrange(report.year, month)
-            report_date = datetime.datetime(report.year, month, last_day)
-            return datetime.datetime.now() - report_date
+        if self.report_date is not None:
+            return datetime.datetime.now() - self.report_date
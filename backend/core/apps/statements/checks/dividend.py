@@ -1,3 +1,5 @@
+import numpy as np
+
 from apps.statements import types
 from apps.statements.checks.base import BaseCheck
 
@@ -9,18 +11,18 @@ severity = types.Severity
 
 
 class SignificantDividendCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_dividend_yield > self.market_dividend_yield_p25:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsDividendSignificant'
+    inputs = ('company_dividend_yield', 'market_dividend_yield_p25')
+    description_inputs = ('company_dividend_yield', 'market_dividend_yield_p25')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_dividend_yield > c.market_dividend_yield_p25
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsDividendSignificant',
+            name=self.name,
             title='Notable Dividend',
             description='',
             question=f'Is {self.slug.upper()}\'s dividend yield above the bottom 25% of dividend payers?',
@@ -49,18 +51,18 @@ class SignificantDividendCheck(BaseCheck):
 
 
 class HighDividendCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_dividend_yield > self.market_dividend_yield_p75:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsDividendYieldTopTier'
+    inputs = ('company_dividend_yield', 'market_dividend_yield_p75')
+    description_inputs = ('company_dividend_yield', 'market_dividend_yield_p75')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_dividend_yield > c.market_dividend_yield_p75
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsDividendYieldTopTier',
+            name=self.name,
             title='High Dividend',
             description='',
             question=f'Is {self.slug.upper()}\'s dividend yield in the top 25% of dividend payers?',
@@ -89,18 +91,17 @@ class HighDividendCheck(BaseCheck):
 
 
 class StableDividendCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_dividend_is_volatile_in_10y:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsDividendStable'
+    inputs = ('company_dividend_is_volatile_in_10y',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_dividend_is_volatile_in_10y
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsDividendStable',
+            name=self.name,
             title='Stable Dividend',
             description='',
             question=f'Is {self.slug.upper()}\'s dividend stable?',
@@ -118,18 +119,17 @@ class StableDividendCheck(BaseCheck):
 
 
 class GrowingDividendCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_dividend_amount > self.company_dividend_amount_10y_ago:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsDividendGrowing'
+    inputs = ('company_dividend_amount', 'company_dividend_amount_10y_ago')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_dividend_amount > c.company_dividend_amount_10y_ago
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsDividendGrowing',
+            name=self.name,
             title='Growing Dividend',
             description='',
             question=f'Is {self.slug.upper()}\'s dividend growing over the long-term?',
@@ -147,18 +147,18 @@ class GrowingDividendCheck(BaseCheck):
 
 
 class EarningsCoverageCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_payout_ratio < 1:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsDividendCovered'
+    inputs = ('company_payout_ratio',)
+    description_inputs = ('company_payout_ratio',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_payout_ratio < 1
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsDividendCovered',
+            name=self.name,
             title='Earnings Coverage',
             description='',
             question=f'Is {self.slug.upper()}\'s dividend covered by earnings?',
@@ -181,18 +181,18 @@ class EarningsCoverageCheck(BaseCheck):
 
 
 class CashFlowCoverageCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_cash_payout_ratio < 1:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsDividendCoveredByFreeCashFlow'
+    inputs = ('company_cash_payout_ratio',)
+    description_inputs = ('company_cash_payout_ratio',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_cash_payout_ratio < 1
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsDividendCoveredByFreeCashFlow',
+            name=self.name,
             title='Cash Flow Coverage',
             description='',
             question=f'Is {self.slug.upper()}\'s dividend covered by free cash flows?',
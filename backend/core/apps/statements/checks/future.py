@@ -1,3 +1,5 @@
+import numpy as np
+
 from apps.statements import types
 from apps.statements.checks.base import BaseCheck
 
@@ -9,18 +11,18 @@ severity = types.Severity
 
 
 class EarningsVsSavingRateCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_forecast_earnings_growth > self.country_saving_rate:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsExpectedProfitGrowthAboveRiskFreeRate'
+    inputs = ('company_forecast_earnings_growth', 'country_saving_rate')
+    description_inputs = ('company_forecast_earnings_growth', 'country_saving_rate')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_forecast_earnings_growth > c.country_saving_rate
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsExpectedProfitGrowthAboveRiskFreeRate',
+            name=self.name,
             title='Earnings vs Savings Rate',
             description='',
             question=f'Is {self.slug.upper()} expected to grow profits faster than the low risk savings rate?',
@@ -46,18 +48,18 @@ class EarningsVsSavingRateCheck(BaseCheck):
 
 
 class EarningsVsMarketCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_forecast_earnings_growth > self.market_forecast_earnings_growth:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsExpectedAnnualProfitGrowthAboveMarket'
+    inputs = ('company_forecast_earnings_growth', 'market_forecast_earnings_growth')
+    description_inputs = ('company_forecast_earnings_growth', 'market_forecast_earnings_growth')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_forecast_earnings_growth > c.market_forecast_earnings_growth
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsExpectedAnnualProfitGrowthAboveMarket',
+            name=self.name,
             title='Earnings vs Market',
             description='',
             question=f'Is {self.slug.upper()} expected to grow profits faster than the market?',
@@ -86,18 +88,17 @@ class EarningsVsMarketCheck(BaseCheck):
 
 
 class HighGrowthEarningsCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_forecast_earnings_growth > 0.2:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsExpectedAnnualProfitGrowthHigh'
+    inputs = ('company_forecast_earnings_growth',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_forecast_earnings_growth > 0.2
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsExpectedAnnualProfitGrowthHigh',
+            name=self.name,
             title='High Growth Earnings',
             description='',
             question=f'Is {self.slug.upper()} expected to have high profit growth?',
@@ -115,18 +116,18 @@ class HighGrowthEarningsCheck(BaseCheck):
 
 
 class RevenueVsMarketCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_forecast_revenue_growth > self.market_forecast_revenue_growth:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsExpectedRevenueGrowthAboveMarket'
+    inputs = ('company_forecast_revenue_growth', 'market_forecast_revenue_growth')
+    description_inputs = ('company_forecast_revenue_growth', 'market_forecast_revenue_growth')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_forecast_revenue_growth > c.market_forecast_revenue_growth
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsExpectedRevenueGrowthAboveMarket',
+            name=self.name,
             title='Revenue vs Market',
             description='',
             question=f'Is {self.slug.upper()} revenue growth expected to exceed the market?',
@@ -157,18 +158,18 @@ class RevenueVsMarketCheck(BaseCheck):
 
 
 class HighGrowthRevenueCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_forecast_revenue_growth > 0.2:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsExpectedRevenueGrowthHigh'
+    inputs = ('company_forecast_revenue_growth',)
+    description_inputs = ('company_forecast_revenue_growth',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_forecast_revenue_growth > 0.2
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsExpectedRevenueGrowthHigh',
+            name=self.name,
             title='High Growth Revenue',
             description='',
             question=f'Is {self.slug.upper()} expected to have high revenue growth?',
@@ -193,18 +194,18 @@ class HighGrowthRevenueCheck(BaseCheck):
 
 
 class FutureROECheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_future_roe_3y > 0.2:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsReturnOnEquityForecastAboveBenchmark'
+    inputs = ('company_future_roe_3y',)
+    description_inputs = ('company_future_roe_3y',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_future_roe_3y > 0.2
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsReturnOnEquityForecastAboveBenchmark',
+            name=self.name,
             title='Future ROE',
             description='',
             question=f'Is {self.slug.upper()}\'s return on equity forecast to be above 20%?',
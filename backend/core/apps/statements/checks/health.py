@@ -1,3 +1,5 @@
+import numpy as np
+
 from apps.statements import types
 from apps.statements.checks.base import BaseCheck
 
@@ -9,18 +11,18 @@ severity = types.Severity
 
 
 class ShortTermLiabilitiesCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_short_term_assets > self.company_short_term_liabilities:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'AreShortTermLiabilitiesCovered'
+    inputs = ('company_short_term_assets', 'company_short_term_liabilities')
+    description_inputs = ('company_short_term_assets', 'company_short_term_liabilities')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_short_term_assets > c.company_short_term_liabilities
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='AreShortTermLiabilitiesCovered',
+            name=self.name,
             title='Short Term Liabilities',
             description='',
             question=f'Are {self.slug.upper()}\'s short term liabilities covered by its cash and liquid assets?',
@@ -46,18 +48,18 @@ class ShortTermLiabilitiesCheck(BaseCheck):
 
 
 class LongTermLiabilitiesCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_short_term_assets > self.company_long_term_liabilities:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'AreLongTermLiabilitiesCovered'
+    inputs = ('company_short_term_assets', 'company_long_term_liabilities')
+    description_inputs = ('company_short_term_assets', 'company_long_term_liabilities')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_short_term_assets > c.company_long_term_liabilities
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='AreLongTermLiabilitiesCovered',
+            name=self.name,
             title='Long Term Liabilities',
             description='',
             question=f'Are {self.slug.upper()}\'s long term liabilities covered by its cash and liquid assets?',
@@ -83,18 +85,18 @@ class LongTermLiabilitiesCheck(BaseCheck):
 
 
 class DebtLevelCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_net_debt_to_equity_ratio > 0.02:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsDebtLevelAppropriate'
+    inputs = ('company_net_debt_to_equity_ratio',)
+    description_inputs = ('company_net_debt_to_equity_ratio',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_net_debt_to_equity_ratio > 0.02
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsDebtLevelAppropriate',
+            name=self.name,
             title='Debt Level',
             description='',
             question=f'Is {self.slug.upper()}\'s debt level appropriate?',
@@ -119,18 +121,18 @@ class DebtLevelCheck(BaseCheck):
 
 
 class ReducingDebtCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_debt_to_equity_ratio_5Y_ago > self.company_debt_to_equity_ratio:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'HasDebtReducedOverTime'
+    inputs = ('company_debt_to_equity_ratio_5Y_ago', 'company_debt_to_equity_ratio')
+    description_inputs = ('company_debt_to_equity_ratio', 'company_debt_to_equity_ratio_5Y_ago')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_debt_to_equity_ratio_5Y_ago > c.company_debt_to_equity_ratio
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasDebtReducedOverTime',
+            name=self.name,
             title='Reducing Debt',
             description='',
             question=f'Has {self.slug.upper()}\'s debt reduced over time?',
@@ -156,18 +158,18 @@ class ReducingDebtCheck(BaseCheck):
 
 
 class DebtCoverageCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_operating_cash_flow > self.company_debt:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsDebtCoveredByCashflow'
+    inputs = ('company_operating_cash_flow', 'company_debt')
+    description_inputs = ('company_operating_cash_flow', 'company_debt')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_operating_cash_flow > c.company_debt
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsDebtCoveredByCashflow',
+            name=self.name,
             title='Debt Coverage',
             description='',
             question=f'Is {self.slug.upper()}\'s debt covered by its cash flow?',
@@ -189,18 +191,18 @@ class DebtCoverageCheck(BaseCheck):
 
 
 class InterestCoverageCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_ebit > self.company_interest_rate:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsInterestCoveredByProfit'
+    inputs = ('company_ebit', 'company_interest_rate')
+    description_inputs = ('company_ebit', 'company_debt')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_ebit > c.company_interest_rate
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsInterestCoveredByProfit',
+            name=self.name,
             title='Interest Coverage',
             description='',
             question=f'Is {self.slug.upper()}\'s interest expenses covered by its profits?',
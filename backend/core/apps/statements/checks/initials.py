@@ -1,3 +1,5 @@
+import numpy as np
+
 from apps.statements import types
 from apps.statements.checks.base import BaseCheck
 
@@ -9,18 +11,18 @@ severity = types.Severity
 
 
 class HasBeenGrowingProfitOrRevenueCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_earnings_growth > 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'HasBeenGrowingProfitOrRevenue'
+    inputs = ('company_earnings_growth',)
+    description_inputs = ('company_earnings_growth',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_earnings_growth > 0
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasBeenGrowingProfitOrRevenue',
+            name=self.name,
             title='Has Been Growing Profit Or Revenue',
             description='',
             question=f'Has {self.slug.upper()} been growing?',
@@ -40,18 +42,18 @@ class HasBeenGrowingProfitOrRevenueCheck(BaseCheck):
 
 
 class IsDividendAttractiveCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_dividend_amount > self.company_dividend_amount_10y_ago:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsDividendAttractive'
+    inputs = ('company_dividend_amount', 'company_dividend_amount_10y_ago')
+    description_inputs = ('company_payout_ratio',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_dividend_amount > c.company_dividend_amount_10y_ago
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsDividendAttractive',
+            name=self.name,
             title='Is Dividend Attractive',
             description='',
             question=f'Is {self.slug.upper()}\'s dividend attractive?',
@@ -71,18 +73,17 @@ class IsDividendAttractiveCheck(BaseCheck):
 
 
 class IsGoodRelativeValueCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_pe < self.peers_pe and self.company_pe < self.industry_pe:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsGoodRelativeValue'
+    inputs = ('company_pe', 'peers_pe', 'industry_pe')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return (c.company_pe < c.peers_pe) & (c.company_pe < c.industry_pe)
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsGoodRelativeValue',
+            name=self.name,
             title='Is Good Relative Value',
             description='',
             question=f'Is {self.slug.upper()} trading at good relative value?',
@@ -100,18 +101,18 @@ class IsGoodRelativeValueCheck(BaseCheck):
 
 
 class IsGoodValueCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_current_price < self.company_fair_price:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsGoodValue'
+    inputs = ('company_current_price', 'company_fair_price')
+    description_inputs = ('company_current_price', 'company_fair_price')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_current_price < c.company_fair_price
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsGoodValue',
+            name=self.name,
             title='Is Good Value',
             description='',
             question=f'Is {self.slug.upper()} good value?',
@@ -131,18 +132,17 @@ class IsGoodValueCheck(BaseCheck):
 
 
 class IsGoodValueComparedToIndustryCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_pe < self.industry_pe:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsGoodValueComparedToIndustry'
+    inputs = ('company_pe', 'industry_pe')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_pe < c.industry_pe
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsGoodValueComparedToIndustry',
+            name=self.name,
             title='Is Good Value Compared To Industry',
             description='',
             question=f'Is {self.slug.upper()} good value vs. industry?',
@@ -160,18 +160,17 @@ class IsGoodValueComparedToIndustryCheck(BaseCheck):
 
 
 class IsGoodValueComparedToPeersCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_pe < self.peers_pe:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsGoodValueComparedToPeers'
+    inputs = ('company_pe', 'peers_pe')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_pe < c.peers_pe
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsGoodValueComparedToPeers',
+            name=self.name,
             title='Is Good Value Compared To Peers',
             description='',
             question=f'Is {self.slug.upper()} good value vs. peers?',
@@ -189,18 +188,18 @@ class IsGoodValueComparedToPeersCheck(BaseCheck):
 
 
 class IsGrowingProfitOrRevenueCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_forecast_earnings_growth > 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsGrowingProfitOrRevenue'
+    inputs = ('company_forecast_earnings_growth',)
+    description_inputs = ('company_forecast_earnings_growth',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_forecast_earnings_growth > 0
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsGrowingProfitOrRevenue',
+            name=self.name,
             title='Is Growing Profit Or Revenue',
             description='',
             question=f'Is {self.slug.upper()} growing?',
@@ -220,18 +219,18 @@ class IsGrowingProfitOrRevenueCheck(BaseCheck):
 
 
 class IsTradingBelowAnalystPriceTargetsCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_current_price < self.average_price_target_1y:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsTradingBelowAnalystPriceTargets'
+    inputs = ('company_current_price', 'average_price_target_1y')
+    description_inputs = ('average_price_target_1y', 'company_current_price')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_current_price < c.average_price_target_1y
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsTradingBelowAnalystPriceTargets',
+            name=self.name,
             title='Is Trading Below Analyst Price Targets',
             description='',
             question=f'Are analysts in good agreement {self.slug.upper()} stock price will rise?',
@@ -251,18 +250,17 @@ class IsTradingBelowAnalystPriceTargetsCheck(BaseCheck):
 
 
 class IsTradingBelowFairRatioCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_pe < self.company_fair_pe:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsTradingBelowFairRatio'
+    inputs = ('company_pe', 'company_fair_pe')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_pe < c.company_fair_pe
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsTradingBelowFairRatio',
+            name=self.name,
             title='Is Trading Below Fair Ratio',
             description='',
             question=f'Is {self.slug.upper()} trading below calculated fair ratio?',
@@ -280,18 +278,18 @@ class IsTradingBelowFairRatioCheck(BaseCheck):
 
 
 class AreRevenueAndEarningsExpectedToGrowCheck(BaseCheck):
-    def check(self) -> None:
-        if self.earnings_growth_per_year_forecast_3y > 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'AreRevenueAndEarningsExpectedToGrow'
+    inputs = ('earnings_growth_per_year_forecast_3y',)
+    description_inputs = ('earnings_growth_per_year_forecast_3y',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.earnings_growth_per_year_forecast_3y > 0
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='AreRevenueAndEarningsExpectedToGrow',
+            name=self.name,
             title='Are Revenue And Earnings Expected To Grow',
             description='',
             question=f'Are revenue and earnings forecast to grow?',
@@ -313,18 +311,17 @@ class AreRevenueAndEarningsExpectedToGrowCheck(BaseCheck):
 
 
 class HasCapitalisationRateIncreasedSignificantlyCheck(BaseCheck):
-    def check(self) -> None:
-        if (self.capitalisation_rate-self.capitalisation_rate_1y/self.capitalisation_rate) > 0.2:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'HasCapitalisationRateIncreasedSignificantly'
+    inputs = ('capitalisation_rate', 'capitalisation_rate_1y')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.capitalisation_rate - c.capitalisation_rate_1y / c.capitalisation_rate > 0.2
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasCapitalisationRateIncreasedSignificantly',
+            name=self.name,
             title='Has Capitalisation Rate Increased Significantly',
             description='',
             question=f'Has {self.slug.upper()}\'s capitalisation rate increased significantly over the past year?',
@@ -342,20 +339,18 @@ class HasCapitalisationRateIncreasedSignificantlyCheck(BaseCheck):
 
 
 class HasCashFromOperationGrownSlowerThanNetIncomeCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_earnings_growth < self.operating_cash_flow_growth:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasCashFromOperationsGrownSlowerThanNetIncome'
+    inputs = ('company_earnings_growth', 'operating_cash_flow_growth')
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_earnings_growth < c.operating_cash_flow_growth
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasCashFromOperationsGrownSlowerThanNetIncome',
+            name=self.name,
             title='Has Cash From Operations Grown Slower Than Net Income',
             description='',
             question=f'Has {self.slug.upper()}\'s Cash From Operations grown '
@@ -374,20 +369,19 @@ class HasCashFromOperationGrownSlowerThanNetIncomeCheck(BaseCheck):
 
 
 class HasDecliningGrossProfitMarginsCheck(BaseCheck):
-    def check(self) -> None:
-        if self.gross_profit_margin > self.gross_profit_margin_1y:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasDecliningGrossProfitMargins'
+    inputs = ('gross_profit_margin', 'gross_profit_margin_1y')
+    description_inputs = ('gross_profit_margin', 'gross_profit_margin_1y')
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.gross_profit_margin > c.gross_profit_margin_1y
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasDecliningGrossProfitMargins',
+            name=self.name,
             title='Has Declining Gross Profit Margins',
             description='',
             question=f'Have {self.slug.upper()}\'s gross profit margins fallen over the past year?',
@@ -410,20 +404,19 @@ class HasDecliningGrossProfitMarginsCheck(BaseCheck):
 
 
 class HasDecliningProfitMarginsCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_profit_margins > self.past_profit_margins:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasDecliningProfitMargins'
+    inputs = ('company_profit_margins', 'past_profit_margins')
+    description_inputs = ('company_profit_margins', 'past_profit_margins')
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_profit_margins > c.past_profit_margins
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasDecliningProfitMargins',
+            name=self.name,
             title='Has Declining Profit Margins',
             description='',
             question=f'Have {self.slug.upper()}\'s profit margins fallen over the past year?',
@@ -444,29 +437,19 @@ class HasDecliningProfitMarginsCheck(BaseCheck):
 
 
 class HasFiledWithinMonthsCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_object.reports.exists():
-            diff = self.get_report_diff()
+    name = 'HasFiledWithin6Months'
+    nullable_inputs = ('report_age_days',)
+    description_inputs = ('report_age_days',)
+    fail_severity = severity.MINOR
 
-            if diff.days < 180:
-
-                self.statement['status'] = status.PASS
-                self.statement['description'] = self.descriptions['success']
-                self.statement['severity'] = severity.NONE
-            else:
-                self.statement['status'] = status.FAIL
-                self.statement['description'] = self.descriptions['error']
-                self.statement['severity'] = severity.MINOR
-
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = 'No reports'
-            self.statement['severity'] = severity.MINOR
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.report_age_days < 180
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasFiledWithin6Months',
+            name=self.name,
             title='Has Filed Within Months',
             description='',
             question=f'Has {self.slug.upper()} filed financial statements in the past 6 months?',
@@ -484,32 +467,24 @@ class HasFiledWithinMonthsCheck(BaseCheck):
                 'success': f'{self.slug.upper()} last filed financial statements {diff.days} days ago',
                 'error': f'{self.slug.upper()} last filed financial statements {diff.days} days ago',
             }
+        else:
+            self.descriptions = {'error': 'No reports'}
 
 
 class HasFiledWithinPastYearCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_object.reports.exists():
-            diff = self.get_report_diff()
-
-            if diff.days < 365:
+    name = 'HasFiledWithinPastYear'
+    nullable_inputs = ('report_age_days',)
+    description_inputs = ('report_age_days',)
+    fail_severity = severity.MINOR
 
-                self.statement['status'] = status.PASS
-                self.statement['description'] = self.descriptions['success']
-                self.statement['severity'] = severity.NONE
-            else:
-                self.statement['status'] = status.FAIL
-                self.statement['description'] = self.descriptions['error']
-                self.statement['severity'] = severity.MINOR
-
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = 'No reports'
-            self.statement['severity'] = severity.MINOR
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.report_age_days < 365
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasFiledWithinPastYear',
+            name=self.name,
             title='Has Filed Within Past Year',
             description='',
             question=f'Has {self.slug.upper()} filed financial statements in the past year?',
@@ -527,21 +502,22 @@ class HasFiledWithinPastYearCheck(BaseCheck):
                 'success': f'{self.slug.upper()} last filed financial statements {diff.days} days ago',
                 'error': f'{self.slug.upper()} last filed financial statements {diff.days} days ago',
             }
+        else:
+            self.descriptions = {'error': 'No reports'}
 
 
 class HasFinancialDataCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_object.reports.exists():
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'HasFinancialData'
+    nullable_inputs = ('report_age_days',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return ~np.isnan(c.report_age_days)
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasFinancialData',
+            name=self.name,
             title='Has Financial Data',
             description='',
             question=f'Does {self.slug.upper()} have financial data available?',
@@ -559,24 +535,24 @@ class HasFinancialDataCheck(BaseCheck):
 
 
 class HasHighAccrualsRatioCheck(BaseCheck):
-    def check(self) -> None:
-        if abs(self.sloan_ratio) <= 0.10:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        elif abs(self.sloan_ratio <= 0.25):
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['high_error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasHighAccrualsRatio'
+    inputs = ('sloan_ratio',)
+    description_inputs = ('sloan_ratio',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return np.abs(c.sloan_ratio) <= 0.1
+
+    def describe(self, passed: bool) -> str:
+        if not passed and abs(self.sloan_ratio) > 0.25:
+            return self.descriptions['high_error']
+        return super().describe(passed)
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasHighAccrualsRatio',
+            name=self.name,
             title='Has High Accruals Ratio',
             description='',
             question=f'Does {self.slug.upper()} have a high accrual ratio?',
@@ -591,25 +567,23 @@ class HasHighAccrualsRatioCheck(BaseCheck):
         self.descriptions = {
             'success': f'Yes',
             'error': f'No',
-            'high-error': f'Dangerously high',
+            'high_error': f'Dangerously high',
         }
 
 
 class HasHighQualityEarningsCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_earnings > 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasHighQualityEarnings'
+    inputs = ('company_earnings',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_earnings > 0
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasHighQualityEarnings',
+            name=self.name,
             title='Has High Quality Earnings',
             description='',
             question=f'Do they have high quality earnings?',
@@ -628,20 +602,18 @@ class HasHighQualityEarningsCheck(BaseCheck):
 
 
 class HasInventoryGrownSignificantlyFasterThanSalesCheck(BaseCheck):
-    def check(self) -> None:
-        if self.sales_growth > self.inventory_growth:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasInventoryGrownSignificantlyFasterThanSales'
+    inputs = ('sales_growth', 'inventory_growth')
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.sales_growth > c.inventory_growth
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasInventoryGrownSignificantlyFasterThanSales',
+            name=self.name,
             title='Has Inventory Grown Significantly Faster Than Sales',
             description='',
             question=f'Have {self.slug.upper()}\'s inventories grown significantly '
@@ -661,20 +633,18 @@ class HasInventoryGrownSignificantlyFasterThanSalesCheck(BaseCheck):
 
 
 class HasLargeDecreaseInUnearnedRevenueCheck(BaseCheck):
-    def check(self) -> None:
-        if self.unearned_revenue_growth > -0.2:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasLargeDecreaseInUnearnedRevenue'
+    inputs = ('unearned_revenue_growth',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.unearned_revenue_growth > -0.2
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasLargeDecreaseInUnearnedRevenue',
+            name=self.name,
             title='Has Large Decrease In Unearned Revenue',
             description='',
             question=f'Does {self.slug.upper()} have a large decrease in unearned revenue over the past year?',
@@ -693,20 +663,18 @@ class HasLargeDecreaseInUnearnedRevenueCheck(BaseCheck):
 
 
 class HasLargeIncreaseInAccountsReceivableCheck(BaseCheck):
-    def check(self) -> None:
-        if self.accounts_receivable_growth > 0.2:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasLargeIncreaseInAccountsReceivable'
+    inputs = ('accounts_receivable_growth',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.accounts_receivable_growth > 0.2
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasLargeIncreaseInAccountsReceivable',
+            name=self.name,
             title='Has Large Increase In Accounts Receivable',
             description='',
             question=f'Does {self.slug.upper()} have a large increase in accounts receivable over the past year?',
@@ -725,20 +693,18 @@ class HasLargeIncreaseInAccountsReceivableCheck(BaseCheck):
 
 
 class HasLargeNegativeOneTimeChargesCheck(BaseCheck):
-    def check(self) -> None:
-        if self.one_off_charges < 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasLargeNegativeOneTimeCharges'
+    inputs = ('one_off_charges',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.one_off_charges < 0
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasLargeNegativeOneTimeCharges',
+            name=self.name,
             title='Has Large Negative One Time Charges',
             description='',
             question=f'Does {self.slug.upper()} suffer from significant negative one-off charges?',
@@ -757,20 +723,18 @@ class HasLargeNegativeOneTimeChargesCheck(BaseCheck):
 
 
 class HasLargeOneTimeChargesCheck(BaseCheck):
-    def check(self) -> None:
-        if abs(self.one_off_charges/self.company_earnings) > 0.1:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasLargeOneTimeCharges'
+    inputs = ('one_off_charges', 'company_earnings')
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return np.abs(c.one_off_charges / c.company_earnings) > 0.1
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasLargeOneTimeCharges',
+            name=self.name,
             title='Has Large One Time Charges',
             description='',
             question=f'Is {self.slug.upper()} impacted by significant one-off charges?',
@@ -789,20 +753,18 @@ class HasLargeOneTimeChargesCheck(BaseCheck):
 
 
 class HasLargePositiveOneTimeChargesCheck(BaseCheck):
-    def check(self) -> None:
-        if self.one_off_charges > 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasLargePositiveOneTimeCharges'
+    inputs = ('one_off_charges',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.one_off_charges > 0
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasLargePositiveOneTimeCharges',
+            name=self.name,
             title='Has Large Positive One Time Charges',
             description='',
             question=f'Does {self.slug.upper()} benefit from significant positive one-off charges?',
@@ -821,20 +783,18 @@ class HasLargePositiveOneTimeChargesCheck(BaseCheck):
 
 
 class HasLargePositiveOneTimeChargesAndProfitableCheck(BaseCheck):
-    def check(self) -> None:
-        if self.one_off_charges > 0 and self.company_earnings > 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasLargePositiveOneTimeChargesAndProfitable'
+    inputs = ('one_off_charges', 'company_earnings')
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return (c.one_off_charges > 0) & (c.company_earnings > 0)
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasLargePositiveOneTimeChargesAndProfitable',
+            name=self.name,
             title='Has Large Positive One Time Charges And Profitable',
             description='',
             question=f'Is {self.slug.upper()}\'s reported profit improved by significant one-off charges?',
@@ -853,6 +813,8 @@ class HasLargePositiveOneTimeChargesAndProfitableCheck(BaseCheck):
 
 
 class HasMeaningfulMarketCapCheck(BaseCheck):
+    name = 'HasMeaningfulMarketCap'
+    description_inputs = ('market_cap',)
     """
     MegaCap: > 200B$
     LargeCap: > 10B$
@@ -861,20 +823,17 @@ class HasMeaningfulMarketCapCheck(BaseCheck):
     MicroCap: > 0.05B$
     NanoCap: > 0B$
     """
-    def check(self) -> None:
-        if self.market_cap_usd > 2_000_000_000:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    inputs = ('market_cap_usd',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.market_cap_usd > 2_000_000_000
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasMeaningfulMarketCap',
+            name=self.name,
             title='Has Meaningful Market Cap',
             description='',
             question=f'Do they have a meaningful market capitalization?',
@@ -894,20 +853,19 @@ class HasMeaningfulMarketCapCheck(BaseCheck):
 
 
 class HasMeaningfulRevenueCheck(BaseCheck):
-    def check(self) -> None:
-        if self.revenue / self.market_cap > 0.1:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasMeaningfulRevenue'
+    inputs = ('revenue', 'market_cap')
+    description_inputs = ('revenue',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.revenue / c.market_cap > 0.1
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasMeaningfulRevenue',
+            name=self.name,
             title='Has Meaningful Revenue',
             description='',
             question=f'Do they have meaningful levels of revenue?',
@@ -927,20 +885,19 @@ class HasMeaningfulRevenueCheck(BaseCheck):
 
 
 class HasNegativeGrossMarginCheck(BaseCheck):
-    def check(self) -> None:
-        if self.gross_profit_margin > 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasNegativeGrossMargin'
+    inputs = ('gross_profit_margin',)
+    description_inputs = ('gross_profit_margin',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.gross_profit_margin > 0
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasNegativeGrossMargin',
+            name=self.name,
             title=f'Has Negative Gross Margin',
             description='',
             question=f'Does {self.slug.upper()} have negative gross margin?',
@@ -959,20 +916,18 @@ class HasNegativeGrossMarginCheck(BaseCheck):
 
 
 class HasNetProfitMarginImprovedOverPastYearCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_profit_margins > self.past_profit_margins or self.company_profit_margins > 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasNetProfitMarginImprovedOverPastYear'
+    inputs = ('company_profit_margins', 'past_profit_margins')
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return (c.company_profit_margins > c.past_profit_margins) | (c.company_profit_margins > 0)
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasNetProfitMarginImprovedOverPastYear',
+            name=self.name,
             title='Has Net Profit Margin Improved Over Past Year',
             description='',
             question=f'Have profit margins improved over the past year?',
@@ -991,20 +946,18 @@ class HasNetProfitMarginImprovedOverPastYearCheck(BaseCheck):
 
 
 class HasNoConcerningRecentEventsCheck(BaseCheck):
-    def check(self) -> None:
-        if self.events_was_occurred:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasNoConcerningRecentEvents'
+    inputs = ('events_was_occurred',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.events_was_occurred
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasNoConcerningRecentEvents',
+            name=self.name,
             title='Has No Concerning Recent Events',
             description='',
             question=f'Are there any concerning recent events?',
@@ -1023,20 +976,18 @@ class HasNoConcerningRecentEventsCheck(BaseCheck):
 
 
 class HasNoSubstantialInsiderSellingOverPastQuarterCheck(BaseCheck):
-    def check(self) -> None:
-        if not self.substantial_insider_selling_was_occurred:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasNoSubstantialInsiderSellingOverPastQuarter'
+    inputs = ('substantial_insider_selling_was_occurred',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return ~c.substantial_insider_selling_was_occurred
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasNoSubstantialInsiderSellingOverPastQuarter',
+            name=self.name,
             title='Has No Substantial Insider Selling Over Past Quarter',
             description='',
             question=f'Has there been substantial insider selling in the past 3 months?',
@@ -1055,20 +1006,18 @@ class HasNoSubstantialInsiderSellingOverPastQuarterCheck(BaseCheck):
 
 
 class HasNotDilutedOverPastYearCheck(BaseCheck):
-    def check(self) -> None:
-        if not self.has_diluted_over_past_year:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasNotDilutedOverPastYear'
+    inputs = ('has_diluted_over_past_year',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return ~c.has_diluted_over_past_year
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasNotDilutedOverPastYear',
+            name=self.name,
             title='Has Not Diluted Over Past Year',
             description='',
             question=f'Have shareholders been diluted over the past year?',
@@ -1087,20 +1036,18 @@ class HasNotDilutedOverPastYearCheck(BaseCheck):
 
 
 class HasSignificantNonOperatingRevenueCheck(BaseCheck):
-    def check(self) -> None:
-        if self.non_operating_revenue < self.operating_revenue:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasSignificantNonOperatingRevenue'
+    inputs = ('non_operating_revenue', 'operating_revenue')
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.non_operating_revenue < c.operating_revenue
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasSignificantNonOperatingRevenue',
+            name=self.name,
             title='Has Significant Non Operating Revenue',
             description='',
             question=f'Does {self.slug.upper()} have significant non-operating revenue?',
@@ -1119,20 +1066,18 @@ class HasSignificantNonOperatingRevenueCheck(BaseCheck):
 
 
 class HasStableSharePriceCheck(BaseCheck):
-    def check(self) -> None:
-        if self.volatility_1y > 0.1:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasStableSharePrice'
+    inputs = ('volatility_1y',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.volatility_1y > 0.1
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasStableSharePrice',
+            name=self.name,
             title='Has Stable Share Price',
             description='',
             question=f'Is their share price liquid and stable?',
@@ -1151,20 +1096,18 @@ class HasStableSharePriceCheck(BaseCheck):
 
 
 class HasStableSharePriceOverPast3MonthsCheck(BaseCheck):
-    def check(self) -> None:
-        if self.volatility_3m > 0.1:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasStableSharePriceOverPast3Months'
+    inputs = ('volatility_3m',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.volatility_3m > 0.1
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasStableSharePriceOverPast3Months',
+            name=self.name,
             title='Has Stable Share Price Over Past Months',
             description='',
             question=f'Over last 3 monts ss their share price liquid and stable?',
@@ -1183,27 +1126,19 @@ class HasStableSharePriceOverPast3MonthsCheck(BaseCheck):
 
 
 class HasSufficientFinancialDataCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_object.reports.exists():
-            diff = self.get_report_diff()
-
-            if diff.days < 180:
-                self.statement['status'] = status.PASS
-                self.statement['description'] = self.descriptions['success']
-                self.statement['severity'] = severity.NONE
-            else:
-                self.statement['status'] = status.FAIL
-                self.statement['description'] = self.descriptions['error']
-                self.statement['severity'] = severity.MINOR
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = 'No reports'
-            self.statement['severity'] = severity.MINOR
+    name = 'HasSufficientFinancialData'
+    nullable_inputs = ('report_age_days',)
+    description_inputs = ('report_time',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.report_age_days < 180
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasSufficientFinancialData',
+            name=self.name,
             title='Has Sufficient Financial Data',
             description='',
             question=f'Do they have sufficient financial data available?',
@@ -1219,23 +1154,23 @@ class HasSufficientFinancialDataCheck(BaseCheck):
             'success': f'Latest financial reports are less than 6 months old',
             'error': f'Latest financial reports are more than 6 months old',
         }
+        if self.report_date is None:
+            self.descriptions['error'] = 'No reports'
 
 
 class IsAbleToAchieveProfitabilityCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_earnings > 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'IsAbleToAchieveProfitability'
+    inputs = ('company_earnings',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_earnings > 0
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsAbleToAchieveProfitability',
+            name=self.name,
             title='Is Able To Achieve Profitability',
             description='',
             question=f'Are they forecast to achieve profitability?',
@@ -1254,20 +1189,19 @@ class IsAbleToAchieveProfitabilityCheck(BaseCheck):
 
 
 class IsDividendSustainableCheck(BaseCheck):
-    def check(self) -> None:
-        if not self.company_dividend_is_volatile_in_10y and self.company_dividend_yield > 0.05:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'IsDividendSustainable'
+    inputs = ('company_dividend_is_volatile_in_10y', 'company_dividend_yield')
+    description_inputs = ('company_dividend_yield',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return ~c.company_dividend_is_volatile_in_10y & (c.company_dividend_yield > 0.05)
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsDividendSustainable',
+            name=self.name,
             title='Is Dividend Sustainable',
             description='',
             question=f'Is their dividend sustainable?',
@@ -1288,20 +1222,18 @@ class IsDividendSustainableCheck(BaseCheck):
 
 
 class IsInAGoodFinancialPositionCheck(BaseCheck):
-    def check(self) -> None:
-        if self.cash_and_cash_equivalents / self.cash_expenses > 1:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'IsInAGoodFinancialPosition'
+    inputs = ('cash_and_cash_equivalents', 'cash_expenses')
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.cash_and_cash_equivalents / c.cash_expenses > 1
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsInAGoodFinancialPosition',
+            name=self.name,
             title='Is In Good Financial Position',
             description='',
             question=f'Are they in a good financial position?',
@@ -1321,20 +1253,18 @@ class IsInAGoodFinancialPositionCheck(BaseCheck):
 
 
 class IsProfitableOnAverageOrCurrentCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_earnings > 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'IsProfitableOnAverageOrCurrent'
+    inputs = ('company_earnings',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_earnings > 0
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsProfitableOnAverageOrCurrent',
+            name=self.name,
             title='Is Profitable On Average Or Current',
             description='',
             question=f'Is {self.slug.upper()} profitable on average or currently?',
@@ -1353,20 +1283,18 @@ class IsProfitableOnAverageOrCurrentCheck(BaseCheck):
 
 
 class HasNoNegativeEquityCheck(BaseCheck):
-    def check(self) -> None:
-        if self.equity > 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-            self.statement['severity'] = severity.NONE
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
-            self.statement['severity'] = severity.MINOR
+    name = 'HasNoNegativeEquity'
+    inputs = ('equity',)
+    fail_severity = severity.MINOR
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.equity > 0
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasNoNegativeEquity',
+            name=self.name,
             title='Negative Shareholders Equity',
             description='',
             question=f'Do they have negative shareholders equity?',
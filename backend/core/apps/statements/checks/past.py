@@ -1,3 +1,5 @@
+import numpy as np
+
 from apps.statements import types
 from apps.statements.checks.base import BaseCheck
 
@@ -9,18 +11,17 @@ severity = types.Severity
 
 
 class QualityEarningsCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_earnings > 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'HasHighQualityPastEarnings'
+    inputs = ('company_earnings',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_earnings > 0
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasHighQualityPastEarnings',
+            name=self.name,
             title='Quality Earnings',
             description='',
             question=f'Does {self.slug.upper()} have high quality earnings?',
@@ -38,18 +39,18 @@ class QualityEarningsCheck(BaseCheck):
 
 
 class GrowingProfitMarginCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_profit_margins > self.past_profit_margins:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'HasPastNetProfitMarginImprovedOverLastYear'
+    inputs = ('company_profit_margins', 'past_profit_margins')
+    description_inputs = ('company_profit_margins', 'past_profit_margins')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_profit_margins > c.past_profit_margins
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasPastNetProfitMarginImprovedOverLastYear',
+            name=self.name,
             title='Growing Profit Margin',
             description='',
             question=f'Have profit margins improved over the past year?',
@@ -75,18 +76,18 @@ class GrowingProfitMarginCheck(BaseCheck):
 
 
 class EarningsTrendCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_earnings_growth_5y > 0:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'HasGrownProfitsOverPast5Years'
+    inputs = ('company_earnings_growth_5y',)
+    description_inputs = ('company_earnings_growth_5y',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_earnings_growth_5y > 0
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasGrownProfitsOverPast5Years',
+            name=self.name,
             title='Earnings Trend',
             description='',
             question=f'Is {self.slug.upper()}\'s grown profits over the past 5 years?',
@@ -109,18 +110,18 @@ class EarningsTrendCheck(BaseCheck):
 
 
 class AcceleratingGrowthCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_earnings_growth > self.company_earnings_growth_5y:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'HasProfitGrowthAccelerated'
+    inputs = ('company_earnings_growth', 'company_earnings_growth_5y')
+    description_inputs = ('company_earnings_growth', 'company_earnings_growth_5y')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_earnings_growth > c.company_earnings_growth_5y
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasProfitGrowthAccelerated',
+            name=self.name,
             title='Accelerating Growth',
             description='',
             question=f'Is {self.slug.upper()}\'s profit growth over the past year above its 5-year average?',
@@ -146,18 +147,18 @@ class AcceleratingGrowthCheck(BaseCheck):
 
 
 class EarningsVsIndustryCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_earnings_growth > self.industry_earnings_growth:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsGrowingFasterThanIndustry'
+    inputs = ('company_earnings_growth', 'industry_earnings_growth')
+    description_inputs = ('company_earnings_growth', 'industry_earnings_growth')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_earnings_growth > c.industry_earnings_growth
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsGrowingFasterThanIndustry',
+            name=self.name,
             title='Earnings vs Industry',
             description='',
             question=f'Is {self.slug.upper()} growing profit faster than the industry average?',
@@ -184,18 +185,18 @@ class EarningsVsIndustryCheck(BaseCheck):
 
 
 class HighROECheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_roe > 0.2:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsReturnOnEquityAboveThreshold'
+    inputs = ('company_roe',)
+    description_inputs = ('company_roe',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_roe > 0.2
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsReturnOnEquityAboveThreshold',
+            name=self.name,
             title='High ROE',
             description='',
             question=f'Is {self.slug.upper()}\'s return on equity above 20%?',
@@ -216,18 +217,17 @@ class HighROECheck(BaseCheck):
 
 
 class StableSharePriceCheck(BaseCheck):
-    def check(self) -> None:
-        if self.volatility_3m < self.sector_market_volatility_3m:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'HasPriceStability'
+    inputs = ('volatility_3m', 'sector_market_volatility_3m')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.volatility_3m < c.sector_market_volatility_3m
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasPriceStability',
+            name=self.name,
             title='Stable Share Price',
             description='',
             question=f'Has {self.slug.upper()} had a stable share price over the past 3 months?',
@@ -247,18 +247,18 @@ class StableSharePriceCheck(BaseCheck):
 
 
 class VolatilityOverTimeCheck(BaseCheck):
-    def check(self) -> None:
-        if self.volatility_1y < self.volatility_1y_past_year:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'HasReturnsVolatilityImprovedOverPastYear'
+    inputs = ('volatility_1y', 'volatility_1y_past_year')
+    description_inputs = ('volatility_1y', 'volatility_1y_past_year')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.volatility_1y < c.volatility_1y_past_year
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='HasReturnsVolatilityImprovedOverPastYear',
+            name=self.name,
             title='Volatility Over Time',
             description='',
             question=f'Has {self.slug.upper()}\' volatility of returns improved over the past year?',
@@ -1,3 +1,5 @@
+import numpy as np
+
 from apps.statements import types
 from apps.statements.checks.base import BaseCheck
 
@@ -9,18 +11,18 @@ severity = types.Severity
 
 
 class BelowFairValueCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_current_price < self.company_fair_price:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsUndervaluedBasedOnDCF'
+    inputs = ('company_current_price', 'company_fair_price')
+    description_inputs = ('company_current_price', 'company_fair_price')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_current_price < c.company_fair_price
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsUndervaluedBasedOnDCF',
+            name=self.name,
             title='Below Fair Value',
             description='',
             question=f'Is {self.slug.upper()} moderately undervalued based on cash flows?',
@@ -33,7 +35,7 @@ class BelowFairValueCheck(BaseCheck):
         )
         formatted_slug = self.slug.upper()
         formatted_current_price = self.get_finance_format(self.company_current_price)
-        formatted_fair_price = self.get_finance_format(self.company_current_price)
+        formatted_fair_price = self.get_finance_format(self.company_fair_price)
 
         self.descriptions = {
             'success': f'{formatted_slug} '
@@ -48,18 +50,18 @@ class BelowFairValueCheck(BaseCheck):
 
 
 class SignificantlyBelowFairValueCheck(BaseCheck):
-    def check(self) -> None:
-        if (self.company_current_price - self.company_fair_price) / self.company_fair_price > 0.2:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['status'] = status.FAIL
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsHighlyUndervaluedBasedOnDCF'
+    inputs = ('company_fair_price', 'company_current_price')
+    description_inputs = ('company_current_price',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return (c.company_current_price - c.company_fair_price) / c.company_fair_price > 0.2
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsHighlyUndervaluedBasedOnDCF',
+            name=self.name,
             title='Significantly Below Fair Value',
             description='',
             question=f'Is {self.slug.upper()} substantially undervalued based on cash flows?',
@@ -81,17 +83,18 @@ class SignificantlyBelowFairValueCheck(BaseCheck):
 
 
 class PriceToEarningsVsPeersCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_pe < self.peers_pe:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsGoodValueComparingPriceToEarningsToPeersAverageValue'
+    inputs = ('company_pe', 'peers_pe')
+    description_inputs = ('company_pe', 'peers_pe')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_pe < c.peers_pe
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsGoodValueComparingPriceToEarningsToPeersAverageValue',
+            name=self.name,
             title='Price-To-Earnings vs Peers',
             description='',
             question=f'Is {self.slug.upper()} considered good value compared to its peers?',
@@ -115,17 +118,18 @@ class PriceToEarningsVsPeersCheck(BaseCheck):
 
 
 class PriceToEarningsVsIndustryCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_pe < self.industry_pe:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsGoodValueComparingPriceToEarningsToIndustry'
+    inputs = ('company_pe', 'industry_pe')
+    description_inputs = ('company_pe', 'industry_pe')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_pe < c.industry_pe
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsGoodValueComparingPriceToEarningsToIndustry',
+            name=self.name,
             title='Price-To-Earnings vs Industry',
             description='',
             question=f'Is {self.slug.upper()} considered good value compared to its industry?',
@@ -153,17 +157,18 @@ class PriceToEarningsVsIndustryCheck(BaseCheck):
 
 
 class PriceToEarningsVsFairRatioCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_pe < self.company_fair_pe:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsGoodValueComparingRatioToFairRatio'
+    inputs = ('company_pe', 'company_fair_pe')
+    description_inputs = ('company_pe', 'company_fair_pe')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_pe < c.company_fair_pe
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsGoodValueComparingRatioToFairRatio',
+            name=self.name,
             title='Price-To-Earnings vs Fair Ratio',
             description='',
             question=f'Is {self.slug.upper()} considered good value compared to its fair ratio?',
@@ -189,17 +194,17 @@ class PriceToEarningsVsFairRatioCheck(BaseCheck):
 
 
 class AnalystForecastCheck(BaseCheck):
-    def check(self) -> None:
-        if self.company_current_price < self.average_price_target_1y:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['description'] = self.descriptions['error']
+    name = 'IsAnalystForecastTrustworthy'
+    inputs = ('company_current_price', 'average_price_target_1y')
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.company_current_price < c.average_price_target_1y
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='IsAnalystForecastTrustworthy',
+            name=self.name,
             title='Analyst Forecast',
             description='',
             question=f'What are the analyst 12m forecasts and can we trust them?',
@@ -219,17 +224,18 @@ class AnalystForecastCheck(BaseCheck):
 
 
 class ReturnVsIndustryCheck(BaseCheck):
-    def check(self) -> None:
-        if self.return_1y < self.sector_market_return_1y:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['description'] = self.descriptions['error']
+    name = 'Is1YearReturnInLineOrAboveIndustry'
+    inputs = ('return_1y', 'sector_market_return_1y')
+    description_inputs = ('sector_market_return_1y',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.return_1y < c.sector_market_return_1y
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='Is1YearReturnInLineOrAboveIndustry',
+            name=self.name,
             title='Return vs Industry',
             description='',
             question=f'Is {self.slug.upper()}\'s 1 year returns above the industry?',
@@ -254,17 +260,18 @@ class ReturnVsIndustryCheck(BaseCheck):
 
 
 class ReturnVsMarketCheck(BaseCheck):
-    def check(self) -> None:
-        if self.return_1y < self.market_return_1y:
-            self.statement['status'] = status.PASS
-            self.statement['description'] = self.descriptions['success']
-        else:
-            self.statement['description'] = self.descriptions['error']
+    name = 'Is1YearReturnInLineOrAboveMarket'
+    inputs = ('return_1y', 'market_return_1y')
+    description_inputs = ('market_return_1y',)
+
+    @staticmethod
+    def predicate(c: types.Columns) -> np.ndarray:
+        return c.return_1y < c.market_return_1y
 
     def populate(self) -> None:
         self.statement = types.Statement(
             company=self.company_object,
-            name='Is1YearReturnInLineOrAboveMarket',
+            name=self.name,
             title='Return vs Market',
             description='',
             question=f'Is {self.slug.upper()}\'s 1 year returns above the market?',
@@ -21,3 +21,7 @@ class Statement(models.Model):
     status = models.CharField(choices=STATUS_CHOICES, max_length=255)
     severity = models.CharField(choices=SEVERITY_CHOICES, max_length=255)
     outcome = models.IntegerField()
+    fingerprint = models.CharField(max_length=32, blank=True, default='', help_text='Hash of the inputs the statement was rendered from')
+
+    class Meta:
+        unique_together = [['company', 'name']]
@@ -1,4 +1,10 @@
-from django.db.models import Exists, OuterRef
+import hashlib
+import logging
+import time
+
+import numpy as np
+from django.db.models import Exists, OuterRef, QuerySet
+from django.db.models.functions import Mod
 
 from apps.invest.models import Company, Candle
 from apps.statements.checks.initials import (
@@ -45,7 +51,10 @@ from apps.statements.checks.initials import (
     IsTradingBelowAnalystPriceTargetsCheck,
     IsTradingBelowFairRatioCheck,
 )
-from apps.statements.types import Fields
+from apps.statements import models
+from apps.statements.checks.base import BaseCheck
+from apps.statements.services.fields import Market, load_inputs
+from apps.statements.types import Columns, Statement
 from apps.statements.checks.value import (
     BelowFairValueCheck,
     SignificantlyBelowFairValueCheck,
@@ -91,195 +100,211 @@ from apps.statements.checks.dividend import (
     CashFlowCoverageCheck,
 )
 
+STATEMENT_UPDATE_FIELDS = [
+    'title', 'description', 'question', 'level', 'area', 'type', 'status', 'severity', 'outcome', 'fingerprint',
+]
+CHECKS = [
+    # INIT
+    AreRevenueAndEarningsExpectedToGrowCheck,
+    HasBeenGrowingProfitOrRevenueCheck,
+    HasCapitalisationRateIncreasedSignificantlyCheck,
+    HasCashFromOperationGrownSlowerThanNetIncomeCheck,
+    HasDecliningGrossProfitMarginsCheck,
+    HasDecliningProfitMarginsCheck,
+    HasFiledWithinMonthsCheck,
+    HasFiledWithinPastYearCheck,
+    HasFinancialDataCheck,
+    HasHighAccrualsRatioCheck,
+    HasHighQualityEarningsCheck,
+    HasInventoryGrownSignificantlyFasterThanSalesCheck,
+    HasLargeDecreaseInUnearnedRevenueCheck,
+    HasLargeIncreaseInAccountsReceivableCheck,
+    HasLargeNegativeOneTimeChargesCheck,
+    HasLargeOneTimeChargesCheck,
+    HasLargePositiveOneTimeChargesCheck,
+    HasLargePositiveOneTimeChargesAndProfitableCheck,
+    HasMeaningfulMarketCapCheck,
+    HasMeaningfulRevenueCheck,
+    HasNegativeGrossMarginCheck,
+    HasNetProfitMarginImprovedOverPastYearCheck,
+    HasNoConcerningRecentEventsCheck,
+    HasNoNegativeEquityCheck,
+    HasNoSubstantialInsiderSellingOverPastQuarterCheck,
+    HasNotDilutedOverPastYearCheck,
+    HasSignificantNonOperatingRevenueCheck,
+    HasStableSharePriceCheck,
+    HasStableSharePriceOverPast3MonthsCheck,
+    HasSufficientFinancialDataCheck,
+    IsAbleToAchieveProfitabilityCheck,
+    IsDividendAttractiveCheck,
+    IsDividendSustainableCheck,
+    IsGoodRelativeValueCheck,
+    IsGoodValueCheck,
+    IsGoodValueComparedToIndustryCheck,
+    IsGoodValueComparedToPeersCheck,
+    IsGrowingProfitOrRevenueCheck,
+    IsInAGoodFinancialPositionCheck,
+    IsProfitableOnAverageOrCurrentCheck,
+    IsTradingBelowAnalystPriceTargetsCheck,
+    IsTradingBelowFairRatioCheck,
+    # VALUE
+    BelowFairValueCheck,
+    SignificantlyBelowFairValueCheck,
+    PriceToEarningsVsPeersCheck,
+    PriceToEarningsVsIndustryCheck,
+    PriceToEarningsVsFairRatioCheck,
+    AnalystForecastCheck,
+    ReturnVsMarketCheck,
+    ReturnVsIndustryCheck,
+    # FUTURE
+    EarningsVsSavingRateCheck,
+    EarningsVsMarketCheck,
+    HighGrowthEarningsCheck,
+    RevenueVsMarketCheck,
+    HighGrowthRevenueCheck,
+    FutureROECheck,
+    # PAST
+    QualityEarningsCheck,
+    GrowingProfitMarginCheck,
+    EarningsTrendCheck,
+    AcceleratingGrowthCheck,
+    EarningsVsIndustryCheck,
+    HighROECheck,
+    StableSharePriceCheck,
+    VolatilityOverTimeCheck,
+    # HEALTH
+    ShortTermLiabilitiesCheck,
+    LongTermLiabilitiesCheck,
+    DebtLevelCheck,
+    ReducingDebtCheck,
+    DebtCoverageCheck,
+    InterestCoverageCheck,
+    # DIVIDEND
+    SignificantDividendCheck,
+    HighDividendCheck,
+    StableDividendCheck,
+    GrowingDividendCheck,
+    EarningsCoverageCheck,
+    CashFlowCoverageCheck,
+]
+# Statements written in one bulk upsert
+STATEMENTS_PER_BATCH = 5000
+
+logger = logging.getLogger(__name__)
+
+
+def main(
+    companies: QuerySet[Company] | list[Company] = None,
+    shard: int = 0,
+    shards: int = 1,
+    full: bool = False,
+    market: Market | None = None,
+) -> dict:
+    """Run every check for the companies with candles, all visible ones by default.
 
-def main(companies: list[Company] = None):
-    if not companies:
+    The inputs of every company are loaded (they are needed to tell what
+    changed), then a check is evaluated, rendered and written only for the
+    companies whose fingerprint of the check's inputs differs from the stored
+    one, unless a full run is asked for (e.g. after a check was changed).
+    With several shards only the companies whose id hashes to ``shard`` are
+    loaded and analysed, the market statistics over every visible company
+    come from the parent task (see fields.load_market).
+    """
+    started = time.monotonic()
+    if companies is None:
         companies = Company.objects.filter(is_visible=True)
+    elif not isinstance(companies, QuerySet):
+        companies = Company.objects.filter(pk__in=[company.pk for company in companies])
 
-    objects = []
+    companies = companies.filter(
+        Exists(Candle.objects.filter(instrument__company=OuterRef('pk'), instrument__instrument_type='share'))
+    )
+    if shards > 1:
+        companies = companies.annotate(shard=Mod('id', shards)).filter(shard=shard)
+
+    inputs = load_inputs(list(companies), market=market)
+    loaded = time.monotonic()
 
-    for company in companies:
-        if not company.instruments.filter(
-            instrument_type='share'
-        ).annotate(
-            has_candles = Exists(Candle.objects.filter(instrument=OuterRef('pk')))
-        ).filter(has_candles=True).exists():
+    stored = {} if full else stored_fingerprints([company.pk for company in inputs.companies])
+    details = inputs.fingerprints()
+    fields = {}
+    records = []
+    stats = {'shard': shard, 'companies': len(inputs), 'statements': 0, 'unchanged': 0, 'evaluated': 0}
+    for check in CHECKS:
+        fingerprints = check_fingerprints(check, inputs.columns, details)
+        rows = np.array([
+            row for row, company in enumerate(inputs.companies)
+            if stored.get((company.pk, check.name)) != fingerprints[row]
+        ], dtype=np.int64)
+        stats['unchanged'] += len(inputs) - len(rows)
+        if not len(rows):
             continue
 
-        fields = get_fields(company)
-        
-        checks = [
-            # INIT
-            AreRevenueAndEarningsExpectedToGrowCheck(fields).to_dict(),
-            HasBeenGrowingProfitOrRevenueCheck(fields).to_dict(),
-            HasCapitalisationRateIncreasedSignificantlyCheck(fields).to_dict(),
-            HasCashFromOperationGrownSlowerThanNetIncomeCheck(fields).to_dict(),
-            HasDecliningGrossProfitMarginsCheck(fields).to_dict(),
-            HasDecliningProfitMarginsCheck(fields).to_dict(),
-            HasFiledWithinMonthsCheck(fields).to_dict(),
-            HasFiledWithinPastYearCheck(fields).to_dict(),
-            HasFinancialDataCheck(fields).to_dict(),
-            HasHighAccrualsRatioCheck(fields).to_dict(),
-            HasHighQualityEarningsCheck(fields).to_dict(),
-            HasInventoryGrownSignificantlyFasterThanSalesCheck(fields).to_dict(),
-            HasLargeDecreaseInUnearnedRevenueCheck(fields).to_dict(),
-            HasLargeIncreaseInAccountsReceivableCheck(fields).to_dict(),
-            HasLargeNegativeOneTimeChargesCheck(fields).to_dict(),
-            HasLargeOneTimeChargesCheck(fields).to_dict(),
-            HasLargePositiveOneTimeChargesCheck(fields).to_dict(),
-            HasLargePositiveOneTimeChargesAndProfitableCheck(fields).to_dict(),
-            HasMeaningfulMarketCapCheck(fields).to_dict(),
-            HasMeaningfulRevenueCheck(fields).to_dict(),
-            HasNegativeGrossMarginCheck(fields).to_dict(),
-            HasNetProfitMarginImprovedOverPastYearCheck(fields).to_dict(),
-            HasNoConcerningRecentEventsCheck(fields).to_dict(),
-            HasNoNegativeEquityCheck(fields).to_dict(),
-            HasNoSubstantialInsiderSellingOverPastQuarterCheck(fields).to_dict(),
-            HasNotDilutedOverPastYearCheck(fields).to_dict(),
-            HasSignificantNonOperatingRevenueCheck(fields).to_dict(),
-            HasStableSharePriceCheck(fields).to_dict(),
-            HasStableSharePriceOverPast3MonthsCheck(fields).to_dict(),
-            HasSufficientFinancialDataCheck(fields).to_dict(),
-            IsAbleToAchieveProfitabilityCheck(fields).to_dict(),
-            IsDividendAttractiveCheck(fields).to_dict(),
-            IsDividendSustainableCheck(fields).to_dict(),
-            IsGoodRelativeValueCheck(fields).to_dict(),
-            IsGoodValueCheck(fields).to_dict(),
-            IsGoodValueComparedToIndustryCheck(fields).to_dict(),
-            IsGoodValueComparedToPeersCheck(fields).to_dict(),
-            IsGrowingProfitOrRevenueCheck(fields).to_dict(),
-            IsInAGoodFinancialPositionCheck(fields).to_dict(),
-            IsProfitableOnAverageOrCurrentCheck(fields).to_dict(),
-            IsTradingBelowAnalystPriceTargetsCheck(fields).to_dict(),
-            IsTradingBelowFairRatioCheck(fields).to_dict(),
-            # VALUE
-            BelowFairValueCheck(fields).to_dict(),
-            SignificantlyBelowFairValueCheck(fields).to_dict(),
-            PriceToEarningsVsPeersCheck(fields).to_dict(),
-            PriceToEarningsVsIndustryCheck(fields).to_dict(),
-            PriceToEarningsVsFairRatioCheck(fields).to_dict(),
-            AnalystForecastCheck(fields).to_dict(),
-            ReturnVsMarketCheck(fields).to_dict(),
-            ReturnVsIndustryCheck(fields).to_dict(),
-            # FUTURE
-            EarningsVsSavingRateCheck(fields).to_dict(),
-            EarningsVsMarketCheck(fields).to_dict(),
-            HighGrowthEarningsCheck(fields).to_dict(),
-            RevenueVsMarketCheck(fields).to_dict(),
-            HighGrowthRevenueCheck(fields).to_dict(),
-            FutureROECheck(fields).to_dict(),
-            # PAST
-            QualityEarningsCheck(fields).to_dict(),
-            GrowingProfitMarginCheck(fields).to_dict(),
-            EarningsTrendCheck(fields).to_dict(),
-            AcceleratingGrowthCheck(fields).to_dict(),
-            EarningsVsIndustryCheck(fields).to_dict(),
-            HighROECheck(fields).to_dict(),
-            StableSharePriceCheck(fields).to_dict(),
-            VolatilityOverTimeCheck(fields).to_dict(),
-            # HEALTH
-            ShortTermLiabilitiesCheck(fields).to_dict(),
-            LongTermLiabilitiesCheck(fields).to_dict(),
-            DebtLevelCheck(fields).to_dict(),
-            ReducingDebtCheck(fields).to_dict(),
-            DebtCoverageCheck(fields).to_dict(),
-            InterestCoverageCheck(fields).to_dict(),
-            # DIVIDEND
-            SignificantDividendCheck(fields).to_dict(),
-            HighDividendCheck(fields).to_dict(),
-            StableDividendCheck(fields).to_dict(),
-            GrowingDividendCheck(fields).to_dict(),
-            EarningsCoverageCheck(fields).to_dict(),
-            CashFlowCoverageCheck(fields).to_dict(),
-        ]
+        passed, missing = evaluate_check(check, select_rows(inputs.columns, check.fingerprint_inputs(), rows))
+        stats['evaluated'] += len(rows)
+        for i, row in enumerate(rows.tolist()):
+            if row not in fields:
+                fields[row] = inputs.fields(row)
+            statement = check(fields[row]).render(bool(passed[i]), bool(missing[i]))
+            statement['fingerprint'] = fingerprints[row]
+            records.append(statement)
+
+        if len(records) >= STATEMENTS_PER_BATCH:
+            stats['statements'] += save_statements(records)
+            records = []
+
+    stats['statements'] += save_statements(records)
+    stats.update({
+        'load_seconds': round(loaded - started, 3),
+        'total_seconds': round(time.monotonic() - started, 3),
+    })
+    logger.info(f'[Statements] {stats}')
+    return stats
+
+
+def evaluate(columns: Columns) -> dict[type[BaseCheck], tuple[np.ndarray, np.ndarray]]:
+    """Pass and no data masks of every check, for all companies of the columns at once"""
+    return {check: evaluate_check(check, columns) for check in CHECKS}
+
+
+def evaluate_check(check: type[BaseCheck], columns: Columns) -> tuple[np.ndarray, np.ndarray]:
+    rows = len(next(iter(columns.values()), ()))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        passed = np.broadcast_to(np.asarray(check.predicate(columns), dtype=bool), rows)
+    missing = np.zeros(rows, dtype=bool)
+    for name in check.inputs:
+        missing |= np.isnan(columns[name])
+    return passed, missing
+
+
+def select_rows(columns: Columns, names: tuple[str, ...], rows: np.ndarray) -> Columns:
+    """The named columns at the given rows"""
+    return Columns({name: columns[name][rows] for name in names})
+
 
-        objects.append(checks)
+def check_fingerprints(check: type[BaseCheck], columns: Columns, details: list[bytes]) -> list[str]:
+    """Hashes of every input of the check, for every company; the statement is stored with it"""
+    names = check.fingerprint_inputs()
+    values = np.column_stack([columns[name] for name in names]).astype(np.float64) if names else np.empty((len(details), 0))
+    prefix = check.name.encode()
+    return [hashlib.md5(prefix + details[row] + values[row].tobytes()).hexdigest() for row in range(len(details))]
 
-    return objects
 
+def stored_fingerprints(company_ids: list[int]) -> dict[tuple[int, str], str]:
+    return {
+        (company_id, name): fingerprint
+        for company_id, name, fingerprint in models.Statement.objects.filter(
+            company_id__in=company_ids,
+        ).values_list('company_id', 'name', 'fingerprint')
+    }
 
-def get_fields(company_object):
-    last_candle = company_object.instruments.filter(instrument_type='share').first().candles.order_by('-time').first()
 
-    return Fields(
-        # Common
-        company_object=company_object,
-        slug=company_object.slug,
-        currency='₽',
-        market_country_adjectif='russian',
-        sector_company_name='banks',
-        # Value
-        company_current_price=last_candle.close if last_candle else 0,
-        average_price_target_1y=400,
-        company_fair_price=329.48,
-        company_pe=5.0,
-        peers_pe=4.8,
-        industry_pe=4.8,
-        company_fair_pe=4.8,
-        return_1y=0.33,
-        market_return_1y=0.282,
-        sector_market_return_1y=0.299,
-        # Future
-        company_forecast_earnings_growth=0.082,
-        country_saving_rate=0.075,
-        market_forecast_earnings_growth=0.092,
-        company_forecast_revenue_growth=0.0125,
-        market_forecast_revenue_growth=0.033,
-        company_future_roe_3y=0.0199,
-        # Past
-        company_earnings=1_158_600_000_000,
-        company_profit_margins=0.476,
-        past_profit_margins=0.419,
-        company_earnings_growth_5y=0.101,
-        company_earnings_growth=0.524,
-        industry_earnings_growth=0.146,
-        company_roe=0.209,
-        volatility_3m=0.017,
-        volatility_1y=0.29,
-        volatility_1y_past_year=0.17,
-        sector_market_volatility_3m=0.032,
-        # Health
-        company_short_term_assets=6_271_400_000_000,
-        company_short_term_liabilities=31_154_700_000_000,
-        company_long_term_liabilities=4_366_300_000_000,
-        company_net_debt_to_equity_ratio=0.027,
-        company_debt=9_700_000_000,
-        company_debt_to_equity_ratio=0.903,
-        company_debt_to_equity_ratio_5Y_ago=0.99,
-        company_operating_cash_flow=-100_000_000,
-        company_interest_rate=0.09,
-        company_ebit=100_000_000,
-        # Dividend
-        company_dividend_yield=0.1403,
-        market_dividend_yield_p25=0.0443,
-        market_dividend_yield_p75=0.1315,
-        company_dividend_is_volatile_in_10y=True,
-        company_dividend_amount=539_673_700_000,
-        company_dividend_amount_10y_ago=55_678_456_360,
-        company_payout_ratio=0.347,
-        company_cash_payout_ratio=0,
-        # Risks
-        earnings_growth_per_year_forecast_3y=0.082,
-        capitalisation_rate=0.07,
-        capitalisation_rate_1y=0.05,
-        operating_cash_flow_growth=0.6,
-        gross_profit_margin=0.97,
-        gross_profit_margin_1y=0.98,
-        sloan_ratio=0.15,  # =(Net Income-CFO(Cash Flow from Operations)-CFI(Cash Flow from Investments))/Total Assets
-        inventory_growth=0.20,
-        sales_growth=0.25,
-        unearned_revenue_growth=0.25,
-        accounts_receivable_growth=0.25,
-        one_off_charges=5_000_000,
-        market_cap_usd=42_000_000_000,
-        market_cap=4_000_000_000_000,
-        revenue=3_000_000_000_000,
-        events_was_occurred=True,
-        substantial_insider_selling_was_occurred=True,
-        has_diluted_over_past_year=True,
-        non_operating_revenue=100_000_000,
-        operating_revenue=1_500_000_000_000,
-        cash_and_cash_equivalents=100_000_000,
-        cash_expenses=50_000_000,
-        equity=5_000_000_000,
+def save_statements(records: list[Statement]) -> int:
+    """Upsert check results by (company, name)"""
+    models.Statement.objects.bulk_create(
+        [models.Statement(**record) for record in records],
+        update_conflicts=True,
+        update_fields=STATEMENT_UPDATE_FIELDS,
+        unique_fields=['company', 'name'],
     )
+    return len(records)
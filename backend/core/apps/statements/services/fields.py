@@ -0,0 +1,556 @@
+"""Inputs of the statement checks, built for many companies at once.
+
+Annual reports with their statements, dividends, analyst targets and stored
+performance are loaded with one query each, prices come from the candle
+cache. Everything is aligned into arrays by company (one row per company
+and its first share) and combined with NumPy. Industry, peer and market
+figures are medians and percentiles over every visible company: they are
+computed once per run (see load_market) and looked up by the group of each
+analysed company, so a shard only loads the inputs of its own companies.
+
+There are no forecasts in the database yet: forecast inputs are the trailing
+3 years growth, and the fair value is Graham's formula over the 5 years
+earnings growth. Inputs without data are NaN in the columns the checks are
+evaluated on (the check has no data then) and 0 in the fields their
+descriptions are rendered from.
+"""
+from dataclasses import dataclass
+from typing import Iterable
+import calendar
+import datetime
+import warnings
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Avg, Q
+from django.utils import timezone
+
+from apps.invest.models import (
+    AnalystIdea,
+    Company,
+    CompanyPerformance,
+    Dividend,
+    ExchangePerformance,
+    Instrument,
+    InstrumentType,
+    ReportMetadata,
+    ReportPeriodType,
+    Sector,
+    SectorExchange,
+)
+from apps.invest.services.returns import DAY_SECONDS, forward_fill, load_matrices
+from apps.statements.types import Columns, Fields
+
+REPORT_YEARS = 11 # Latest annual report and the 10 before it
+YEAR_SECONDS = 365 * DAY_SECONDS
+WEEKS_3M = 13
+WEEKS_1Y = 52
+SAVING_RATE = 0.075 # Return of savings the forecast earnings growth has to beat
+GRAHAM_BASE_PE = 8.5 # P/E of a company without growth
+GRAHAM_MAX_GROWTH = 0.25
+COUNTRY_ADJECTIVES = {
+    'RU': 'russian',
+    'RUS': 'russian',
+    'US': 'american',
+    'USA': 'american',
+    'CN': 'chinese',
+    'CHN': 'chinese',
+    'KZ': 'kazakh',
+    'KAZ': 'kazakh',
+}
+
+# Report values multiplied by the report's scale unit, {name: lookup}
+MONEY_VALUES = {
+    'total_current_assets': 'balance_sheet__total_current_assets',
+    'total_current_liabilities': 'balance_sheet__total_current_liabilities',
+    'total_long_term_liabilities': 'balance_sheet__total_long_term_liabilities',
+    'long_term_debt': 'balance_sheet__long_term_debt',
+    'short_term_debt': 'balance_sheet__short_term_debt',
+    'total_equity': 'balance_sheet__total_equity',
+    'cash_and_cash_equivalents': 'balance_sheet__cash_and_cash_equivalents',
+    'total_assets': 'balance_sheet__total_assets',
+    'total_inventories': 'balance_sheet__total_inventories',
+    'accounts_receivable': 'balance_sheet__accounts_receivable',
+    'current_deferred_revenue': 'balance_sheet__current_deferred_revenue',
+    'revenue': 'income_statement__revenue',
+    'net_income': 'income_statement__net_income',
+    'gross_profit': 'income_statement__gross_profit',
+    'ebit': 'income_statement__ebit',
+    'interest_expense': 'income_statement__interest_expense',
+    'non_operation_income': 'income_statement__non_operation_income',
+    'operating_income': 'income_statement__operating_income',
+    'special_charges': 'income_statement__special_charges',
+    'total_expenses': 'income_statement__total_expenses',
+    'cash_flow_from_operations': 'cashflow_statement__cash_flow_from_operations',
+    'cash_flow_from_investing': 'cashflow_statement__cash_flow_from_investing',
+    'dividends_paid': 'cashflow_statement__dividends_paid',
+    'free_cash_flow': 'cashflow_statement__free_cash_flow',
+}
+# Per share values and share counts, taken as they are
+UNIT_VALUES = {
+    'eps_basic': 'income_statement__eps_basic',
+    'shares_outstanding': 'share_outstanding_eop',
+}
+
+# {statistic: [[*group ids, value], ...]}, JSON serializable to be passed to the shard tasks
+Market = dict[str, list[list[float]]]
+
+
+@dataclass
+class Universe:
+    """Companies with their first share, the arrays are aligned by row"""
+    company_ids: np.ndarray
+    instrument_ids: np.ndarray
+    exchange_ids: np.ndarray
+    sector_ids: np.ndarray
+    industry_ids: np.ndarray
+    tickers: list[str]
+    currencies: list[str] # ISO codes
+    symbols: list[str]
+    countries: list[str] # ISO codes
+
+    def __len__(self):
+        return len(self.company_ids)
+
+    def groups(self, group: str) -> np.ndarray:
+        """Ids of every company's group, one column per id"""
+        ids = {
+            'peers': (self.sector_ids, self.exchange_ids),
+            'industry': (self.industry_ids,),
+            'exchange': (self.exchange_ids,),
+        }[group]
+        return np.stack(ids, axis=1)
+
+    def rows(self, company_ids: Iterable[int]) -> np.ndarray:
+        """Rows of the companies, -1 for companies without a share"""
+        company_ids = np.fromiter(company_ids, dtype=np.int64)
+        rows = np.searchsorted(self.company_ids, company_ids).clip(max=max(len(self) - 1, 0))
+        found = len(self) > 0 and self.company_ids[rows] == company_ids
+        return np.where(found, rows, -1)
+
+
+def load_universe(company_ids: Iterable[int] = (), visible: bool = True) -> Universe:
+    """The given companies and, unless ``visible`` is False, the visible ones, ordered by company id"""
+    companies = Q(company_id__in=list(company_ids))
+    if visible:
+        companies |= Q(company__is_visible=True)
+
+    shares = {}
+    for row in (
+        Instrument.objects
+        .filter(companies, instrument_type=InstrumentType.SHARE)
+        .order_by('-id')
+        .values_list(
+            'company_id',
+            'id',
+            'exchange_id',
+            'company__sector_id',
+            'company__industry_id',
+            'ticker',
+            'currency__iso_code',
+            'currency__symbol',
+            'company__country__iso_code',
+        )
+    ):
+        shares[row[0]] = row
+
+    columns = list(zip(*sorted(shares.values()))) or [()] * 9
+    return Universe(
+        *(np.array(column, dtype=np.int64) for column in columns[:5]),
+        *(list(column) for column in columns[5:]),
+    )
+
+
+def load_reports(universe: Universe, year: int) -> dict[str, np.ndarray]:
+    """Annual report values, companies x years back from the latest report (NaN without one)"""
+    names = list(MONEY_VALUES) + list(UNIT_VALUES)
+    rows = list(
+        ReportMetadata.objects
+        .filter(
+            company_id__in=universe.company_ids.tolist(),
+            report_period_type=ReportPeriodType.ANNUAL.value,
+            year__gt=year - REPORT_YEARS - 1,
+        )
+        .values_list('company_id', 'year', 'scale_unit', *MONEY_VALUES.values(), *UNIT_VALUES.values())
+    )
+    values = {name: np.full((len(universe), REPORT_YEARS), np.nan) for name in names}
+    latest = np.full(len(universe), -1, dtype=np.int64)
+    if not rows:
+        return values
+
+    data = np.array(rows, dtype=np.float64)
+    company_rows = universe.rows(data[:, 0].astype(np.int64))
+    years = data[:, 1].astype(np.int64)
+    np.maximum.at(latest, company_rows, years)
+
+    back = latest[company_rows] - years
+    keep = back < REPORT_YEARS
+    scale = data[:, 2]
+    for i, name in enumerate(names):
+        column = data[:, 3 + i] * (scale if name in MONEY_VALUES else 1)
+        values[name][company_rows[keep], back[keep]] = column[keep]
+    return values
+
+
+def load_report_dates(company_ids: list[int]) -> dict[int, datetime.datetime]:
+    """End of the latest reported period of every company"""
+    dates = {}
+    for company_id, year, quarter in ReportMetadata.objects.filter(company_id__in=company_ids).values_list(
+        'company_id', 'year', 'quarter',
+    ):
+        month = 12 if quarter == 0 else quarter * 3
+        date = datetime.datetime(year, month, calendar.monthrange(year, month)[1])
+        if company_id not in dates or date > dates[company_id]:
+            dates[company_id] = date
+    return dates
+
+
+def load_dividends(universe: Universe, now: datetime.datetime) -> np.ndarray:
+    """Dividends per share paid during each of the last REPORT_YEARS years (companies x years back)"""
+    paid = np.zeros((len(universe), REPORT_YEARS))
+    rows = list(
+        Dividend.objects
+        .filter(
+            instrument_id__in=universe.instrument_ids.tolist(),
+            payment_date__lte=now,
+            payment_date__gt=now - datetime.timedelta(seconds=REPORT_YEARS * YEAR_SECONDS),
+        )
+        .exclude(dividend_type='Cancelled')
+        .values_list('instrument_id', 'payment_date', 'dividend_net')
+    )
+    if not rows:
+        return paid
+
+    instrument_ids, payment_dates, amounts = zip(*rows)
+    order = np.argsort(universe.instrument_ids)
+    company_rows = order[np.searchsorted(universe.instrument_ids, instrument_ids, sorter=order)]
+    seconds = np.array([now.timestamp() - date.timestamp() for date in payment_dates])
+    back = np.minimum(seconds // YEAR_SECONDS, REPORT_YEARS - 1).astype(np.int64)
+    np.add.at(paid, (company_rows, back), np.array(amounts, dtype=np.float64))
+    return paid
+
+
+def load_performance(universe: Universe) -> dict[str, np.ndarray]:
+    """Stored 1 year returns of the companies, their exchanges and sectors, and the sector's weekly movement"""
+    performance = {
+        name: np.full(len(universe), np.nan)
+        for name in ('return_1y', 'market_return_1y', 'sector_market_return_1y', 'sector_market_volatility_3m')
+    }
+    for company_id, return_1y in CompanyPerformance.objects.filter(
+        company_id__in=universe.company_ids.tolist(),
+    ).values_list('company_id', 'return_1y'):
+        performance['return_1y'][universe.rows([company_id])[0]] = _float(return_1y)
+
+    for exchange_id, return_1y in ExchangePerformance.objects.filter(
+        exchange_id__in=np.unique(universe.exchange_ids).tolist(),
+    ).values_list('exchange_id', 'return_1y'):
+        performance['market_return_1y'][universe.exchange_ids == exchange_id] = _float(return_1y)
+
+    for sector_id, exchange_id, return_1y, movement in SectorExchange.objects.filter(
+        sector_id__in=np.unique(universe.sector_ids).tolist(),
+        exchange_id__in=np.unique(universe.exchange_ids).tolist(),
+    ).values_list('sector_id', 'exchange_id', 'return_1y', 'average_weekly_mouvement'):
+        rows = (universe.sector_ids == sector_id) & (universe.exchange_ids == exchange_id)
+        performance['sector_market_return_1y'][rows] = _float(return_1y)
+        performance['sector_market_volatility_3m'][rows] = _float(movement)
+    return performance
+
+
+def load_price_targets(universe: Universe, now: datetime.datetime) -> np.ndarray:
+    targets = np.full(len(universe), np.nan)
+    for company_id, target in (
+        AnalystIdea.objects
+        .filter(company_id__in=universe.company_ids.tolist(), date_target__gte=now)
+        .values('company_id')
+        .annotate(target=Avg('price_target'))
+        .values_list('company_id', 'target')
+    ):
+        targets[universe.rows([company_id])[0]] = target
+    return targets
+
+
+def load_usd_instrument() -> tuple[int | None, str]:
+    """Id and currency (ISO code) of USD_INSTRUMENT_TICKER, its price is the rate of market caps in USD"""
+    instrument = (
+        Instrument.objects.filter(ticker=settings.USD_INSTRUMENT_TICKER, instrument_type=InstrumentType.CURRENCY)
+        .values_list('id', 'currency__iso_code').first()
+    )
+    return instrument or (None, '')
+
+
+def load_sector_names(sector_ids: np.ndarray) -> dict[int, str]:
+    sectors = Sector.objects.filter(pk__in=np.unique(sector_ids).tolist()).prefetch_related('translations')
+    return {sector.pk: (sector.safe_translation_getter('title', any_language=True) or '').lower() for sector in sectors}
+
+
+def weekly_returns(prices: np.ndarray, weeks: int) -> np.ndarray:
+    """Returns of the last ``weeks`` weeks, the latest one first"""
+    closes = prices[:, ::-1][:, :7 * weeks + 1:7]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return closes[:, :-1] / closes[:, 1:] - 1
+
+
+def ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator != 0, numerator / denominator, np.nan)
+
+
+def growth(now: np.ndarray, past: np.ndarray) -> np.ndarray:
+    return ratio(now - past, np.abs(past))
+
+
+def annual_growth(now: np.ndarray, past: np.ndarray, years: int) -> np.ndarray:
+    """Compound annual growth, NaN unless both values are positive"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((now > 0) & (past > 0), (now / past) ** (1 / years) - 1, np.nan)
+
+
+def group_statistics(values: np.ndarray, groups: np.ndarray, statistic, *args) -> list[list[float]]:
+    """``statistic`` of the values of every group as [*group ids, value] rows, groups without a value are left out"""
+    if not len(values):
+        return []
+
+    keys, inverse = np.unique(groups, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    statistics = []
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning) # All-NaN groups
+        for key in range(len(keys)):
+            value = statistic(values[inverse == key], *args)
+            if not np.isnan(value):
+                statistics.append([*keys[key].tolist(), float(value)])
+    return statistics
+
+
+def lookup_statistics(statistics: list[list[float]], groups: np.ndarray) -> np.ndarray:
+    """Statistic of every row's group, NaN for groups without one"""
+    values = {tuple(row[:-1]): row[-1] for row in statistics}
+    return np.array([values.get(tuple(key), np.nan) for key in groups.tolist()], dtype=np.float64)
+
+
+def positive_percentile(values: np.ndarray, q: float) -> float:
+    """Percentile of the positive values, e.g. yields of the companies paying dividends"""
+    return np.nanpercentile(np.where(values > 0, values, np.nan), q)
+
+
+# Market figures over every visible company, {name: (group, input, statistic, *args)}
+MARKET_STATISTICS = {
+    'peers_pe': ('peers', 'company_pe', np.nanmedian),
+    'industry_pe': ('industry', 'company_pe', np.nanmedian),
+    'industry_earnings_growth': ('industry', 'company_earnings_growth', np.nanmedian),
+    'market_forecast_earnings_growth': ('exchange', 'company_forecast_earnings_growth', np.nanmedian),
+    'market_forecast_revenue_growth': ('exchange', 'company_forecast_revenue_growth', np.nanmedian),
+    'market_dividend_yield_p25': ('exchange', 'company_dividend_yield', positive_percentile, 25),
+    'market_dividend_yield_p75': ('exchange', 'company_dividend_yield', positive_percentile, 75),
+}
+
+
+def compute(universe: Universe, now: datetime.datetime) -> dict[str, np.ndarray]:
+    """Numeric check inputs of every company of the universe, except the market statistics"""
+    reports = load_reports(universe, now.year)
+    first = {name: values[:, 0] for name, values in reports.items()}
+    previous = {name: values[:, 1] for name, values in reports.items()}
+
+    # Candles of the USD instrument are loaded along with the companies' ones
+    usd_id, usd_currency = load_usd_instrument()
+    instrument_ids = universe.instrument_ids if usd_id is None else np.append(universe.instrument_ids, usd_id)
+    close, _ = load_matrices(instrument_ids, int(now.timestamp()) // DAY_SECONDS)
+    prices = forward_fill(close, close.shape[1])
+    usd_rate = np.nan if usd_id is None else prices[-1, -1]
+    prices = prices[:len(universe)]
+    price = prices[:, -1]
+    price_1y = prices[:, -1 - 365]
+    weekly = weekly_returns(prices, 2 * WEEKS_1Y)
+    dividends = load_dividends(universe, now)
+    performance = load_performance(universe)
+
+    shares = np.where(first['shares_outstanding'] > 0, first['shares_outstanding'], np.nan)
+    net_income = first['net_income']
+    equity = first['total_equity']
+    debt = first['long_term_debt'] + first['short_term_debt']
+    debt_5y = reports['long_term_debt'][:, 5] + reports['short_term_debt'][:, 5]
+    eps = np.where(first['eps_basic'] != 0, first['eps_basic'], ratio(net_income, shares))
+    market_cap = price * shares
+    earnings_growth_3y = annual_growth(net_income, reports['net_income'][:, 3], 3)
+    earnings_growth_5y = annual_growth(net_income, reports['net_income'][:, 5], 5)
+    fair_pe = GRAHAM_BASE_PE + 2 * 100 * np.clip(np.nan_to_num(earnings_growth_5y), 0, GRAHAM_MAX_GROWTH)
+    pe = np.where(eps > 0, ratio(price, eps), np.nan)
+    dividend_yield = ratio(dividends[:, 0], price)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning) # Shares without candles
+        volatility_3m = np.nanstd(weekly[:, :WEEKS_3M], axis=1)
+        volatility_1y = np.nanstd(weekly[:, :WEEKS_1Y], axis=1)
+        volatility_1y_past_year = np.nanstd(weekly[:, WEEKS_1Y:], axis=1)
+
+    values = {
+        # Value
+        'company_current_price': price,
+        'average_price_target_1y': load_price_targets(universe, now),
+        'company_fair_price': np.where(eps > 0, eps * fair_pe, np.nan),
+        'company_pe': pe,
+        'company_fair_pe': fair_pe,
+        'return_1y': performance['return_1y'],
+        'market_return_1y': performance['market_return_1y'],
+        'sector_market_return_1y': performance['sector_market_return_1y'],
+        # Future
+        'company_forecast_earnings_growth': earnings_growth_3y,
+        'country_saving_rate': np.full(len(universe), SAVING_RATE),
+        'company_forecast_revenue_growth': annual_growth(first['revenue'], reports['revenue'][:, 3], 3),
+        'company_future_roe_3y': ratio(net_income * (1 + np.nan_to_num(earnings_growth_3y)) ** 3, equity),
+        # Past
+        'company_earnings': net_income,
+        'company_profit_margins': ratio(net_income, first['revenue']),
+        'past_profit_margins': ratio(previous['net_income'], previous['revenue']),
+        'company_earnings_growth_5y': earnings_growth_5y,
+        'company_earnings_growth': growth(net_income, previous['net_income']),
+        'company_roe': ratio(net_income, equity),
+        'volatility_3m': volatility_3m,
+        'volatility_1y': volatility_1y,
+        'volatility_1y_past_year': volatility_1y_past_year,
+        'sector_market_volatility_3m': performance['sector_market_volatility_3m'],
+        # Health
+        'company_short_term_assets': first['total_current_assets'],
+        'company_short_term_liabilities': first['total_current_liabilities'],
+        'company_long_term_liabilities': first['total_long_term_liabilities'],
+        'company_net_debt_to_equity_ratio': ratio(debt - first['cash_and_cash_equivalents'], equity),
+        'company_debt': debt,
+        'company_debt_to_equity_ratio': ratio(debt, equity),
+        'company_debt_to_equity_ratio_5Y_ago': ratio(debt_5y, reports['total_equity'][:, 5]),
+        'company_operating_cash_flow': first['cash_flow_from_operations'],
+        'company_interest_rate': np.abs(first['interest_expense']),
+        'company_ebit': first['ebit'],
+        # Dividend
+        'company_dividend_yield': dividend_yield,
+        # A yearly dividend more than 20% below the one of the year before
+        'company_dividend_is_volatile_in_10y': ((dividends[:, :-1] < dividends[:, 1:] * 0.8) & (dividends[:, 1:] > 0)).any(axis=1),
+        'company_dividend_amount': np.abs(first['dividends_paid']),
+        'company_dividend_amount_10y_ago': np.abs(reports['dividends_paid'][:, 10]),
+        'company_payout_ratio': ratio(np.abs(first['dividends_paid']), net_income),
+        'company_cash_payout_ratio': ratio(np.abs(first['dividends_paid']), first['free_cash_flow']),
+        # Risks
+        'earnings_growth_per_year_forecast_3y': earnings_growth_3y,
+        'capitalisation_rate': ratio(first['operating_income'], market_cap),
+        'capitalisation_rate_1y': ratio(previous['operating_income'], price_1y * shares),
+        'operating_cash_flow_growth': growth(first['cash_flow_from_operations'], previous['cash_flow_from_operations']),
+        'gross_profit_margin': ratio(first['gross_profit'], first['revenue']),
+        'gross_profit_margin_1y': ratio(previous['gross_profit'], previous['revenue']),
+        'sloan_ratio': ratio(
+            net_income - first['cash_flow_from_operations'] - first['cash_flow_from_investing'],
+            first['total_assets'],
+        ),
+        'inventory_growth': growth(first['total_inventories'], previous['total_inventories']),
+        'sales_growth': growth(first['revenue'], previous['revenue']),
+        'unearned_revenue_growth': growth(first['current_deferred_revenue'], previous['current_deferred_revenue']),
+        'accounts_receivable_growth': growth(first['accounts_receivable'], previous['accounts_receivable']),
+        'one_off_charges': first['special_charges'],
+        'market_cap': market_cap,
+        'revenue': first['revenue'],
+        # No events or insider trades are collected yet
+        'events_was_occurred': np.zeros(len(universe), dtype=bool),
+        'substantial_insider_selling_was_occurred': np.zeros(len(universe), dtype=bool),
+        'has_diluted_over_past_year': first['shares_outstanding'] > previous['shares_outstanding'],
+        'non_operating_revenue': first['non_operation_income'],
+        'operating_revenue': first['operating_income'],
+        'cash_and_cash_equivalents': first['cash_and_cash_equivalents'],
+        'cash_expenses': first['total_expenses'],
+        'equity': equity,
+    }
+
+    currencies = np.array([currency.lower() for currency in universe.currencies], dtype=object)
+    values['market_cap_usd'] = np.select(
+        [currencies == 'usd', currencies == usd_currency.lower()],
+        [market_cap, market_cap / usd_rate],
+        np.nan,
+    )
+    return values
+
+
+def market_statistics(universe: Universe, values: dict[str, np.ndarray]) -> Market:
+    return {
+        name: group_statistics(values[column], universe.groups(group), statistic, *args)
+        for name, (group, column, statistic, *args) in MARKET_STATISTICS.items()
+    }
+
+
+def load_market(now: datetime.datetime | None = None) -> Market:
+    """Market statistics over every visible company, computed once and shared by the shards of a run"""
+    now = now or timezone.now()
+    universe = load_universe()
+    return market_statistics(universe, compute(universe, now))
+
+
+# Text inputs every statement is rendered with
+FINGERPRINT_DETAILS = ('slug', 'currency', 'market_country_adjectif', 'sector_company_name')
+
+
+@dataclass
+class Inputs:
+    """Check inputs of the analysed companies that have a share, rows are aligned with ``companies``"""
+    companies: list[Company]
+    columns: Columns # NaN without data
+    details: list[dict] # Inputs of the descriptions
+
+    def __len__(self):
+        return len(self.companies)
+
+    def fingerprints(self) -> list[bytes]:
+        """Text inputs of every company's descriptions, part of its statements' fingerprints"""
+        return [
+            '\x1f'.join(str(details[name]) for name in FINGERPRINT_DETAILS).encode()
+            for details in self.details
+        ]
+
+    def fields(self, row: int) -> Fields:
+        return Fields(
+            **self.details[row],
+            **{name: _value(column[row]) for name, column in self.columns.items() if name in Fields.__annotations__},
+        )
+
+
+def load_inputs(companies: list[Company], now: datetime.datetime | None = None, market: Market | None = None) -> Inputs:
+    """Inputs of the companies, the market statistics are computed along unless given"""
+    now = now or timezone.now()
+    universe = load_universe((company.pk for company in companies), visible=market is None)
+    values = compute(universe, now)
+    market = market_statistics(universe, values) if market is None else market
+    for name, (group, *_) in MARKET_STATISTICS.items():
+        values[name] = lookup_statistics(market[name], universe.groups(group))
+    report_dates = load_report_dates([company.pk for company in companies])
+    sector_names = load_sector_names(universe.sector_ids)
+
+    rows = universe.rows(company.pk for company in companies)
+    companies = [company for company, row in zip(companies, rows) if row >= 0]
+    rows = rows[rows >= 0]
+    columns = Columns({name: column[rows] for name, column in values.items()})
+    columns['report_age_days'] = np.array([
+        (now.replace(tzinfo=None) - report_dates[company.pk]).days if company.pk in report_dates else np.nan
+        for company in companies
+    ], dtype=np.float64)
+    columns['report_time'] = np.array([
+        report_dates[company.pk].timestamp() if company.pk in report_dates else np.nan
+        for company in companies
+    ], dtype=np.float64)
+
+    details = [
+        {
+            'company_object': company,
+            'slug': universe.tickers[row],
+            'currency': universe.symbols[row],
+            'market_country_adjectif': COUNTRY_ADJECTIVES.get(universe.countries[row], universe.countries[row]),
+            'sector_company_name': sector_names.get(int(universe.sector_ids[row]), ''),
+            'report_date': report_dates.get(company.pk),
+        }
+        for company, row in zip(companies, rows)
+    ]
+    return Inputs(companies, columns, details)
+
+
+def _float(value) -> float:
+    return np.nan if value is None else value
+
+
+def _value(value) -> float | bool:
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    return 0.0 if np.isnan(value) else float(value)
@@ -1,7 +1,38 @@
-from celery import shared_task
+from celery import chord, shared_task
+from django.conf import settings
+
 from apps.statements.services.analysis import main
+from apps.statements.services.fields import load_market
 
 
 @shared_task(name='StatementCheck')
-def statement_check_task():
-    return main()
+def statement_check_task(shards: int = None, full: bool = False):
+    """Statement analysis in this worker, or fanned out into shard subtasks by company id"""
+    shards = shards or settings.STATEMENT_CHECK_SHARDS
+    if shards <= 1:
+        return main(full=full)
+
+    # Market statistics need every visible company, they are computed once for all shards
+    market = load_market()
+    chord(
+        statement_check_shard_task.s(shard, shards, full, market) for shard in range(shards)
+    )(statement_check_finish_task.s())
+    return {'shards': shards}
+
+
+@shared_task(name='StatementCheckShard', track_started=True)
+def statement_check_shard_task(shard: int, shards: int, full: bool = False, market: dict = None):
+    return main(shard=shard, shards=shards, full=full, market=market)
+
+
+@shared_task(name='StatementCheckFinish')
+def statement_check_finish_task(shard_stats: list[dict]):
+    return {
+        'companies': sum(stats['companies'] for stats in shard_stats),
+        'statements': sum(stats['statements'] for stats in shard_stats),
+        'unchanged': sum(stats['unchanged'] for stats in shard_stats),
+        'evaluated': sum(stats['evaluated'] for stats in shard_stats),
+        # The slowest shard bounds the analysis time
+        'total_seconds': max((stats['total_seconds'] for stats in shard_stats), default=0),
+        'shards': shard_stats,
+    }
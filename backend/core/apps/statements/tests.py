@@ -1,3 +1,164 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.statements.checks.dividend import GrowingDividendCheck, SignificantDividendCheck, StableDividendCheck
+from apps.statements.checks.health import DebtLevelCheck, ReducingDebtCheck, ShortTermLiabilitiesCheck
+from apps.statements.checks.initials import (
+    HasFiledWithinMonthsCheck,
+    HasFinancialDataCheck,
+    HasHighAccrualsRatioCheck,
+    IsAbleToAchieveProfitabilityCheck,
+)
+from apps.statements.checks.value import BelowFairValueCheck, SignificantlyBelowFairValueCheck
+from apps.statements.services.analysis import CHECKS, check_fingerprints, evaluate, evaluate_check, select_rows
+from apps.statements.services.fields import group_statistics, lookup_statistics, positive_percentile
+from apps.statements.types import Columns
+
+ROWS = 200
+
+# Conditions of the checks as they were evaluated one company at a time, {check: condition of a row}
+BASELINE = {
+    BelowFairValueCheck: lambda r: r['company_current_price'] < r['company_fair_price'],
+    SignificantlyBelowFairValueCheck: lambda r: (
+        (r['company_current_price'] - r['company_fair_price']) / r['company_fair_price'] > 0.2
+    ),
+    ShortTermLiabilitiesCheck: lambda r: r['company_short_term_assets'] > r['company_short_term_liabilities'],
+    DebtLevelCheck: lambda r: r['company_net_debt_to_equity_ratio'] > 0.02,
+    ReducingDebtCheck: lambda r: r['company_debt_to_equity_ratio_5Y_ago'] > r['company_debt_to_equity_ratio'],
+    SignificantDividendCheck: lambda r: r['company_dividend_yield'] > r['market_dividend_yield_p25'],
+    StableDividendCheck: lambda r: bool(r['company_dividend_is_volatile_in_10y']),
+    GrowingDividendCheck: lambda r: r['company_dividend_amount'] > r['company_dividend_amount_10y_ago'],
+    HasHighAccrualsRatioCheck: lambda r: abs(r['sloan_ratio']) <= 0.10,
+    IsAbleToAchieveProfitabilityCheck: lambda r: r['company_earnings'] > 0,
+    HasFiledWithinMonthsCheck: lambda r: not np.isnan(r['report_age_days']) and r['report_age_days'] < 180,
+    HasFinancialDataCheck: lambda r: not np.isnan(r['report_age_days']),
+}
+BOOLEAN_INPUTS = {
+    'company_dividend_is_volatile_in_10y',
+    'events_was_occurred',
+    'substantial_insider_selling_was_occurred',
+    'has_diluted_over_past_year',
+}
+
+
+def random_columns(checks, rows: int = ROWS, seed: int = 0) -> Columns:
+    """Inputs of the checks with every tenth value missing"""
+    rng = np.random.default_rng(seed)
+    columns = Columns()
+    for check in checks:
+        for name in check.fingerprint_inputs():
+            if name in columns:
+                continue
+            if name in BOOLEAN_INPUTS:
+                columns[name] = rng.random(rows) < 0.5
+            else:
+                values = rng.normal(0, 1, rows) * rng.choice([1, 100, 1000], rows)
+                values[rng.random(rows) < 0.1] = np.nan
+                columns[name] = np.abs(values) if name == 'report_age_days' else values
+    return columns
+
+
+class PredicateTest(SimpleTestCase):
+    def test_predicates_match_baseline(self):
+        columns = random_columns(BASELINE)
+        for check, condition in BASELINE.items():
+            passed, missing = evaluate_check(check, columns)
+            for row in range(ROWS):
+                values = {name: columns[name][row] for name in columns}
+                expected_missing = any(np.isnan(values[name]) for name in check.inputs)
+                with self.subTest(check=check.name, row=row):
+                    self.assertEqual(bool(missing[row]), expected_missing)
+                    if not expected_missing:
+                        self.assertEqual(bool(passed[row]), condition(values))
+
+    def test_nullable_input_fails_check(self):
+        columns = Columns(report_age_days=np.array([10.0, 400.0, np.nan]))
+        passed, missing = evaluate_check(HasFiledWithinMonthsCheck, columns)
+        self.assertEqual(passed.tolist(), [True, False, False])
+        self.assertEqual(missing.tolist(), [False, False, False])
+
+    def test_every_check_evaluates(self):
+        columns = random_columns(CHECKS)
+        results = evaluate(columns)
+        self.assertEqual(set(results), set(CHECKS))
+        for check, (passed, missing) in results.items():
+            with self.subTest(check=check.name):
+                self.assertEqual(passed.shape, (ROWS,))
+                self.assertEqual(missing.shape, (ROWS,))
+
+    def test_selected_rows(self):
+        columns = random_columns(CHECKS)
+        rows = np.array([3, 7, 11])
+        for check in CHECKS:
+            passed, missing = evaluate_check(check, columns)
+            selected = evaluate_check(check, select_rows(columns, check.fingerprint_inputs(), rows))
+            with self.subTest(check=check.name):
+                self.assertEqual(selected[0].tolist(), passed[rows].tolist())
+                self.assertEqual(selected[1].tolist(), missing[rows].tolist())
+
+
+class FingerprintTest(SimpleTestCase):
+    def setUp(self):
+        self.columns = random_columns(CHECKS, rows=3)
+        self.columns['company_current_price'] = np.array([10.0, 20.0, 30.0])
+        self.columns['company_fair_price'] = np.array([12.0, 18.0, 33.0])
+        self.details = [b'AAA\x1f$', b'BBB\x1f$', b'CCC\x1f$']
+
+    def test_stable(self):
+        first = check_fingerprints(BelowFairValueCheck, self.columns, self.details)
+        second = check_fingerprints(BelowFairValueCheck, Columns(self.columns), list(self.details))
+        self.assertEqual(first, second)
+        self.assertTrue(all(len(fingerprint) == 32 for fingerprint in first))
+        self.assertEqual(len(set(first)), 3)
+
+    def test_changes_with_inputs(self):
+        before = check_fingerprints(BelowFairValueCheck, self.columns, self.details)
+        self.columns['company_fair_price'] = np.array([12.0, 19.0, 33.0])
+        after = check_fingerprints(BelowFairValueCheck, self.columns, self.details)
+        self.assertEqual([a == b for a, b in zip(before, after)], [True, False, True])
+
+    def test_ignores_other_columns(self):
+        before = check_fingerprints(BelowFairValueCheck, self.columns, self.details)
+        self.columns['company_debt'] = self.columns['company_debt'] + 1
+        self.assertEqual(check_fingerprints(BelowFairValueCheck, self.columns, self.details), before)
+
+    def test_changes_with_details(self):
+        before = check_fingerprints(BelowFairValueCheck, self.columns, self.details)
+        after = check_fingerprints(BelowFairValueCheck, self.columns, ['AAA\x1f₽'.encode()] + self.details[1:])
+        self.assertNotEqual(before[0], after[0])
+        self.assertEqual(before[1:], after[1:])
+
+    def test_differs_by_check(self):
+        self.assertNotEqual(
+            check_fingerprints(BelowFairValueCheck, self.columns, self.details),
+            check_fingerprints(SignificantlyBelowFairValueCheck, self.columns, self.details),
+        )
+
+    def test_missing_values(self):
+        before = check_fingerprints(BelowFairValueCheck, self.columns, self.details)
+        self.columns['company_fair_price'] = np.array([12.0, np.nan, 33.0])
+        after = check_fingerprints(BelowFairValueCheck, self.columns, self.details)
+        self.assertNotEqual(before[1], after[1])
+        self.assertEqual(check_fingerprints(BelowFairValueCheck, self.columns, self.details), after)
+
+
+class MarketStatisticsTest(SimpleTestCase):
+    def test_group_medians(self):
+        values = np.array([1.0, 3.0, np.nan, 10.0, np.nan])
+        groups = np.array([[1, 1], [1, 1], [1, 2], [2, 1], [3, 3]])
+
+        # Passed to the shard tasks as JSON
+        statistics = json.loads(json.dumps(group_statistics(values, groups, np.nanmedian)))
+        self.assertEqual(statistics, [[1, 1, 2.0], [2, 1, 10.0]])
+
+        looked_up = lookup_statistics(statistics, np.array([[1, 1], [2, 1], [3, 3], [4, 4]]))
+        np.testing.assert_array_equal(looked_up, [2.0, 10.0, np.nan, np.nan])
+
+    def test_positive_percentile(self):
+        values = np.array([0.0, -1.0, 0.02, 0.04, np.nan])
+        self.assertAlmostEqual(positive_percentile(values, 50), 0.03)
+
+    def test_empty(self):
+        self.assertEqual(group_statistics(np.array([]), np.empty((0, 1), dtype=np.int64), np.nanmedian), [])
@@ -1,5 +1,6 @@
+import datetime
 from enum import Enum
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 from apps.invest.models import Company
 
 
@@ -62,6 +63,7 @@ class Statement(TypedDict):
     status: Status
     severity: Severity
     outcome: int
+    fingerprint: NotRequired[str]
 
 
 class Fields(TypedDict):
@@ -71,6 +73,7 @@ class Fields(TypedDict):
     currency: str
     market_country_adjectif: str
     sector_company_name: str
+    report_date: datetime.datetime | None
     # Value
     company_current_price: float
     average_price_target_1y: float
@@ -145,3 +148,13 @@ class Fields(TypedDict):
     cash_and_cash_equivalents: float
     cash_expenses: float
     equity: float
+
+
+class Columns(dict):
+    """Check inputs by name, one array per input with a row per company"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
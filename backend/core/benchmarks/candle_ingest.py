@@ -0,0 +1,91 @@
+"""Rows/sec of the candle write paths on the configured database.
+
+Synthetic daily candles are written for existing instruments, first as fresh
+inserts and then again as conflicting upserts. Every run is rolled back.
+
+    DJANGO_SETTINGS_MODULE=config.settings.prod python -m benchmarks.candle_ingest --rows 200000
+"""
+import argparse
+import datetime
+import os
+import random
+import time
+
+import django
+from decouple import config as env_conf
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', env_conf('DJANGO_SETTINGS_MODULE'))
+django.setup()
+
+from django.db import connection, transaction
+
+from apps.invest.models import Instrument
+from apps.invest.services.bulk import bulk_create_candles, copy_candles
+
+START = datetime.datetime(1990, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_rows(instrument_ids: list[int], rows: int) -> list[tuple]:
+    per_instrument = -(-rows // len(instrument_ids))
+    result = []
+
+    for instrument_id in instrument_ids:
+        price = random.uniform(10, 1000)
+        for day in range(per_instrument):
+            price *= random.uniform(0.97, 1.03)
+            result.append((
+                instrument_id,
+                START + datetime.timedelta(days=day),
+                price,
+                price * 1.01,
+                price * 0.99,
+                price,
+                float(random.randint(1_000, 1_000_000)),
+                True,
+            ))
+
+    return result[:rows]
+
+
+def measure(writer, rows: list[tuple], chunk: int) -> tuple[float, float]:
+    """Seconds for inserting the rows and for upserting them once more"""
+    timings = []
+
+    with transaction.atomic():
+        for _ in range(2):
+            start = time.perf_counter()
+            for i in range(0, len(rows), chunk):
+                writer(rows[i:i + chunk])
+            timings.append(time.perf_counter() - start)
+        transaction.set_rollback(True)
+
+    return timings[0], timings[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000, help='Number of candle rows')
+    parser.add_argument('--instruments', type=int, default=100, help='Number of instruments to spread rows over')
+    parser.add_argument('--chunk', type=int, default=10_000, help='Rows per write call')
+    args = parser.parse_args()
+
+    instrument_ids = list(Instrument.objects.values_list('id', flat=True)[:args.instruments])
+    if not instrument_ids:
+        raise SystemExit('There are no instruments to write candles for')
+
+    rows = make_rows(instrument_ids, args.rows)
+    writers = {'bulk_create': bulk_create_candles}
+    if connection.vendor == 'postgresql':
+        writers['copy + merge'] = copy_candles
+
+    print(f'{connection.vendor}: {len(rows)} rows, {len(instrument_ids)} instruments, chunks of {args.chunk}')
+    for name, writer in writers.items():
+        insert, upsert = measure(writer, rows, args.chunk)
+        print(
+            f'{name:<12} insert {len(rows) / insert:10.0f} rows/s  '
+            f'upsert {len(rows) / upsert:10.0f} rows/s'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Local stand-in for the Tinkoff market data stream.
+
+Serves MarketDataStream over plain gRPC and replays minute candles to every
+subscriber: ticks recorded by ``market_data_stream --record`` or a synthetic
+random walk. Point the worker at it with ``market_data_stream --target``.
+
+    python -m benchmarks.market_data_server --port 50051 --replay ticks.jsonl --speed 60
+    python -m benchmarks.market_data_server --port 50051 --rate 5000
+"""
+from typing import AsyncIterator, Iterator, Optional
+import argparse
+import asyncio
+import datetime
+import decimal
+import itertools
+import json
+import random
+
+import grpc
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from tinkoff.invest.grpc import common_pb2, marketdata_pb2, marketdata_pb2_grpc
+
+NANO = decimal.Decimal(1_000_000_000)
+
+
+def quotation(value: float) -> common_pb2.Quotation:
+    value = decimal.Decimal(str(value))
+    units = int(value)
+    return common_pb2.Quotation(units=units, nano=int((value - units) * NANO))
+
+
+def timestamp(value: datetime.datetime) -> Timestamp:
+    result = Timestamp()
+    result.FromDatetime(value)
+    return result
+
+
+def candle_response(tick: dict) -> marketdata_pb2.MarketDataResponse:
+    return marketdata_pb2.MarketDataResponse(
+        candle=marketdata_pb2.Candle(
+            instrument_uid=tick['instrument_uid'],
+            interval=marketdata_pb2.SUBSCRIPTION_INTERVAL_ONE_MINUTE,
+            open=quotation(tick['open']),
+            high=quotation(tick['high']),
+            low=quotation(tick['low']),
+            close=quotation(tick['close']),
+            volume=int(tick['volume']),
+            time=timestamp(datetime.datetime.fromisoformat(tick['time'])),
+        )
+    )
+
+
+def recorded_ticks(path: str) -> list[dict]:
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def synthetic_ticks(uids: list[str]) -> Iterator[dict]:
+    """Endless random walk, one minute candle per instrument per round"""
+    prices = {uid: random.uniform(10, 1000) for uid in uids}
+    volumes = dict.fromkeys(uids, 0)
+
+    for uid in itertools.cycle(uids):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        price = prices[uid] = prices[uid] * random.uniform(0.999, 1.001)
+        volumes[uid] += random.randint(1, 100)
+        yield {
+            'instrument_uid': uid,
+            'time': now.replace(second=0, microsecond=0).isoformat(),
+            'open': price,
+            'high': price * 1.001,
+            'low': price * 0.999,
+            'close': price,
+            'volume': volumes[uid],
+        }
+
+
+class ReplayMarketDataStream(marketdata_pb2_grpc.MarketDataStreamServiceServicer):
+    def __init__(self, ticks: Optional[list[dict]] = None, speed: float = 1.0, rate: float = 1000.0):
+        self.ticks = ticks # Recorded ticks, synthetic ones without them
+        self.speed = speed # Replay speed of recorded ticks, 60 plays a minute per second
+        self.rate = rate # Synthetic ticks per second
+        self.sent = 0
+
+    async def MarketDataStream(self, request_iterator, context) -> AsyncIterator[marketdata_pb2.MarketDataResponse]:
+        request = await anext(aiter(request_iterator))
+        uids = [i.instrument_id for i in request.subscribe_candles_request.instruments]
+        yield marketdata_pb2.MarketDataResponse(
+            subscribe_candles_response=marketdata_pb2.SubscribeCandlesResponse(
+                candles_subscriptions=[
+                    marketdata_pb2.CandleSubscription(
+                        instrument_uid=uid,
+                        interval=marketdata_pb2.SUBSCRIPTION_INTERVAL_ONE_MINUTE,
+                        subscription_status=marketdata_pb2.SUBSCRIPTION_STATUS_SUCCESS,
+                    )
+                    for uid in uids
+                ]
+            )
+        )
+
+        async for tick in self._replay(uids):
+            yield candle_response(tick)
+            self.sent += 1
+
+    async def _replay(self, uids: list[str]) -> AsyncIterator[dict]:
+        if self.ticks is None:
+            for tick in synthetic_ticks(uids):
+                yield tick
+                await asyncio.sleep(1 / self.rate)
+            return
+
+        subscribed = set(uids)
+        previous = None
+        for tick in self.ticks:
+            if tick['instrument_uid'] not in subscribed:
+                continue
+            time = datetime.datetime.fromisoformat(tick['time'])
+            if previous is not None and time > previous:
+                await asyncio.sleep((time - previous).total_seconds() / self.speed)
+            previous = time
+            yield tick
+
+
+async def serve(port: int, servicer: ReplayMarketDataStream) -> grpc.aio.Server:
+    server = grpc.aio.server()
+    marketdata_pb2_grpc.add_MarketDataStreamServiceServicer_to_server(servicer, server)
+    server.add_insecure_port(f'[::]:{port}')
+    await server.start()
+    return server
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=50051)
+    parser.add_argument('--replay', help='JSON lines of recorded ticks, synthetic ticks without it')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed of recorded ticks')
+    parser.add_argument('--rate', type=float, default=1000.0, help='Synthetic ticks per second per stream')
+    args = parser.parse_args()
+
+    servicer = ReplayMarketDataStream(
+        recorded_ticks(args.replay) if args.replay else None,
+        speed=args.speed,
+        rate=args.rate,
+    )
+    server = await serve(args.port, servicer)
+    print(f'Serving market data stream on port {args.port}')
+    await server.wait_for_termination()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,176 @@
+"""Wall-clock comparison of the old fixed batch + sleep against the token bucket.
+
+Both runs call ``CandleServiceAsync.get_candles`` with the real retry policy
+and rate limiter, the API answers from a ReplayTransport, so the benchmark
+needs no token. The cassette is a recording of ``benchmarks.sync`` or, by
+default, empty responses for ``--tasks`` instruments. Saves are simulated and
+serialized like Django's thread sensitive ``sync_to_async``. Time is
+compressed: one API "minute" lasts ``--minute`` seconds.
+
+    python -m benchmarks.rate_limit --tasks 1500 --minute 1 --save-ms 50
+    python -m benchmarks.rate_limit --cassette candles.json.gz --error-rate 0.01
+"""
+from collections import deque
+from types import SimpleNamespace
+import argparse
+import asyncio
+import datetime
+import os
+import time
+
+import django
+from decouple import config as env_conf
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', env_conf('DJANGO_SETTINGS_MODULE'))
+django.setup()
+
+from apps.invest.models import CandleIntervalType
+from apps.invest.services.async_tinvest import CandleServiceAsync
+from apps.invest.services.rate_limit import API_QUOTAS, RateLimiter, TokenBucket
+from apps.invest.services.retry import CircuitBreaker, RetryPolicy
+from apps.invest.services.tinvest import InstrumentTask
+from apps.invest.services.transport import Cassette, ReplayTransport, call_key
+
+LEGACY_MAX_CALLS = 290 # Old CandleServiceAsync.API_MAX_CALLS
+LEGACY_REQUEST_DELAY = 61 # Old API_REQUEST_DELAY, seconds of a real minute
+UNLIMITED = 1_000_000 # Requests per minute, the legacy run paces itself
+
+
+class MeteredTransport(ReplayTransport):
+    """Replay that records call times to check the quota"""
+
+    def __init__(self, cassette: Cassette, minute: float, **kwargs):
+        super().__init__(cassette, **kwargs)
+        self.minute = minute
+        self.times = deque()
+        self.peak = 0
+
+    async def call(self, service: str, method: str, args: tuple, kwargs: dict):
+        now = time.monotonic()
+        self.times.append(now)
+        while self.times[0] <= now - self.minute:
+            self.times.popleft()
+        self.peak = max(self.peak, len(self.times))
+        return await super().call(service, method, args, kwargs)
+
+
+def compressed_backend(minute: float):
+    """Per-minute quotas of ``minute`` second minutes, like rate_limit.local_backend"""
+    def backend(service: str, limit: int, burst: int) -> TokenBucket:
+        burst = min(burst, limit)
+        return TokenBucket(rate=(limit - burst) / minute, capacity=burst)
+    return backend
+
+
+def synthetic_cassette(tasks: int) -> Cassette:
+    end = datetime.datetime.now(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - CandleServiceAsync.API_MAX_PERIOD
+    cassette = Cassette(meta={'service': 'candles', 'tasks': []})
+    for i in range(tasks):
+        uid = f'uid{i}'
+        cassette.meta['tasks'].append((start, end, uid))
+        cassette.calls[call_key('market_data', 'get_candles', (), {
+            'instrument_id': uid,
+            'interval': CandleServiceAsync.API_INTERVALS[CandleIntervalType.DAY],
+            'from_': start,
+            'to': end,
+        })].append(SimpleNamespace(candles=[]))
+    return cassette
+
+
+class Database:
+    def __init__(self, save: float):
+        self.save = save
+        self._lock = asyncio.Lock()
+
+    async def save_candles(self):
+        async with self._lock:
+            await asyncio.sleep(self.save)
+
+
+def make_service(transport: MeteredTransport, quota: int, minute: float, scale: float) -> CandleServiceAsync:
+    return CandleServiceAsync(
+        rate_limiter=RateLimiter(quotas=dict.fromkeys(API_QUOTAS, quota), backend=compressed_backend(minute)),
+        transport=transport,
+        retry_policy=RetryPolicy(
+            base_delay=0.5 * scale,
+            max_delay=30 * scale,
+            rate_limit_jitter=0.5 * scale,
+            breaker=CircuitBreaker(cooldown=30 * scale),
+        ),
+    )
+
+
+async def run_legacy(service: CandleServiceAsync, db: Database, tasks: list[InstrumentTask], minute: float) -> float:
+    async def process_task(task: InstrumentTask):
+        await service.get_candles(task)
+        await db.save_candles()
+
+    start = time.monotonic()
+    delay = LEGACY_REQUEST_DELAY * minute / 60
+    async with service:
+        for i in range(0, len(tasks), LEGACY_MAX_CALLS):
+            await asyncio.gather(*(process_task(task) for task in tasks[i:i + LEGACY_MAX_CALLS]))
+            if i + LEGACY_MAX_CALLS < len(tasks):
+                await asyncio.sleep(delay)
+
+    return time.monotonic() - start
+
+
+async def run_token_bucket(service: CandleServiceAsync, db: Database, tasks: list[InstrumentTask], concurrency: int) -> float:
+    async def process_task(task: InstrumentTask):
+        await service.get_candles(task)
+        await db.save_candles()
+
+    start = time.monotonic()
+    async with service:
+        await service._run_tasks(tasks, process_task, concurrency)
+
+    return time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cassette', help='Candle recording of benchmarks.sync, synthetic responses by default')
+    parser.add_argument('--tasks', type=int, default=1500, help='Number of get_candles calls without a cassette')
+    parser.add_argument('--minute', type=float, default=1.0, help='Seconds in a simulated minute')
+    parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight')
+    parser.add_argument('--save-ms', type=float, default=50, help='Real duration of one save_candles')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of calls failing with a rate limit')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    cassette = Cassette.load(args.cassette) if args.cassette else synthetic_cassette(args.tasks)
+    tasks = [InstrumentTask(start, end, uid, None) for start, end, uid in cassette.meta['tasks']]
+    limit = API_QUOTAS['market_data']
+    scale = args.minute / 60
+    results = {}
+
+    for name, quota, runner in (
+        ('batch + sleep', UNLIMITED, lambda service, db: run_legacy(service, db, tasks, args.minute)),
+        ('token bucket', limit, lambda service, db: run_token_bucket(service, db, tasks, args.concurrency)),
+    ):
+        transport = MeteredTransport(
+            cassette,
+            args.minute,
+            # Latency of a real call is ~50-300ms, compressed the same way as the minute
+            latency=(0.05 * scale, 0.3 * scale),
+            error_rate=args.error_rate,
+            ratelimit_reset=0,
+            seed=args.seed,
+        )
+        service = make_service(transport, quota, args.minute, scale)
+        elapsed = asyncio.run(runner(service, Database(args.save_ms / 1000 * scale)))
+        results[name] = elapsed
+        print(
+            f'{name:<14} {elapsed:8.2f}s  '
+            f'{elapsed / args.minute:6.2f} API minutes  '
+            f'peak {transport.peak}/{limit} calls per minute  '
+            f'{transport.errors} injected errors'
+        )
+
+    print(f'speedup {results["batch + sleep"] / results["token bucket"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
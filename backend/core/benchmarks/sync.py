@@ -0,0 +1,126 @@
+"""End-to-end sync throughput on recorded Tinkoff API responses.
+
+``record`` plans a sync for a few instruments, runs it against the live API
+(needs TINKOFF_KEY) and saves the task plan and every response to a cassette.
+``replay`` runs the same tasks on the cassette with simulated latency and
+injected rate limit errors, and reports tasks/s, written rows/s and peak
+traced memory. Writes go to the configured database like a real sync, so use
+a disposable one.
+
+    python -m benchmarks.sync record --service candles --instruments 50 --cassette candles.json.gz
+    python -m benchmarks.sync replay --cassette candles.json.gz --latency-ms 20 80 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+
+import django
+from decouple import config as env_conf
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', env_conf('DJANGO_SETTINGS_MODULE'))
+django.setup()
+
+from apps.invest.models import Instrument
+from apps.invest.services.async_tinvest import TOKEN, CandleServiceAsync, DividendServiceAsync
+from apps.invest.services.rate_limit import API_QUOTAS, RateLimiter, local_backend
+from apps.invest.services.tinvest import InstrumentMap, InstrumentTask
+from apps.invest.services.transport import Cassette, LiveTransport, RecordingTransport, ReplayTransport
+
+SERVICES = {
+    'candles': (CandleServiceAsync, Instrument.objects.all()),
+    'dividends': (DividendServiceAsync, Instrument.objects.filter(instrument_type='share')),
+}
+
+
+async def load_instruments(service: str, limit: int = None) -> InstrumentMap:
+    instruments = SERVICES[service][1]
+    if limit:
+        ids = [i async for i in instruments.order_by('id').values_list('id', flat=True)[:limit]]
+        instruments = instruments.filter(id__in=ids)
+    return await InstrumentMap.aload(instruments)
+
+
+def written_rows(service) -> int:
+    if isinstance(service, CandleServiceAsync):
+        return service.stats['write'].rows
+    return service.stats['written']
+
+
+async def record(args):
+    instruments = await load_instruments(args.service, args.instruments)
+    transport = RecordingTransport(args.cassette, LiveTransport(TOKEN))
+    service = SERVICES[args.service][0](transport=transport)
+
+    tasks = await service.get_tasks(instruments)
+    transport.cassette.meta = {
+        'service': args.service,
+        'tasks': [(t.start_date, t.end_date, t.instrument_uid) for t in tasks],
+    }
+    async with service:
+        await service.process_tasks(tasks, args.concurrency)
+
+    print(f'Recorded {len(transport.cassette)} responses of {len(tasks)} tasks to {args.cassette}')
+
+
+async def replay(args):
+    cassette = Cassette.load(args.cassette)
+    name = cassette.meta['service']
+    instruments = await load_instruments(name)
+    tasks = [
+        InstrumentTask(start, end, uid, instruments[uid].id)
+        for start, end, uid in cassette.meta['tasks']
+        if uid in instruments
+    ]
+
+    transport = ReplayTransport(
+        cassette,
+        latency=(args.latency_ms[0] / 1000, args.latency_ms[1] / 1000),
+        error_rate=args.error_rate,
+        ratelimit_reset=0,
+        seed=args.seed,
+    )
+    rate_limiter = RateLimiter(quotas=dict.fromkeys(API_QUOTAS, args.quota), backend=local_backend)
+    service = SERVICES[name][0](rate_limiter=rate_limiter, transport=transport)
+    if isinstance(service, DividendServiceAsync):
+        service.currencies = instruments.currencies
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    async with service:
+        await service.process_tasks(tasks, args.concurrency)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rows = written_rows(service)
+    print(f'{name}: {len(tasks)} tasks, {transport.calls} calls, {transport.errors} injected errors')
+    print(f'  {elapsed:.2f}s, {len(tasks) / elapsed:.1f} tasks/s, {rows} rows, {rows / elapsed:.0f} rows/s')
+    print(f'  peak traced memory {peak / 2 ** 20:.1f} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help='Record live API responses')
+    record_parser.add_argument('--service', choices=SERVICES, default='candles')
+    record_parser.add_argument('--instruments', type=int, default=20, help='Number of instruments to sync')
+    record_parser.add_argument('--cassette', required=True)
+    record_parser.add_argument('--concurrency', type=int)
+
+    replay_parser = commands.add_parser('replay', help='Replay a cassette and measure the sync')
+    replay_parser.add_argument('--cassette', required=True)
+    replay_parser.add_argument('--latency-ms', type=float, nargs=2, default=(20, 80), metavar=('MIN', 'MAX'))
+    replay_parser.add_argument('--error-rate', type=float, default=0.0, help='Share of calls failing with a rate limit')
+    replay_parser.add_argument('--quota', type=int, default=1_000_000, help='Requests per minute per API service')
+    replay_parser.add_argument('--concurrency', type=int)
+    replay_parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+    asyncio.run(record(args) if args.command == 'record' else replay(args))
+
+
+if __name__ == '__main__':
+    main()
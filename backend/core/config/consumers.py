@@ -28,6 +28,11 @@ class PriceConsumer(AsyncWebsocketConsumer):
     async def send_price_update(self, event):
         await self.send(text_data=json.dumps(event['data']))
 
+    async def send_price_updates(self, event):
+        # Batched by the broadcaster, clients still get one update per frame
+        for update in event['data']:
+            await self.send(text_data=json.dumps(update))
+
 
 class CompanyDetailPriceConsumer(AsyncWebsocketConsumer):
     def __init__(self, *args, **kwargs):
@@ -37,7 +42,8 @@ class CompanyDetailPriceConsumer(AsyncWebsocketConsumer):
 
     async def connect(self):
         self.instrument_uid = self.scope['url_route']['kwargs']['instrument_uid']
-        self.group_name = f'instrument_{self.instrument_uid}'
+        # Updates of all instruments come in one message per batch, see instrument_price_updates
+        self.group_name = 'instrument_prices'
 
         if await self.is_instrument_accessible():
             await self.channel_layer.group_add(
@@ -57,11 +63,16 @@ class CompanyDetailPriceConsumer(AsyncWebsocketConsumer):
     async def receive(self, text_data=None, bytes_data=None):
         pass  # Обработка входящих сообщений от клиента
 
-    async def company_price_update(self, event):
+    async def instrument_price_update(self, event):
         await self.send(text_data=json.dumps(event['data']))
 
+    async def instrument_price_updates(self, event):
+        for update in event['data']:
+            if update['uid'] == self.instrument_uid:
+                await self.send(text_data=json.dumps(update))
+
     async def is_instrument_accessible(self):
         # Импорт модели ВНУТРИ метода
         from apps.invest.models import Instrument
 
-        return Instrument.objects.filter(tinkoff_uid=self.instrument_uid).aexists()
+        return await Instrument.objects.filter(tinkoff_uid=self.instrument_uid).aexists()
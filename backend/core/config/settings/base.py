@@ -335,6 +335,25 @@ CELERY_RESULT_SERIALIZER = 'json'  # является типом формата
 CELERY_TASK_DEFAULT_QUEUE = 'default'  # celery будет использовать это имя очереди
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
+######################################################################
+# Tinkoff Invest API
+######################################################################
+# 'local' keeps API quotas per process, 'redis' shares them between all workers
+TINKOFF_RATE_LIMIT_BACKEND = env_conf('TINKOFF_RATE_LIMIT_BACKEND', default='local')
+TINKOFF_RATE_LIMIT_REDIS_URL = env_conf('TINKOFF_RATE_LIMIT_REDIS_URL', default='redis://127.0.0.1:6379/1')
+# Number of Celery subtasks a candle sync is split into
+CANDLE_SYNC_SHARDS = env_conf('CANDLE_SYNC_SHARDS', default=1, cast=int)
+# Months of candle partitions created ahead of today (see manage.py partition_candles)
+CANDLE_PARTITIONS_AHEAD = env_conf('CANDLE_PARTITIONS_AHEAD', default=3, cast=int)
+# Daily candles before this date are moved to archive files in media storage
+CANDLE_ARCHIVE_BEFORE = env_conf('CANDLE_ARCHIVE_BEFORE', default='2015-01-01')
+# Memory-mapped columnar candle files for analytics, local to every host and refreshed by their readers
+CANDLE_CACHE_DIR = env_conf('CANDLE_CACHE_DIR', default=str(BASE_DIR / 'cache' / 'candles'))
+# Number of Celery subtasks the statement analysis is split into
+STATEMENT_CHECK_SHARDS = env_conf('STATEMENT_CHECK_SHARDS', default=1, cast=int)
+# Currency instrument whose price converts market caps to USD for the statement checks
+USD_INSTRUMENT_TICKER = env_conf('USD_INSTRUMENT_TICKER', default='USD000UTSTOM')
+
 ######################################################################
 # Rest Framework
 ######################################################################